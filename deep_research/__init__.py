@@ -6,7 +6,7 @@ A Python implementation of the Deep Research agent using LangGraph framework.
 
 from .agent import DeepResearchAgent
 from .graph import create_research_graph
-from .state import ResearchState
+from .state import ResearchState, create_initial_state
 
 __version__ = "0.1.0"
 
@@ -14,4 +14,5 @@ __all__ = [
     "DeepResearchAgent",
     "create_research_graph",
     "ResearchState",
+    "create_initial_state",
 ]
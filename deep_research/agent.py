@@ -2,15 +2,17 @@
 Main Deep Research Agent class.
 """
 
-import json
 import asyncio
+from datetime import datetime
 from typing import Any
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from .context import RunContext, run_context
 from .graph import create_research_graph
-from .state import create_initial_state, ResearchState
+from .observability import start_span, start_from_env
+from .state import create_initial_state, ResearchState, GraphConfig, RunSnapshot
 from .tools import LLMProvider
-from .utils import FOLLOW_UP_QUESTIONS_PROMPT, extract_json_from_text
+from .utils import FOLLOW_UP_QUESTIONS_PROMPT, parse_json, json_items, content_hash, report_diff
 
 
 class DeepResearchAgent:
@@ -35,6 +37,7 @@ class DeepResearchAgent:
         breadth: int = 4,
         depth: int = 2,
         concurrency_limit: int = 3,
+        config: GraphConfig | None = None,
     ):
         """
         Initialize the Deep Research Agent.
@@ -43,12 +46,16 @@ class DeepResearchAgent:
             breadth: Number of search queries per iteration (3-10 recommended)
             depth: Number of research iterations (1-5 recommended)
             concurrency_limit: Maximum concurrent searches (1-10)
+            config: Graph configuration (optional features and limits)
         """
         self.breadth = breadth
         self.depth = depth
         self.concurrency_limit = concurrency_limit
+        self.config = config or GraphConfig()
         self.graph = create_research_graph()
-        self.llm_provider = LLMProvider()
+        self._runs: set[RunContext] = set()
+        self.llm_provider = LLMProvider.from_profile(self.config.profile_for("follow_up_questions"))
+        start_from_env()
     
     async def generate_follow_up_questions(
         self,
@@ -72,25 +79,29 @@ class DeepResearchAgent:
             num_questions=num_questions,
         )
         
-        llm = self.llm_provider.get_structured_llm()
-        
         messages = [
             SystemMessage(content="You are a research assistant. Return only valid JSON."),
             HumanMessage(content=prompt),
         ]
         
         try:
-            response = await llm.ainvoke(messages)
-            content = extract_json_from_text(response.content)
-            questions = json.loads(content)
-            
-            if isinstance(questions, dict) and "questions" in questions:
-                questions = questions["questions"]
-            
-            if not isinstance(questions, list):
-                return []
+            if self.config.streaming_json:
+                questions = await self.llm_provider.astream_json(
+                    messages,
+                    key="questions",
+                    limit=num_questions,
+                    stage="follow_up_questions",
+                    temperature=0.3,
+                )
+            else:
+                response = await self.llm_provider.ainvoke(
+                    messages,
+                    stage="follow_up_questions",
+                    temperature=0.3,
+                )
+                questions = json_items(parse_json(response.content), "questions")
             
-            return questions[:num_questions]
+            return [q for q in questions if isinstance(q, str)][:num_questions]
             
         except Exception as e:
             print(f"❌ Error generating follow-up questions: {e}")
@@ -101,6 +112,7 @@ class DeepResearchAgent:
         query: str,
         follow_up_answers: list[str] | None = None,
         skip_follow_up: bool = False,
+        callbacks: list | None = None,
     ) -> dict[str, Any]:
         """
         Run the research agent asynchronously.
@@ -109,6 +121,7 @@ class DeepResearchAgent:
             query: The research query
             follow_up_answers: Answers to follow-up questions (optional)
             skip_follow_up: Skip generating follow-up questions
+            callbacks: LangChain callback handlers attached to the graph run
             
         Returns:
             Dictionary containing the final report and metadata
@@ -135,14 +148,48 @@ class DeepResearchAgent:
             follow_up_answers=follow_up_answers,
         )
         
+        return await self._run_graph(initial_state, RunContext(self.config), callbacks)
+    
+    async def _run_graph(
+        self,
+        initial_state: ResearchState,
+        context: RunContext,
+        callbacks: list | None = None,
+    ) -> dict[str, Any]:
+        """Run the research graph from an initial state within a run context."""
+        query = initial_state["query"]
+        started_at = datetime.now()
+        
         # Run the graph
         try:
-            final_state = await self.graph.ainvoke(initial_state)
+            attributes = {
+                "research.query": query,
+                "research.breadth": self.breadth,
+                "research.depth": self.depth,
+            }
+            run_config = {
+                "configurable": context.config.model_dump(),
+                "callbacks": callbacks,
+            }
+            with start_span("research.run", attributes) as span, \
+                    run_context(context):
+                self._runs.add(context)
+                try:
+                    final_state = await self.graph.ainvoke(initial_state, config=run_config)
+                finally:
+                    self._runs.discard(context)
+                    await context.aclose()
+                span.set_attributes({
+                    "research.learnings": len(final_state.get("learnings", [])),
+                    "research.sources": len(final_state.get("all_sources", [])),
+                })
             
             print("\n" + "=" * 60)
             print("✅ Research Complete!")
             print(f"📚 Total learnings: {len(final_state.get('learnings', []))}")
             print(f"🔗 Total sources: {len(final_state.get('all_sources', []))}")
+            if context.out_of_time():
+                print("⏱️ Research was cut short by the deadline or a stop request")
             print("=" * 60)
             
             return {
@@ -152,12 +199,127 @@ class DeepResearchAgent:
                 "query": query,
                 "breadth": self.breadth,
                 "depth": self.depth,
+                "follow_up_answers": initial_state["follow_up_answers"],
+                "started_at": started_at,
+                "cut_short": context.out_of_time(),
             }
             
         except Exception as e:
             print(f"\n❌ Error during research: {e}")
             raise
     
+    def stop(self):
+        """
+        Stop the runs in progress and have them report what they learned.
+        
+        Unlike cancelling ``run_async``, which loses the run, searches and
+        research LLM calls in flight are cut off, the remaining depths are
+        skipped, and each run still returns a report of its learnings so far.
+        Call it from the event loop the runs are on.
+        """
+        for context in list(self._runs):
+            context.stop()
+    
+    async def refresh_async(
+        self,
+        previous: RunSnapshot | str,
+        callbacks: list | None = None,
+    ) -> dict[str, Any]:
+        """
+        Re-run the query of an earlier run, processing only what is new.
+        
+        Searches are limited to pages published since the earlier run, the
+        earlier sources are known to the run (pages fetched again are only
+        analyzed if their content changed), and the earlier report is
+        updated section by section rather than rewritten.
+        
+        Args:
+            previous: Snapshot of the earlier run, or the path it was saved to
+            callbacks: LangChain callback handlers attached to the graph run
+            
+        Returns:
+            Like run_async, plus "diff": a unified diff of the report, and
+            "content_hashes": the earlier run's, for save_run
+        """
+        if isinstance(previous, str):
+            previous = self.load_run(previous)
+        
+        print("=" * 60)
+        print(f"🔁 Refreshing research: {previous.query}")
+        print(f"📅 Previous run: {previous.started_at:%Y-%m-%d %H:%M}")
+        print("=" * 60)
+        
+        config = self.config.model_copy(update={"search_since": previous.started_at.date()})
+        context = RunContext(config)
+        for source in previous.sources:
+            digest = previous.content_hashes.get(source.url)
+            if digest:
+                learnings = [l for l in previous.learnings if source.url in l.sources]
+                context.source_index.add_hash(source.url, digest, learnings)
+        
+        initial_state = create_initial_state(
+            query=previous.query,
+            breadth=self.breadth,
+            depth=self.depth,
+            follow_up_answers=previous.follow_up_answers,
+        )
+        initial_state.update(
+            learnings=list(previous.learnings),
+            all_sources=list(previous.sources),
+            previous_report=previous.report,
+            previous_learning_count=len(previous.learnings),
+        )
+        
+        result = await self._run_graph(initial_state, context, callbacks)
+        result["diff"] = report_diff(previous.report, result["final_report"])
+        # Carried-over sources have no content to hash again
+        result["content_hashes"] = dict(previous.content_hashes)
+        new_learnings = len(result["learnings"]) - len(previous.learnings)
+        print(f"🆕 New learnings: {new_learnings}")
+        return result
+    
+    def save_run(self, result: dict[str, Any], filename: str = "run.json"):
+        """
+        Save what a later refresh of a run needs.
+        
+        Args:
+            result: Result of run_async or refresh_async
+            filename: Output filename (JSON)
+        """
+        # Hashes of sources carried over by a refresh, overridden by those
+        # of pages fetched in this run
+        previous_hashes = result.get("content_hashes", {})
+        content_hashes = {
+            source.url: previous_hashes[source.url]
+            for source in result["sources"]
+            if source.url in previous_hashes
+        }
+        content_hashes.update({
+            source.url: content_hash(source.content)
+            for source in result["sources"]
+            if source.content
+        })
+        snapshot = RunSnapshot(
+            query=result["query"],
+            breadth=result["breadth"],
+            depth=result["depth"],
+            follow_up_answers=result.get("follow_up_answers", []),
+            started_at=result["started_at"],
+            report=result["final_report"],
+            learnings=result["learnings"],
+            sources=[source.model_copy(update={"content": ""}) for source in result["sources"]],
+            content_hashes=content_hashes,
+        )
+        with open(filename, "w", encoding="utf-8") as f:
+            f.write(snapshot.model_dump_json(indent=2))
+        print(f"\n💾 Run saved to: {filename}")
+    
+    @staticmethod
+    def load_run(filename: str) -> RunSnapshot:
+        """Load a run saved with save_run."""
+        with open(filename, encoding="utf-8") as f:
+            return RunSnapshot.model_validate_json(f.read())
+    
     def run(
         self,
         query: str,
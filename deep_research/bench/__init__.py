@@ -0,0 +1,9 @@
+"""Benchmarking and load-testing utilities."""
+
+from .stubs import StubServers, StubLLM, StubFirecrawl
+
+__all__ = [
+    "StubServers",
+    "StubLLM",
+    "StubFirecrawl",
+]
@@ -0,0 +1,387 @@
+"""
+Load-test harness for concurrent research sessions.
+
+Starts many ``DeepResearchAgent.run_async`` sessions in one process against
+the local stub servers and reports sessions/minute, end-to-end and per-node
+latency percentiles, event-loop lag and RSS over time.
+
+Usage:
+    python -m deep_research.bench.loadtest --mode closed --concurrency 8 --duration 30
+    python -m deep_research.bench.loadtest --mode open --rate 120 --duration 30
+    python -m deep_research.bench.loadtest --find-saturation --max-concurrency 64
+"""
+
+import argparse
+import asyncio
+import contextlib
+import math
+import os
+import random
+import sys
+import time
+from typing import Any, Literal
+from uuid import UUID
+from langchain_core.callbacks import AsyncCallbackHandler
+from pydantic import BaseModel, Field
+
+from ..agent import DeepResearchAgent
+from ..observability.metrics import LLM_TOKENS
+from .stubs import StubServers, StubLLM, StubFirecrawl
+
+
+TOPICS = [
+    "edge inference hardware",
+    "battery supply chain",
+    "open source LLM licensing",
+    "quantum error correction",
+    "datacenter energy policy",
+    "semiconductor export controls",
+    "vector database adoption",
+    "satellite internet markets",
+]
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile (q in 0-100) of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def current_rss_bytes() -> int:
+    """Resident set size of this process in bytes."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Not Linux: fall back to peak RSS (kilobytes on Linux, bytes on macOS)
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LoopMonitor:
+    """
+    Samples event-loop lag and RSS in the background.
+
+    Lag is how late a ``sleep(interval)`` wakes up; on a healthy loop it
+    stays well under a millisecond.
+    """
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.lag_samples: list[float] = []
+        self.rss_samples: list[tuple[float, int]] = []
+        self._task: asyncio.Task | None = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        while True:
+            before = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag_samples.append(max(0.0, loop.time() - before - self.interval))
+            self.rss_samples.append((loop.time() - start, current_rss_bytes()))
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+
+
+class NodeTimingHandler(AsyncCallbackHandler):
+    """Callback handler recording wall time per LangGraph node."""
+
+    def __init__(self):
+        self.durations: dict[str, list[float]] = {}
+        self._started: dict[UUID, tuple[str, float]] = {}
+
+    async def on_chain_start(
+        self,
+        serialized: dict[str, Any],
+        inputs: dict[str, Any],
+        *,
+        run_id: UUID,
+        metadata: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> None:
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self._started[run_id] = (node, time.perf_counter())
+
+    async def on_chain_end(self, outputs: Any, *, run_id: UUID, **kwargs: Any) -> None:
+        started = self._started.pop(run_id, None)
+        if started:
+            node, t0 = started
+            self.durations.setdefault(node, []).append(time.perf_counter() - t0)
+
+    async def on_chain_error(self, error: BaseException, *, run_id: UUID, **kwargs: Any) -> None:
+        self._started.pop(run_id, None)
+
+
+class LatencySummary(BaseModel):
+    """Latency percentiles in seconds."""
+    count: int = 0
+    p50: float = 0.0
+    p95: float = 0.0
+    p99: float = 0.0
+    max: float = 0.0
+
+    @classmethod
+    def of(cls, values: list[float]) -> "LatencySummary":
+        return cls(
+            count=len(values),
+            p50=percentile(values, 50),
+            p95=percentile(values, 95),
+            p99=percentile(values, 99),
+            max=max(values, default=0.0),
+        )
+
+
+class LoadTestResult(BaseModel):
+    """Outcome of one load-test run."""
+    mode: Literal["open", "closed"]
+    concurrency: int = 0
+    rate_per_minute: float = 0.0
+    elapsed_seconds: float = 0.0
+    completed: int = 0
+    failed: int = 0
+    sessions_per_minute: float = 0.0
+    end_to_end: LatencySummary = Field(default_factory=LatencySummary)
+    nodes: dict[str, LatencySummary] = Field(default_factory=dict)
+    loop_lag: LatencySummary = Field(default_factory=LatencySummary)
+    peak_rss_mb: float = 0.0
+    cached_input_ratio: float = 0.0  # Share of LLM input tokens served from prompt caches
+    rss_timeline_mb: list[tuple[float, float]] = Field(default_factory=list)
+
+
+class LoadTest:
+    """
+    Drives concurrent research sessions and collects measurements.
+
+    Args:
+        breadth: Breadth of each session
+        depth: Depth of each session
+        quiet: Silence the agent's per-node console output
+    """
+
+    def __init__(self, breadth: int = 3, depth: int = 1, quiet: bool = True):
+        self.agent = DeepResearchAgent(breadth=breadth, depth=depth)
+        self.quiet = quiet
+        self._counter = 0
+
+    def _next_query(self) -> str:
+        self._counter += 1
+        return f"{TOPICS[self._counter % len(TOPICS)]} ({self._counter})"
+
+    async def _session(
+        self,
+        handler: NodeTimingHandler,
+        latencies: list[float],
+        failures: list[BaseException],
+    ):
+        t0 = time.perf_counter()
+        try:
+            await self.agent.run_async(
+                self._next_query(),
+                skip_follow_up=True,
+                callbacks=[handler],
+            )
+            latencies.append(time.perf_counter() - t0)
+        except Exception as e:
+            failures.append(e)
+
+    async def _measure(self, mode: str, drive, **fields) -> LoadTestResult:
+        handler = NodeTimingHandler()
+        latencies: list[float] = []
+        failures: list[BaseException] = []
+        monitor = LoopMonitor()
+
+        input_before = LLM_TOKENS.total(kind="input")
+        cached_before = LLM_TOKENS.total(kind="cached")
+        sink = open(os.devnull, "w") if self.quiet else contextlib.nullcontext(sys.stdout)
+        with sink as out, contextlib.redirect_stdout(out):
+            monitor.start()
+            t0 = time.perf_counter()
+            await drive(lambda: self._session(handler, latencies, failures))
+            elapsed = time.perf_counter() - t0
+            await monitor.stop()
+
+        input_tokens = LLM_TOKENS.total(kind="input") - input_before
+        cached_tokens = LLM_TOKENS.total(kind="cached") - cached_before
+
+        rss = monitor.rss_samples
+        step = max(1, len(rss) // 20)
+        return LoadTestResult(
+            mode=mode,
+            elapsed_seconds=elapsed,
+            completed=len(latencies),
+            failed=len(failures),
+            sessions_per_minute=len(latencies) / elapsed * 60 if elapsed else 0.0,
+            end_to_end=LatencySummary.of(latencies),
+            nodes={name: LatencySummary.of(d) for name, d in handler.durations.items()},
+            loop_lag=LatencySummary.of(monitor.lag_samples),
+            peak_rss_mb=max((r for _, r in rss), default=0) / 2**20,
+            cached_input_ratio=cached_tokens / input_tokens if input_tokens else 0.0,
+            rss_timeline_mb=[(round(t, 2), round(r / 2**20, 1)) for t, r in rss[::step]],
+            **fields,
+        )
+
+    async def closed_loop(
+        self,
+        concurrency: int,
+        duration: float | None = None,
+        sessions: int | None = None,
+    ) -> LoadTestResult:
+        """
+        Keep ``concurrency`` sessions in flight.
+
+        Runs until ``duration`` seconds have passed or ``sessions`` sessions
+        have been started, whichever limit is given.
+        """
+        if duration is None and sessions is None:
+            sessions = concurrency
+
+        async def drive(session):
+            deadline = time.perf_counter() + duration if duration else None
+            started = 0
+
+            async def worker():
+                nonlocal started
+                while True:
+                    if sessions is not None and started >= sessions:
+                        return
+                    if deadline is not None and time.perf_counter() >= deadline:
+                        return
+                    started += 1
+                    await session()
+
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+        return await self._measure("closed", drive, concurrency=concurrency)
+
+    async def open_loop(self, rate_per_minute: float, duration: float) -> LoadTestResult:
+        """Start sessions as a Poisson process, independent of completions."""
+
+        async def drive(session):
+            tasks = []
+            deadline = time.perf_counter() + duration
+            while time.perf_counter() < deadline:
+                tasks.append(asyncio.create_task(session()))
+                await asyncio.sleep(random.expovariate(rate_per_minute / 60))
+            await asyncio.gather(*tasks)
+
+        return await self._measure("open", drive, rate_per_minute=rate_per_minute)
+
+    async def find_saturation(
+        self,
+        max_concurrency: int = 64,
+        duration: float = 20.0,
+        min_gain: float = 0.10,
+        max_lag_p99: float = 0.1,
+        max_rss_mb: float | None = None,
+    ) -> tuple[int, list[LoadTestResult]]:
+        """
+        Double concurrency until the process stops scaling.
+
+        A level counts as saturated when throughput improves by less than
+        ``min_gain``, the p99 loop lag exceeds ``max_lag_p99`` seconds, RSS
+        exceeds ``max_rss_mb`` or any session fails.
+
+        Returns:
+            The highest sustainable concurrency and the result of every level
+        """
+        results: list[LoadTestResult] = []
+        best = 1
+        concurrency = 1
+        while concurrency <= max_concurrency:
+            result = await self.closed_loop(concurrency, duration=duration)
+            results.append(result)
+            print(format_result(result), file=sys.stderr)
+
+            previous = results[-2].sessions_per_minute if len(results) > 1 else 0.0
+            saturated = (
+                result.failed > 0
+                or result.loop_lag.p99 > max_lag_p99
+                or (max_rss_mb is not None and result.peak_rss_mb > max_rss_mb)
+                or (previous and result.sessions_per_minute < previous * (1 + min_gain))
+            )
+            if saturated:
+                break
+            best = concurrency
+            concurrency *= 2
+        return best, results
+
+
+def format_result(result: LoadTestResult) -> str:
+    """Render a result as a compact text table."""
+    load = (
+        f"concurrency={result.concurrency}"
+        if result.mode == "closed"
+        else f"rate={result.rate_per_minute:.0f}/min"
+    )
+    lines = [
+        f"[{result.mode} {load}] {result.completed} ok, {result.failed} failed "
+        f"in {result.elapsed_seconds:.1f}s -> {result.sessions_per_minute:.1f} sessions/min",
+        f"  {'stage':<18}{'n':>6}{'p50':>9}{'p95':>9}{'p99':>9}",
+    ]
+    rows = [("end_to_end", result.end_to_end)] + sorted(result.nodes.items())
+    rows.append(("loop_lag", result.loop_lag))
+    for name, s in rows:
+        lines.append(f"  {name:<18}{s.count:>6}{s.p50:>9.3f}{s.p95:>9.3f}{s.p99:>9.3f}")
+    lines.append(f"  peak RSS: {result.peak_rss_mb:.1f} MB")
+    lines.append(f"  cached input tokens: {result.cached_input_ratio:.0%}")
+    return "\n".join(lines)
+
+
+async def main(argv: list[str] | None = None):
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["open", "closed"], default="closed")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--rate", type=float, default=60.0, help="Sessions/minute (open loop)")
+    parser.add_argument("--duration", type=float, default=30.0)
+    parser.add_argument("--breadth", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--find-saturation", action="store_true")
+    parser.add_argument("--max-concurrency", type=int, default=64)
+    parser.add_argument("--max-lag", type=float, default=0.1, help="p99 loop lag limit (s)")
+    parser.add_argument("--max-rss-mb", type=float, default=None)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--page-bytes", type=int, default=20_000)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+
+    stubs = StubServers(
+        llm=StubLLM(latency=args.llm_latency),
+        firecrawl=StubFirecrawl(latency=args.search_latency, page_bytes=args.page_bytes),
+    )
+    with stubs:
+        stubs.configure_environment()
+        test = LoadTest(breadth=args.breadth, depth=args.depth)
+
+        if args.find_saturation:
+            best, results = await test.find_saturation(
+                max_concurrency=args.max_concurrency,
+                duration=args.duration,
+                max_lag_p99=args.max_lag,
+                max_rss_mb=args.max_rss_mb,
+            )
+            print(f"\nSaturation point: concurrency={best}")
+        elif args.mode == "closed":
+            results = [await test.closed_loop(args.concurrency, duration=args.duration)]
+        else:
+            results = [await test.open_loop(args.rate, args.duration)]
+
+    for result in results:
+        print(result.model_dump_json(indent=2) if args.json else format_result(result))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
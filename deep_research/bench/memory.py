@@ -0,0 +1,63 @@
+"""
+Memory sizing across research breadth and depth.
+
+Runs one profiled session per (breadth, depth) combination against the
+local stubs (in a child process) and reports peak traced memory and final
+state size, to help choose safe limits for a given worker size.
+
+Usage:
+    python -m deep_research.bench.memory --breadth 2 4 8 --depth 1 2 3
+    python -m deep_research.bench.memory --breadth 4 --depth 2 --report
+"""
+
+import argparse
+import asyncio
+import contextlib
+import os
+
+from ..agent import DeepResearchAgent
+from ..observability import profile_memory
+from .stubs import StubProcess, StubLLM, StubFirecrawl
+
+
+async def profile_session(breadth: int, depth: int, top_n: int = 10):
+    """Run one profiled session and return its profiler."""
+    agent = DeepResearchAgent(breadth=breadth, depth=depth)
+    with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+        with profile_memory(top_n=top_n) as profiler:
+            await agent.run_async(f"memory sizing b={breadth} d={depth}", skip_follow_up=True)
+    return profiler
+
+
+async def main(argv: list[str] | None = None):
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--breadth", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--depth", type=int, nargs="+", default=[1, 2])
+    parser.add_argument("--page-bytes", type=int, default=20_000)
+    parser.add_argument("--report", action="store_true", help="Print the full report per run")
+    args = parser.parse_args(argv)
+
+    # The stubs run in a child process so that tracemalloc, which traces
+    # every thread, does not count their pages and buffers
+    stubs = StubProcess(
+        llm=StubLLM(latency=0.01, jitter=0.0),
+        firecrawl=StubFirecrawl(latency=0.01, jitter=0.0, page_bytes=args.page_bytes),
+    )
+    with stubs:
+        stubs.configure_environment()
+        # Warm up once so lazy imports and client setup are not attributed to a node
+        await profile_session(1, 0)
+        print(f"{'breadth':>8}{'depth':>7}{'peak MB':>10}{'state MB':>10}")
+        for breadth in args.breadth:
+            for depth in args.depth:
+                profiler = await profile_session(breadth, depth)
+                peak = max((r.peak_bytes for r in profiler.records), default=0)
+                state = sum(profiler.records[-1].field_sizes.values()) if profiler.records else 0
+                print(f"{breadth:>8}{depth:>7}{peak / 2**20:>10.2f}{state / 2**20:>10.2f}")
+                if args.report:
+                    print(profiler.report() + "\n")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Event-loop lag with and without the CPU pool.
+
+Runs the same closed-loop load against the local stubs once per CPU pool
+kind (see ``tools.workers``) and compares event-loop lag and throughput.
+Pages are large by default so that cleaning and hashing them is real work.
+
+Usage:
+    python -m deep_research.bench.offload --concurrency 8 --duration 20
+    python -m deep_research.bench.offload --pools none process --workers 4
+"""
+
+import argparse
+import asyncio
+
+from ..tools.workers import POOL_KINDS, configure_cpu_pool
+from .loadtest import LoadTest, LoadTestResult
+from .stubs import StubServers, StubLLM, StubFirecrawl
+
+
+async def compare_pools(
+    pools: list[str],
+    concurrency: int,
+    duration: float,
+    workers: int | None = None,
+    breadth: int = 3,
+    depth: int = 1,
+) -> dict[str, LoadTestResult]:
+    """
+    Run a closed-loop load test per CPU pool kind.
+
+    The stubs must already be running and configured. A short warm-up run
+    per kind starts the pool's workers before measuring.
+
+    Returns:
+        The result of each pool kind
+    """
+    results = {}
+    test = LoadTest(breadth=breadth, depth=depth)
+    try:
+        for kind in pools:
+            configure_cpu_pool(kind, workers, min_bytes=0)
+            await test.closed_loop(concurrency, sessions=concurrency)
+            results[kind] = await test.closed_loop(concurrency, duration=duration)
+    finally:
+        configure_cpu_pool("none")
+    return results
+
+
+def format_comparison(results: dict[str, LoadTestResult]) -> str:
+    """Render loop lag and throughput per pool kind as a text table."""
+    lines = [f"{'pool':<10}{'sessions/min':>14}{'lag p50':>10}{'lag p99':>10}{'lag max':>10}"]
+    for kind, result in results.items():
+        lag = result.loop_lag
+        lines.append(
+            f"{kind:<10}{result.sessions_per_minute:>14.1f}"
+            f"{lag.p50 * 1000:>8.1f}ms{lag.p99 * 1000:>8.1f}ms{lag.max * 1000:>8.1f}ms"
+        )
+    return "\n".join(lines)
+
+
+async def main(argv: list[str] | None = None):
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pools", nargs="+", choices=POOL_KINDS, default=["none", "thread", "process"])
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--breadth", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.3)
+    parser.add_argument("--page-bytes", type=int, default=200_000)
+    args = parser.parse_args(argv)
+
+    stubs = StubServers(
+        llm=StubLLM(latency=args.llm_latency),
+        firecrawl=StubFirecrawl(latency=args.search_latency, page_bytes=args.page_bytes),
+    )
+    with stubs:
+        stubs.configure_environment()
+        results = await compare_pools(
+            args.pools,
+            args.concurrency,
+            args.duration,
+            workers=args.workers,
+            breadth=args.breadth,
+            depth=args.depth,
+        )
+    print(format_comparison(results))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
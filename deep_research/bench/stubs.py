@@ -0,0 +1,509 @@
+"""
+Local stub servers for the LLM and Firecrawl upstreams.
+
+The stubs speak just enough of the OpenAI chat-completions API and the
+Firecrawl v1 API for the research graph to run end to end without network
+access. Responses are deterministic per prompt/query and latencies are
+configurable, which makes them suitable for load tests and benchmarks.
+"""
+
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import threading
+import time
+from collections import OrderedDict
+from aiohttp import web
+
+from ..tools import firecrawl
+
+
+URL_PATTERN = re.compile(r"^URL: (\S+)", re.MULTILINE)
+COUNT_PATTERN = re.compile(r"generate (\d+)", re.IGNORECASE)
+HEADING_PATTERN = re.compile(r"^## (.+)$", re.MULTILINE)
+LEARNING_PATTERN = re.compile(r"^\d+\. ", re.MULTILINE)
+
+# Prompt prefix caching as OpenAI does it: prefixes of at least 1024
+# tokens, matched in 128-token steps (4 characters per token here)
+CACHE_MIN_CHARS = 1024 * 4
+CACHE_STEP_CHARS = 128 * 4
+CACHE_ENTRIES = 50_000
+
+WORDS = (
+    "analysis architecture benchmark capacity deployment efficiency framework "
+    "growth hardware inference latency market model network optimization "
+    "performance platform policy research scaling security software strategy "
+    "throughput training workload adoption regulation supply chain energy"
+).split()
+
+
+def _seed(text: str) -> int:
+    """Stable seed derived from text."""
+    return int.from_bytes(hashlib.blake2b(text.encode(), digest_size=8).digest(), "big")
+
+
+def _sentence(rng: random.Random, words: int = 12) -> str:
+    """Generate a pseudo-random sentence."""
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+class StubLLM:
+    """
+    OpenAI-compatible chat-completions stub.
+
+    The reply is chosen from the system message so that each graph node
+    receives a well-formed response of the shape it expects.
+
+    Args:
+        latency: Time to first token, in seconds
+        jitter: Random extra latency, up to this many seconds
+        seconds_per_token: Generation time per completion token
+        models: Per-model ``(latency, seconds_per_token)`` overrides, to
+            emulate fast and slow model tiers
+
+    Repeated prompt prefixes are reported as cached tokens in the usage,
+    like OpenAI's prompt caching.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.2,
+        jitter: float = 0.05,
+        seconds_per_token: float = 0.0,
+        models: dict[str, tuple[float, float]] | None = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.seconds_per_token = seconds_per_token
+        self.models = models or {}
+        self.requests = 0
+        self._prefixes: OrderedDict[bytes, None] = OrderedDict()
+
+    def cached_chars(self, text: str) -> int:
+        """Length of the longest cached prefix of a prompt; caches the prompt."""
+        hasher = hashlib.blake2b(digest_size=16)
+        data = text.encode()
+        cached = 0
+        position = 0
+        for end in range(CACHE_MIN_CHARS, len(data) + 1, CACHE_STEP_CHARS):
+            hasher.update(data[position:end])
+            position = end
+            digest = hasher.copy().digest()
+            if digest in self._prefixes:
+                self._prefixes.move_to_end(digest)
+                cached = end
+            else:
+                self._prefixes[digest] = None
+        while len(self._prefixes) > CACHE_ENTRIES:
+            self._prefixes.popitem(last=False)
+        return cached
+
+    def reply(self, messages: list[dict]) -> str:
+        """Build the reply content for a list of chat messages."""
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        prompt = "\n".join(m["content"] for m in messages if m["role"] != "system")
+        rng = random.Random(_seed(prompt))
+        match = COUNT_PATTERN.search(prompt)
+        count = int(match.group(1)) if match else 3
+
+        if "query generator" in system:
+            return json.dumps([
+                f"{_sentence(rng, 5)[:-1]} {i}" for i in range(count)
+            ])
+        if "research analyst" in system:
+            urls = URL_PATTERN.findall(prompt) or ["https://example.com/"]
+            return json.dumps({"learnings": [
+                {
+                    "content": _sentence(rng, 20),
+                    "sources": rng.sample(urls, min(2, len(urls))),
+                    "confidence": round(rng.uniform(0.5, 1.0), 2),
+                }
+                for _ in range(5)
+            ]})
+        if "research planner" in system:
+            directions = [
+                {
+                    "goal": _sentence(rng, 8),
+                    "rationale": _sentence(rng, 10),
+                    "priority": i + 1,
+                }
+                for i in range(count)
+            ]
+            if '"queries"' in prompt:
+                directions[0]["queries"] = [
+                    f"{_sentence(rng, 5)[:-1]} {i}" for i in range(count)
+                ]
+            return json.dumps({"directions": directions})
+        if "report outline" in system:
+            learnings = len(LEARNING_PATTERN.findall(prompt))
+            return json.dumps({"sections": [
+                {"heading": _sentence(rng, 3)[:-1], "learnings": list(range(i + 1, learnings + 1, count))}
+                for i in range(count)
+            ]})
+        if "report section" in system:
+            heading = HEADING_PATTERN.findall(prompt)
+            return f"## {heading[-1] if heading else 'Section'}\n\n" + " ".join(_sentence(rng) for _ in range(6))
+        if "research writer" in system:
+            sections = [
+                f"## {_sentence(rng, 3)[:-1]}\n\n" + " ".join(_sentence(rng) for _ in range(8))
+                for _ in range(4)
+            ]
+            return "## Executive Summary\n\n" + _sentence(rng, 30) + "\n\n" + "\n\n".join(sections)
+        if "research assistant" in system:
+            return json.dumps([f"{_sentence(rng, 8)[:-1]}?" for _ in range(count)])
+        return "OK"
+
+    def timing(self, model: str) -> tuple[float, float]:
+        """Latency and seconds per token for a model."""
+        return self.models.get(model, (self.latency, self.seconds_per_token))
+
+    async def _delay(self, completion_tokens: int, model: str):
+        latency, seconds_per_token = self.timing(model)
+        delay = latency + random.uniform(0, self.jitter)
+        delay += completion_tokens * seconds_per_token
+        await asyncio.sleep(delay)
+
+    async def handle_chat(self, request: web.Request) -> web.StreamResponse:
+        """Handle POST /v1/chat/completions."""
+        self.requests += 1
+        body = await request.json()
+        content = self.reply(body.get("messages", []))
+        prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+        prompt_tokens = len(prompt) // 4
+        completion_tokens = max(1, len(content) // 4)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+            "prompt_tokens_details": {"cached_tokens": self.cached_chars(prompt) // 4},
+        }
+        created = int(time.time())
+        model = body.get("model", "stub")
+
+        if not body.get("stream"):
+            await self._delay(completion_tokens, model)
+            return web.json_response({
+                "id": f"chatcmpl-{self.requests}",
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": content},
+                    "finish_reason": "stop",
+                }],
+                "usage": usage,
+            })
+
+        # Server-sent events, one chunk per ~16 characters
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        latency, seconds_per_token = self.timing(model)
+        await asyncio.sleep(latency + random.uniform(0, self.jitter))
+        pieces = [content[i:i + 16] for i in range(0, len(content), 16)]
+        for piece in pieces:
+            chunk = {
+                "id": f"chatcmpl-{self.requests}",
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}],
+            }
+            await response.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            if seconds_per_token:
+                await asyncio.sleep(4 * seconds_per_token)
+        final = {
+            "id": f"chatcmpl-{self.requests}",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+        await response.write(f"data: {json.dumps(final)}\n\n".encode())
+        await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+
+PAGE_HEADER = (
+    "[Skip to main content](#main)\n\n"
+    + "\n".join(f"- [{word.capitalize()}](/{word})" for word in WORDS[:8])
+    + "\n\n![logo](https://stub.example/static/logo.png)\n\n"
+    "We use cookies to improve your experience. [Accept all](#) [Manage preferences](#)"
+)
+PAGE_FOOTER = (
+    "Share this article\n\n## Related articles\n\n"
+    + " | ".join(f"[{word.capitalize()} news](/tag/{word})" for word in WORDS[8:16])
+    + "\n\n© 2024 Stub Media. All rights reserved. [Privacy policy](/privacy) [Terms of use](/terms)"
+)
+
+
+class StubFirecrawl:
+    """
+    Firecrawl v1 stub serving deterministic pages of configurable size.
+
+    Like the real endpoint, a search without scrape options returns links
+    only; the scrape endpoint serves the same page a search returned for a
+    URL, so paged searches see consistent content.
+
+    Args:
+        latency: Response time in seconds
+        jitter: Random extra latency, up to this many seconds
+        page_bytes: Size of each page's markdown
+        boilerplate: Surround the article with navigation, a cookie banner
+            and a footer, as scraped pages have
+        duplicate_rate: Share of search results drawn from a small pool of
+            popular articles, half of them as syndicated copies under
+            another URL
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.3,
+        jitter: float = 0.1,
+        page_bytes: int = 20_000,
+        boilerplate: bool = True,
+        duplicate_rate: float = 0.0,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.page_bytes = page_bytes
+        self.boilerplate = boilerplate
+        self.duplicate_rate = duplicate_rate
+        self.requests = 0
+        # Article served under each syndicated URL, so scrapes match searches
+        self._articles: dict[str, str] = {}
+
+    def page(self, url: str, article: str | None = None) -> dict:
+        """Build a deterministic page for a URL (or for another URL's article)."""
+        rng = random.Random(_seed(article or url))
+        title = _sentence(rng, 6)[:-1]
+        header = f"{PAGE_HEADER}\n\n" if self.boilerplate else ""
+        footer = f"\n\n{PAGE_FOOTER}" if self.boilerplate else ""
+        parts = [f"# {title}\n"]
+        size = len(header) + len(parts[0]) + len(footer)
+        while size < self.page_bytes:
+            paragraph = " ".join(_sentence(rng) for _ in range(5))
+            parts.append(paragraph)
+            size += len(paragraph) + 2
+        body = "\n\n".join(parts)[:max(0, self.page_bytes - len(header) - len(footer))]
+        return {
+            "url": url,
+            "title": title,
+            "markdown": header + body + footer,
+        }
+
+    async def handle_search(self, request: web.Request) -> web.Response:
+        """Handle POST /v1/search."""
+        self.requests += 1
+        body = await request.json()
+        query = body.get("query", "")
+        limit = int(body.get("limit", 5))
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        slug = hashlib.blake2b(query.encode(), digest_size=6).hexdigest()
+        rng = random.Random(_seed(query))
+        data = []
+        for i in range(limit):
+            url = f"https://stub.example/{slug}/{i}"
+            if rng.random() < self.duplicate_rate:
+                popular = f"https://popular.example/{rng.randrange(10)}"
+                if rng.random() < 0.5:
+                    self._articles[url] = popular
+                    data.append(self.page(url, article=popular))
+                else:
+                    data.append(self.page(popular))
+            else:
+                data.append(self.page(url))
+        if "scrapeOptions" not in body:
+            # Links only, as without scrape options upstream
+            data = [
+                {"url": page["url"], "title": page["title"], "description": page["markdown"][:160]}
+                for page in data
+            ]
+        return web.json_response({"success": True, "data": data})
+
+    async def handle_scrape(self, request: web.Request) -> web.Response:
+        """Handle POST /v1/scrape."""
+        self.requests += 1
+        body = await request.json()
+        await asyncio.sleep(self.latency + random.uniform(0, self.jitter))
+        url = body.get("url", "")
+        page = self.page(url, article=self._articles.get(url))
+        return web.json_response({
+            "success": True,
+            "data": {"markdown": page["markdown"], "title": page["title"]},
+        })
+
+
+class StubServers:
+    """
+    Run the LLM and Firecrawl stubs on a background event loop.
+
+    The stubs get their own thread so that their CPU time does not show up
+    as event-loop lag in the process under test.
+
+    Example:
+        with StubServers() as stubs:
+            stubs.configure_environment()
+            agent = DeepResearchAgent(breadth=2, depth=1)
+            ...
+    """
+
+    def __init__(
+        self,
+        llm: StubLLM | None = None,
+        firecrawl: StubFirecrawl | None = None,
+        host: str = "127.0.0.1",
+    ):
+        self.llm = llm or StubLLM()
+        self.firecrawl = firecrawl or StubFirecrawl()
+        self.host = host
+        self.llm_url = ""
+        self.firecrawl_url = ""
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._thread: threading.Thread | None = None
+        self._runners: list[web.AppRunner] = []
+
+    async def _start_app(self, routes: list[web.RouteDef]) -> str:
+        app = web.Application(client_max_size=64 * 1024 * 1024)
+        app.add_routes(routes)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, 0)
+        await site.start()
+        self._runners.append(runner)
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{self.host}:{port}"
+
+    async def _start(self):
+        self.llm_url = await self._start_app([
+            web.post("/v1/chat/completions", self.llm.handle_chat),
+        ])
+        self.firecrawl_url = await self._start_app([
+            web.post("/v1/search", self.firecrawl.handle_search),
+            web.post("/v1/scrape", self.firecrawl.handle_scrape),
+        ])
+
+    async def _stop(self):
+        for runner in self._runners:
+            await runner.cleanup()
+        self._runners.clear()
+
+    def start(self) -> "StubServers":
+        """Start both servers and block until they accept connections."""
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="stub-servers",
+            daemon=True,
+        )
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._start(), self._loop).result()
+        return self
+
+    def stop(self):
+        """Stop both servers and the background loop."""
+        if self._loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._stop(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = None
+
+    def environment(self) -> dict[str, str]:
+        """Environment variables that point the agent at the stubs."""
+        return {
+            "LLM_PROVIDER": "openai",
+            "OPENAI_API_KEY": "stub",
+            "OPENAI_ENDPOINT": f"{self.llm_url}/v1",
+            "FIRECRAWL_API_KEY": "stub",
+            "FIRECRAWL_BASE_URL": self.firecrawl_url,
+        }
+
+    def configure_environment(self):
+        """Point the current process at the stubs."""
+        os.environ.update(self.environment())
+        # The Firecrawl singleton caches its base URL on first use
+        firecrawl._firecrawl_client = None
+
+    def __enter__(self) -> "StubServers":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _serve(llm: StubLLM, firecrawl_stub: StubFirecrawl, host: str, connection):
+    """Subprocess body of StubProcess: serve until told to stop."""
+    with StubServers(llm, firecrawl_stub, host) as stubs:
+        connection.send(stubs.environment())
+        connection.recv()
+
+
+class StubProcess:
+    """
+    Run the LLM and Firecrawl stubs in a child process.
+
+    Like ``StubServers``, for measurements that would otherwise count the
+    stubs' own work: tracemalloc traces every thread of the process, so
+    in-process stubs add their pages and buffers to the memory measured.
+    """
+
+    def __init__(
+        self,
+        llm: StubLLM | None = None,
+        firecrawl: StubFirecrawl | None = None,
+        host: str = "127.0.0.1",
+    ):
+        self.llm = llm or StubLLM()
+        self.firecrawl = firecrawl or StubFirecrawl()
+        self.host = host
+        self._environment: dict[str, str] = {}
+        self._process: multiprocessing.process.BaseProcess | None = None
+        self._connection = None
+
+    def start(self) -> "StubProcess":
+        """Start the child process and block until the stubs accept connections."""
+        context = multiprocessing.get_context("spawn")
+        self._connection, child = context.Pipe()
+        self._process = context.Process(
+            target=_serve,
+            args=(self.llm, self.firecrawl, self.host, child),
+            name="stub-servers",
+            daemon=True,
+        )
+        self._process.start()
+        self._environment = self._connection.recv()
+        return self
+
+    def stop(self):
+        """Stop the stubs and wait for the child process to exit."""
+        if self._process is None:
+            return
+        self._connection.send("stop")
+        self._process.join(timeout=10)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._connection.close()
+        self._process = None
+
+    def environment(self) -> dict[str, str]:
+        """Environment variables that point the agent at the stubs."""
+        return dict(self._environment)
+
+    def configure_environment(self):
+        """Point the current process at the stubs."""
+        os.environ.update(self.environment())
+        firecrawl._firecrawl_client = None
+
+    def __enter__(self) -> "StubProcess":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
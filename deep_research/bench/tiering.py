@@ -0,0 +1,138 @@
+"""
+End-to-end latency across per-stage model profiles.
+
+Runs the same research sessions once per profile set and compares
+end-to-end and per-node latency. By default the sessions run against the
+local stubs, which emulate a fast "small" and a slow "large" model; with
+``--live`` they use the configured providers instead.
+
+Built-in profile sets:
+    large   Every stage on the large model
+    small   Every stage on the small model
+    tiered  Small model everywhere except generate_report
+
+Usage:
+    python -m deep_research.bench.tiering --sessions 5
+    python -m deep_research.bench.tiering --live --small-model gpt-4o-mini --large-model gpt-4o
+    python -m deep_research.bench.tiering --profiles profiles.json
+
+A profiles file maps set names to ``{stage: {"provider", "model", "max_tokens", "timeout"}}``.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import time
+
+from ..agent import DeepResearchAgent
+from ..state import GraphConfig, ModelProfile
+from .loadtest import NodeTimingHandler, LatencySummary, TOPICS
+from .stubs import StubServers, StubLLM, StubFirecrawl
+
+
+STAGES = (
+    "follow_up_questions",
+    "generate_queries",
+    "extract_learnings",
+    "generate_directions",
+    "report_outline",
+    "generate_report",
+)
+NODES = {
+    "generate_queries": "queries",
+    "search": "search",
+    "process_results": "process",
+    "generate_report": "report",
+}
+
+
+def builtin_profile_sets(small: str, large: str) -> dict[str, dict[str, ModelProfile]]:
+    """The large, small and tiered profile sets for two models."""
+    return {
+        "large": {stage: ModelProfile(model=large) for stage in STAGES},
+        "small": {stage: ModelProfile(model=small) for stage in STAGES},
+        "tiered": {
+            stage: ModelProfile(model=large if stage == "generate_report" else small)
+            for stage in STAGES
+        },
+    }
+
+
+async def run_profile_set(
+    profiles: dict[str, ModelProfile],
+    sessions: int,
+    breadth: int,
+    depth: int,
+) -> tuple[LatencySummary, dict[str, LatencySummary]]:
+    """Run sessions one after another with a profile set."""
+    agent = DeepResearchAgent(
+        breadth=breadth,
+        depth=depth,
+        config=GraphConfig(model_profiles=profiles),
+    )
+    handler = NodeTimingHandler()
+    latencies = []
+    for i in range(sessions):
+        t0 = time.perf_counter()
+        with open(os.devnull, "w") as sink, contextlib.redirect_stdout(sink):
+            await agent.run_async(TOPICS[i % len(TOPICS)], skip_follow_up=True, callbacks=[handler])
+        latencies.append(time.perf_counter() - t0)
+    nodes = {node: LatencySummary.of(values) for node, values in handler.durations.items()}
+    return LatencySummary.of(latencies), nodes
+
+
+async def main(argv: list[str] | None = None):
+    """CLI entry point."""
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--sessions", type=int, default=5)
+    parser.add_argument("--breadth", type=int, default=3)
+    parser.add_argument("--depth", type=int, default=1)
+    parser.add_argument("--small-model", default="stub-small")
+    parser.add_argument("--large-model", default="stub-large")
+    parser.add_argument("--profiles", help="JSON file with profile sets")
+    parser.add_argument("--live", action="store_true", help="Use the configured providers")
+    args = parser.parse_args(argv)
+
+    if args.profiles:
+        with open(args.profiles, encoding="utf-8") as f:
+            profile_sets = {
+                name: {stage: ModelProfile(**profile) for stage, profile in stages.items()}
+                for name, stages in json.load(f).items()
+            }
+    else:
+        profile_sets = builtin_profile_sets(args.small_model, args.large_model)
+
+    stubs = None
+    if not args.live:
+        stubs = StubServers(
+            llm=StubLLM(models={
+                args.small_model: (0.15, 0.0005),
+                args.large_model: (0.6, 0.002),
+            }),
+            firecrawl=StubFirecrawl(latency=0.2),
+        )
+        stubs.start()
+        stubs.configure_environment()
+
+    try:
+        header = f"{'profiles':<12}{'e2e p50':>9}{'e2e p95':>9}" + "".join(
+            f"{label + ' p50':>13}" for label in NODES.values()
+        )
+        print(header)
+        for name, profiles in profile_sets.items():
+            end_to_end, nodes = await run_profile_set(
+                profiles, args.sessions, args.breadth, args.depth
+            )
+            print(
+                f"{name:<12}{end_to_end.p50:>9.2f}{end_to_end.p95:>9.2f}"
+                + "".join(f"{nodes.get(node, LatencySummary()).p50:>13.2f}" for node in NODES)
+            )
+    finally:
+        if stubs:
+            stubs.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,228 @@
+"""
+Run-scoped context shared by the nodes of one research run.
+
+Graph state holds the research data; the run context holds live objects
+that belong to a single run but are not part of its data, such as
+in-flight prefetch tasks. It is stored in a context variable, which asyncio
+copies into every node task, so nodes and tools can reach it without extra
+parameters.
+
+The run context also keeps the run's deadline. Research stages (searches,
+query generation, extraction) must finish a reserve of time before it, the
+report stages before the deadline itself. Tools wrap their calls in
+``time_limit``, which cancels the calling task when the time left runs
+out, so calls in flight are cut off when time runs out or the run is
+stopped.
+"""
+
+import asyncio
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import AsyncIterator, Iterator
+
+from .state import GraphConfig
+from .tools.knowledge import KnowledgeBase
+from .tools.prefetch import SearchPrefetcher
+from .tools.queries import QueryRegistry
+from .utils.dedup import MinHashIndex, SourceIndex
+
+
+# Stages allowed to run into the time reserved for the report
+REPORT_STAGES = frozenset({"report_outline", "generate_report"})
+
+
+class _CutoffScope:
+    """
+    Cancels the task that entered it at a loop time, like the
+    ``asyncio.timeout`` of Python 3.11+ (which 3.10 lacks).
+    
+    Args:
+        when: ``loop.time()`` of the cut-off, or None for no cut-off
+    """
+    
+    def __init__(self, when: float | None):
+        self._loop = asyncio.get_running_loop()
+        self._task = asyncio.current_task()
+        self._handle: asyncio.TimerHandle | None = None
+        self._expired = False
+        self.reschedule(when)
+    
+    def expired(self) -> bool:
+        """Whether the cut-off has cancelled the task."""
+        return self._expired
+    
+    def reschedule(self, when: float | None):
+        """Move the cut-off (None: remove it)."""
+        self.close()
+        if when is not None and not self._expired:
+            self._handle = self._loop.call_at(when, self._cut_off)
+    
+    def close(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+    
+    def _cut_off(self):
+        self._handle = None
+        self._expired = True
+        self._task.cancel()
+
+
+class RunContext:
+    """
+    Live, run-scoped objects for one research run.
+    
+    Args:
+        config: Graph configuration of the run
+        
+    Attributes:
+        session_id: Identifies the run, e.g. for fair rate limiting
+        prefetcher: Speculative searches started ahead of search_node
+        content_index: Pages seen so far, for near-duplicate detection
+        source_index: Sources already analyzed, with their learnings
+        query_registry: Queries searched so far, with their results
+        knowledge: Knowledge base shared across runs, if configured
+        scraped: Pages fetched by deep_scrape so far, by URL
+        deadline: ``time.monotonic()`` by which the report must be ready,
+            if the run has a deadline
+    """
+    
+    def __init__(self, config: GraphConfig | None = None):
+        self.config = config or GraphConfig()
+        self.session_id = uuid.uuid4().hex
+        self.prefetcher = SearchPrefetcher(
+            num_results=self.config.search_page_size,
+            concurrency_limit=self.config.concurrency_limit,
+            min_overlap=self.config.prefetch_min_overlap,
+            since=self.config.search_since,
+        )
+        self.content_index = MinHashIndex(
+            threshold=self.config.near_duplicate_threshold or 1.0,
+        )
+        self.source_index = SourceIndex()
+        self.query_registry = QueryRegistry(
+            threshold=self.config.query_dedup_threshold or 1.0,
+        )
+        self.knowledge = None
+        if self.config.knowledge_base:
+            max_age = self.config.knowledge_max_age_hours * 3600
+            if self.config.search_since:
+                # Nothing fetched before the cut-off counts as new material
+                since = datetime.combine(self.config.search_since, datetime.min.time())
+                max_age = min(max_age, max(0.0, (datetime.now() - since).total_seconds()))
+            self.knowledge = KnowledgeBase(self.config.knowledge_base, max_age=max_age)
+        
+        self.deadline = None
+        self.report_reserve = 0.0
+        if self.config.deadline_seconds:
+            self.deadline = time.monotonic() + self.config.deadline_seconds
+            # Leave research at least half of a short deadline
+            self.report_reserve = min(self.config.report_reserve_seconds, self.config.deadline_seconds / 2)
+        self.scraped: dict[str, dict] = {}
+        self.stopped = False
+        # Seconds spent waiting for Firecrawl to recover from an outage
+        self.outage_waited = 0.0
+        self._research_scopes: set[_CutoffScope] = set()
+    
+    def time_left(self, stage: str | None = None) -> float | None:
+        """
+        Seconds a stage has left, or None if it is not limited.
+        
+        Report stages may use the time up to the deadline; every other
+        stage must leave the report reserve, and has none left once the
+        run is stopped.
+        """
+        if stage in REPORT_STAGES:
+            return None if self.deadline is None else max(0.0, self.deadline - time.monotonic())
+        if self.stopped:
+            return 0.0
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.report_reserve - time.monotonic())
+    
+    def out_of_time(self) -> bool:
+        """Whether research must stop and the report be written."""
+        return self.time_left() == 0.0
+    
+    @asynccontextmanager
+    async def time_limit(self, stage: str | None = None) -> AsyncIterator[None]:
+        """
+        Cut off the ``async with`` block when the stage runs out of time.
+        
+        Raises:
+            TimeoutError: If the time runs out, or the run is stopped
+                during a research stage
+        """
+        left = self.time_left(stage)
+        scope = _CutoffScope(None if left is None else asyncio.get_running_loop().time() + left)
+        if stage not in REPORT_STAGES:
+            self._research_scopes.add(scope)
+        try:
+            yield
+        except asyncio.CancelledError as e:
+            if not scope.expired():
+                raise
+            task = asyncio.current_task()
+            if hasattr(task, "uncancel"):
+                # Python 3.11+: the cancellation is handled here
+                task.uncancel()
+            reason = "the run was stopped" if self.stopped and stage not in REPORT_STAGES else "out of time"
+            raise TimeoutError(f"{stage or 'Call'} cut off: {reason}") from e
+        finally:
+            scope.close()
+            self._research_scopes.discard(scope)
+    
+    def stop(self):
+        """
+        Stop researching and go on to the report with what has been learned.
+        
+        Searches and LLM calls of research stages in flight are cut off;
+        remaining depths are skipped.
+        """
+        self.stopped = True
+        self.prefetcher.cancel_all()
+        for scope in list(self._research_scopes):
+            if not scope.expired():
+                scope.reschedule(asyncio.get_running_loop().time())
+    
+    async def aclose(self):
+        """Release anything still running when the run ends."""
+        self.prefetcher.cancel_all()
+        if self.knowledge is not None:
+            self.knowledge.close()
+
+
+_current_run: ContextVar[RunContext | None] = ContextVar(
+    "deep_research_run_context",
+    default=None,
+)
+
+
+def get_run_context() -> RunContext | None:
+    """The context of the run in progress, or None outside of a run."""
+    return _current_run.get()
+
+
+@contextmanager
+def run_context(context: RunContext | None = None) -> Iterator[RunContext]:
+    """Make a run context current for the duration of the ``with`` block."""
+    context = context or RunContext()
+    token = _current_run.set(context)
+    try:
+        yield context
+    finally:
+        _current_run.reset(token)
+
+
+@asynccontextmanager
+async def time_limit(stage: str | None = None) -> AsyncIterator[None]:
+    """``RunContext.time_limit`` of the run in progress; no limit outside of a run."""
+    context = get_run_context()
+    if context is None:
+        yield
+        return
+    async with context.time_limit(stage):
+        yield
@@ -2,18 +2,28 @@
 LangGraph workflow definition for the Deep Research agent.
 """
 
+import asyncio
 from typing import Literal
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 
-from .state import ResearchState
+from .context import get_run_context
+from .state import ResearchState, GraphConfig
+from .tools import get_breaker
+from .observability import instrument_node
 from .nodes import (
     generate_queries_node,
     search_node,
+    deep_scrape_node,
     process_results_node,
     generate_report_node,
 )
 
 
+# Shortest wait before searching again during a Firecrawl outage
+MIN_OUTAGE_WAIT = 1.0
+
+
 def should_continue_research(state: ResearchState) -> Literal["continue", "report"]:
     """
     Conditional edge: Decide whether to continue research or generate report.
@@ -24,12 +34,108 @@ def should_continue_research(state: ResearchState) -> Literal["continue", "repor
     Returns:
         "continue" to do another research iteration, "report" to generate final report
     """
+    if _out_of_time():
+        if state["current_depth"] < state["depth"]:
+            print("\n⏱️ Out of research time; skipping the remaining depths")
+        return "report"
+    
     # Check if we have next directions and haven't exceeded depth
     if state["current_depth"] < state["depth"] and state.get("next_directions"):
         return "continue"
     return "report"
 
 
+def route_after_search(
+    state: ResearchState,
+    config: RunnableConfig | None = None,
+) -> Literal["process_results", "deep_scrape", "wait", "report"]:
+    """
+    Conditional edge: Decide what to do after the searches.
+    
+    Results go to process_results, through deep_scrape first when that
+    stage is enabled.
+    
+    When research time is up, results of a search the deadline cut short
+    would only reach the report through extraction calls there is no time
+    left for. When the searches returned nothing because Firecrawl's
+    circuit breaker is open (cached and stored results having been tried
+    in search_node), the run waits for the breaker to let a trial search
+    through if that fits the run's outage wait budget and deadline, and
+    otherwise goes on to the report.
+    
+    Args:
+        state: Current research state
+        config: Graph run configuration
+        
+    Returns:
+        "report" if the run is out of research time or cannot wait out a
+        Firecrawl outage, "wait" to search again once Firecrawl may be
+        back, "deep_scrape" or "process_results" otherwise
+    """
+    if _out_of_time():
+        print("\n⏱️ Out of research time; writing the report from the learnings so far")
+        return "report"
+    breaker = get_breaker("firecrawl")
+    if state.get("search_results") or breaker.state == "closed":
+        if state.get("search_results") and GraphConfig.from_runnable_config(config).deep_scrape_top_k:
+            return "deep_scrape"
+        return "process_results"
+    
+    context = get_run_context()
+    wait = max(breaker.retry_in(), MIN_OUTAGE_WAIT)
+    if context is not None:
+        time_left = context.time_left()
+        budget = context.config.outage_max_wait_seconds - context.outage_waited
+        if wait <= budget and (time_left is None or wait < time_left):
+            print(f"\n🔌 Firecrawl is unavailable; retrying in {wait:.0f}s")
+            return "wait"
+    print("\n🔌 Firecrawl is unavailable; writing the report from the learnings so far")
+    return "report"
+
+
+async def wait_for_search(state: ResearchState) -> dict:
+    """
+    Wait until Firecrawl's circuit breaker lets a trial search through.
+    
+    The search queries stay in the state, so search runs them again.
+    
+    Args:
+        state: Current research state
+        
+    Returns:
+        No state update
+    """
+    wait = max(get_breaker("firecrawl").retry_in(), MIN_OUTAGE_WAIT)
+    context = get_run_context()
+    if context is not None:
+        context.outage_waited += wait
+    await asyncio.sleep(wait)
+    return {}
+
+
+def _out_of_time() -> bool:
+    context = get_run_context()
+    return context is not None and context.out_of_time()
+
+
+def route_after_prepare(state: ResearchState) -> Literal["generate_queries", "search"]:
+    """
+    Conditional edge: Skip query generation when queries are already planned.
+    
+    In fused planning mode the next direction arrives with its search
+    queries, which prepare_next_iteration puts straight into the state.
+    
+    Args:
+        state: Current research state
+        
+    Returns:
+        "search" if search queries are ready, "generate_queries" otherwise
+    """
+    if state.get("search_queries"):
+        return "search"
+    return "generate_queries"
+
+
 def prepare_next_iteration(state: ResearchState) -> dict:
     """
     Prepare state for the next research iteration.
@@ -38,6 +144,7 @@ def prepare_next_iteration(state: ResearchState) -> dict:
     1. Increments the depth counter
     2. Sets the next research goal from directions
     3. Clears previous iteration data
+    4. Carries over the direction's planned queries (fused planning mode)
     
     Args:
         state: Current research state
@@ -53,6 +160,7 @@ def prepare_next_iteration(state: ResearchState) -> dict:
     
     # Take the highest priority direction (first one, as they're sorted)
     next_goal = next_directions[0].goal
+    planned_queries = next_directions[0].queries[:state["breadth"]]
     
     print(f"\n🔄 Moving to depth {state['current_depth'] + 1}")
     print(f"📍 Next goal: {next_goal}")
@@ -60,7 +168,7 @@ def prepare_next_iteration(state: ResearchState) -> dict:
     return {
         "current_depth": state["current_depth"] + 1,
         "current_goal": next_goal,
-        "search_queries": [],  # Clear for next iteration
+        "search_queries": planned_queries,  # Empty unless planned with the direction
         "search_results": [],  # Clear for next iteration
     }
 
@@ -75,17 +183,26 @@ def create_research_graph() -> StateGraph:
       ↓
     generate_queries
       ↓
-    search
-      ↓
-    process_results
-      ↓
-    [should_continue_research?]
-      ↓              ↓
-    continue      report
+    search ⇄ wait_for_search ───┐
+      ↓                         │ (out of time,
+    [deep_scrape]               │  Firecrawl down)
+      ↓                         │
+    process_results             │
+      ↓                         │
+    [should_continue_research?] │
+      ↓              ↓          │
+    continue      report ←──────┘
       ↓              ↓
     prepare_next → END
       ↓
-    (loop back to generate_queries)
+    (loop back to generate_queries, or straight to search
+     when fused planning already produced the queries)
+    
+    With a run deadline, research stops when its time is up and the graph
+    goes on to the report with the learnings so far. When searches fail
+    because Firecrawl is down, the graph waits for it within the outage
+    wait budget, or goes on to the report. The deep_scrape stage runs only
+    when enabled (``deep_scrape_top_k``).
     
     Returns:
         Compiled StateGraph ready for execution
@@ -93,19 +210,36 @@ def create_research_graph() -> StateGraph:
     # Create the graph
     workflow = StateGraph(ResearchState)
     
-    # Add nodes
-    workflow.add_node("generate_queries", generate_queries_node)
-    workflow.add_node("search", search_node)
-    workflow.add_node("process_results", process_results_node)
-    workflow.add_node("prepare_next", prepare_next_iteration)
-    workflow.add_node("generate_report", generate_report_node)
+    # Add nodes (each wrapped for tracing)
+    nodes = {
+        "generate_queries": generate_queries_node,
+        "search": search_node,
+        "deep_scrape": deep_scrape_node,
+        "process_results": process_results_node,
+        "prepare_next": prepare_next_iteration,
+        "wait_for_search": wait_for_search,
+        "generate_report": generate_report_node,
+    }
+    for name, node in nodes.items():
+        workflow.add_node(name, instrument_node(name, node))
     
     # Set entry point
     workflow.set_entry_point("generate_queries")
     
     # Add edges
     workflow.add_edge("generate_queries", "search")
-    workflow.add_edge("search", "process_results")
+    workflow.add_conditional_edges(
+        "search",
+        route_after_search,
+        {
+            "process_results": "process_results",
+            "deep_scrape": "deep_scrape",
+            "wait": "wait_for_search",
+            "report": "generate_report",
+        }
+    )
+    workflow.add_edge("wait_for_search", "search")
+    workflow.add_edge("deep_scrape", "process_results")
     
     # Add conditional edge: continue research or generate report
     workflow.add_conditional_edges(
@@ -118,7 +252,14 @@ def create_research_graph() -> StateGraph:
     )
     
     # Loop back for next iteration
-    workflow.add_edge("prepare_next", "generate_queries")
+    workflow.add_conditional_edges(
+        "prepare_next",
+        route_after_prepare,
+        {
+            "generate_queries": "generate_queries",
+            "search": "search",
+        }
+    )
     
     # End after report
     workflow.add_edge("generate_report", END)
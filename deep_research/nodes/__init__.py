@@ -2,12 +2,14 @@
 
 from .generate_queries import generate_queries_node
 from .search import search_node
+from .deep_scrape import deep_scrape_node
 from .process_results import process_results_node
 from .generate_report import generate_report_node
 
 __all__ = [
     "generate_queries_node",
     "search_node",
+    "deep_scrape_node",
     "process_results_node",
     "generate_report_node",
 ]
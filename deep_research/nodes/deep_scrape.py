@@ -0,0 +1,120 @@
+"""
+Deep-scrape node for the research graph (optional stage).
+"""
+
+import os
+from langchain_core.runnables import RunnableConfig
+
+from ..context import get_run_context
+from ..state import ResearchState, GraphConfig
+from ..tools import get_firecrawl_client
+from ..tools.workers import run_cpu
+from ..utils import clean_pages
+from ..observability import record_cache
+from .search import query_coverage
+
+
+def rank_results(search_results: list[dict]) -> list[dict]:
+    """
+    Results worth a deep scrape, most relevant first.
+    
+    Results are ranked by their query coverage (see ``query_coverage``),
+    then by their position among the results of their query. Collapsed
+    near-duplicates and results without a URL are left out.
+    """
+    candidates = []
+    positions: dict[str, int] = {}
+    for result in search_results:
+        position = positions[result["query"]] = positions.get(result["query"], -1) + 1
+        if result.get("url") and not result.get("duplicate_of"):
+            candidates.append((-query_coverage(result["query"], result), position, result))
+    return [result for *_, result in sorted(candidates, key=lambda c: c[:2])]
+
+
+async def deep_scrape_node(
+    state: ResearchState,
+    config: RunnableConfig | None = None,
+) -> dict:
+    """
+    Fetch the full pages of the most relevant results of the iteration.
+    
+    This node:
+    1. Ranks the iteration's search results by relevance to their queries
+    2. Takes the top ``deep_scrape_top_k`` of them not analyzed earlier in
+       the run
+    3. Scrapes those not already scraped in the run concurrently, over one
+       connection pool and within the per-host limit
+    4. Replaces a result's content with the cleaned full page when that is
+       longer and no near-duplicate of another page seen in the run, and
+       marks the result so extraction sees more of it
+    
+    Args:
+        state: Current research state
+        config: Graph run configuration
+        
+    Returns:
+        Updated state with search_results
+    """
+    graph_config = GraphConfig.from_runnable_config(config)
+    context = get_run_context()
+    search_results = state.get("search_results", [])
+    source_index = context.source_index if context else None
+    
+    # Sources analyzed earlier contribute their learnings without extraction
+    ranked = [
+        result for result in rank_results(search_results)
+        if source_index is None or source_index.lookup(url=result["url"]) is None
+    ][:graph_config.deep_scrape_top_k]
+    if not ranked:
+        return {}
+    
+    cache = context.scraped if context else {}
+    urls = [result["url"] for result in ranked]
+    for url in urls:
+        record_cache("deep_scrape", url in cache)
+    missing = [url for url in urls if url not in cache]
+    print(f"\n🔬 Deep-scraping {len(missing)} of the top {len(urls)} results...")
+    
+    if missing:
+        pages = await get_firecrawl_client().batch_scrape(
+            missing,
+            concurrency_limit=int(os.getenv("CONCURRENCY_LIMIT", "3")),
+            per_host_limit=graph_config.deep_scrape_per_host,
+        )
+        if graph_config.clean_content and pages:
+            # Full pages are the largest payloads of the run: clean them in
+            # one task of the CPU pool
+            contents = [page["content"] for page in pages.values()]
+            cleaned, _ = await run_cpu(clean_pages, contents, list(pages), {}, size=sum(map(len, contents)))
+            for page, content in zip(pages.values(), cleaned):
+                page["content"] = content
+        cache.update(pages)
+    
+    index = context.content_index if context and graph_config.near_duplicate_threshold else None
+    scraped = {url: cache[url] for url in urls if url in cache}
+    signatures = [None] * len(scraped)
+    if index is not None and scraped:
+        contents = [page["content"] for page in scraped.values()]
+        signatures = await run_cpu(index.hasher, contents, size=sum(map(len, contents)))
+    deepened = {}
+    for (url, page), signature in zip(scraped.items(), signatures):
+        if signature is not None and any(key != url for key, _ in index.query(signature)):
+            continue
+        deepened[url] = page
+    
+    updated = []
+    replaced = 0
+    for result in search_results:
+        page = None if result.get("duplicate_of") else deepened.get(result["url"])
+        if page is not None and len(page["content"]) > len(result.get("content") or ""):
+            result = {
+                **result,
+                "title": result["title"] or page["title"],
+                "content": page["content"],
+                "deep": True,
+            }
+            replaced += 1
+        updated.append(result)
+    print(f"✅ Deepened {replaced} results")
+    
+    return {"search_results": updated}
@@ -2,30 +2,46 @@
 Generate search queries node for the research graph.
 """
 
-import json
+import asyncio
+
 from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.runnables import RunnableConfig
 
-from ..state import ResearchState
+from ..context import get_run_context
+from ..state import ResearchState, GraphConfig
 from ..tools import LLMProvider
 from ..utils import (
     GENERATE_QUERIES_PROMPT,
     format_learnings,
     format_context,
-    extract_json_from_text,
+    parse_json,
+    json_items,
 )
 
 
-async def generate_queries_node(state: ResearchState) -> dict:
+# Learnings taken from the knowledge base for the query prompt
+KNOWLEDGE_LEARNINGS = 10
+
+
+async def generate_queries_node(
+    state: ResearchState,
+    config: RunnableConfig | None = None,
+) -> dict:
     """
     Generate search queries based on current research goal.
     
     This node:
     1. Takes the current research goal
-    2. Considers previous learnings if available
+    2. Considers previous learnings (and the knowledge base's) if available
     3. Generates diverse search queries using LLM
+    4. Replaces queries that repeat one searched earlier in the run
+    
+    In streaming mode, each query starts searching as soon as it has been
+    parsed, and generation stops once ``breadth`` queries are complete.
     
     Args:
         state: Current research state
+        config: Graph run configuration
         
     Returns:
         Updated state with search_queries
@@ -39,23 +55,61 @@ async def generate_queries_node(state: ResearchState) -> dict:
         total_depth=state["depth"],
     )
     
+    graph_config = GraphConfig.from_runnable_config(config)
+    run = get_run_context()
+    
+    # Learnings of this run, and of earlier runs on the topic, steer the
+    # queries toward what is not known yet
+    known = list(state.get("learnings", []))
+    if run and run.knowledge is not None:
+        stored = await asyncio.to_thread(
+            run.knowledge.find_learnings, state["current_goal"], limit=KNOWLEDGE_LEARNINGS,
+        )
+        if stored:
+            print(f"  📚 Found {len(stored)} learnings on this goal in the knowledge base")
+        known += [learning for learning in stored if learning not in known]
+    
     # Format previous learnings if available
     previous_learnings = ""
-    if state.get("learnings"):
-        learnings_text = format_learnings(state["learnings"])
-        previous_learnings = f"\nPrevious Learnings:\n{learnings_text}\n\nBuild on these learnings and explore new angles."
+    if known:
+        learnings_text = format_learnings(known)
+        previous_learnings = f"\nPrevious Learnings:\n{learnings_text}\n\nBuild on these learnings and explore new angles.\n"
+    
+    registry = run.query_registry if run and graph_config.query_dedup_threshold else None
+    
+    # Queries searched earlier in the run are listed for the model to avoid;
+    # a few spare queries replace those that still repeat one
+    searched_queries = ""
+    requested = state["breadth"]
+    if registry is not None and len(registry):
+        searched = "\n".join(f"- {query}" for query in registry.queries)
+        searched_queries = f"\nAlready Searched (do not repeat or rephrase these):\n{searched}\n"
+        requested += (state["breadth"] + 1) // 2
+    
+    accepted: list[str] = []
+    
+    def is_new(query) -> bool:
+        if not isinstance(query, str) or not query.strip():
+            return False
+        if registry is not None:
+            repeated = registry.match(query, among=accepted)
+            if repeated is not None:
+                print(f"  ↩️ Dropped near-duplicate query: {query} (~ {repeated})")
+                return False
+        accepted.append(query)
+        return True
     
     # Build prompt
     prompt = GENERATE_QUERIES_PROMPT.format(
         goal=state["current_goal"],
-        breadth=state["breadth"],
+        breadth=requested,
         context=context,
         previous_learnings=previous_learnings,
+        searched_queries=searched_queries,
     )
     
     # Get LLM and generate queries
-    llm_provider = LLMProvider()
-    llm = llm_provider.get_structured_llm()
+    llm_provider = LLMProvider.from_profile(graph_config.profile_for("generate_queries"))
     
     messages = [
         SystemMessage(content="You are a research query generator. Return only valid JSON."),
@@ -63,18 +117,32 @@ async def generate_queries_node(state: ResearchState) -> dict:
     ]
     
     try:
-        response = await llm.ainvoke(messages)
-        
-        # Parse JSON response
-        content = extract_json_from_text(response.content)
-        queries = json.loads(content)
-        
-        # Ensure we have a list
-        if isinstance(queries, dict) and "queries" in queries:
-            queries = queries["queries"]
+        if graph_config.streaming_json:
+            def start_search(query):
+                # search_node claims the running search by exact match
+                if run:
+                    run.prefetcher.prefetch([query])
+            
+            queries = await llm_provider.astream_json(
+                messages,
+                key="queries",
+                limit=state["breadth"],
+                on_item=start_search,
+                keep=is_new,
+                stage="generate_queries",
+                temperature=0.3,
+            )
+        else:
+            response = await llm_provider.ainvoke(
+                messages,
+                stage="generate_queries",
+                temperature=0.3,
+            )
+            queries = [q for q in json_items(parse_json(response.content), "queries") if is_new(q)]
         
         # Validate
-        if not isinstance(queries, list):
+        queries = [q for q in queries if isinstance(q, str) and q.strip()]
+        if not queries:
             print("⚠️ Invalid response format, using fallback queries")
             queries = [state["current_goal"]]
         
@@ -2,85 +2,389 @@
 Generate final report node.
 """
 
+import asyncio
+
+from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from ..state import ResearchState
-from ..tools import LLMProvider
+from ..state import ResearchState, GraphConfig, Learning, Source
+from ..tools import CircuitOpenError, LLMProvider, count_tokens
 from ..utils import (
     GENERATE_REPORT_PROMPT,
+    REFRESH_SECTION_PROMPT,
+    REPORT_OUTLINE_PROMPT,
+    REPORT_SECTION_PROMPT,
     format_learnings,
     format_sources,
+    format_appendix,
     format_context,
     create_report_header,
+    split_sections,
+    join_sections,
+    assign_to_sections,
+    parse_json,
+    json_items,
+    select_learnings,
 )
 
 
-async def generate_report_node(state: ResearchState) -> dict:
+# Heading of the section that takes new learnings fitting no existing one
+NEW_FINDINGS_HEADING = "Recent Developments"
+SOURCES_HEADING = "Sources"
+
+# Sectioned reports: body sections are planned by an outline call, the
+# summary and conclusion are written alongside them from all learnings
+SUMMARY_HEADING = "Executive Summary"
+CONCLUSION_HEADING = "Conclusion and Next Steps"
+OTHER_FINDINGS_HEADING = "Other Findings"
+LEARNINGS_PER_SECTION = 4
+MAX_SECTIONS = 8
+SECTION_INSTRUCTIONS = {
+    "body": "Cover every learning above in depth.",
+    "summary": "Summarize the most important findings across all learnings in a short overview and key bullet points.",
+    "conclusion": "Draw conclusions from the learnings and suggest potential next steps.",
+}
+
+
+async def refresh_section(
+    llm_provider: LLMProvider,
+    query: str,
+    heading: str,
+    section: str,
+    learnings: list[Learning],
+) -> str:
+    """
+    Update one report section with new learnings.
+    
+    Returns:
+        The section body (without its heading); the current body if the
+        update fails
+    """
+    prompt = REFRESH_SECTION_PROMPT.format(
+        learnings=format_learnings(learnings),
+        query=query,
+        heading=heading,
+        section=section,
+    )
+    messages = [
+        SystemMessage(content="You are a research writer updating a report section."),
+        HumanMessage(content=prompt),
+    ]
+    try:
+        response = await llm_provider.ainvoke(
+            messages,
+            stage="generate_report",
+            temperature=0.7,
+        )
+    except Exception as e:
+        print(f"❌ Error refreshing section {heading!r}: {e}")
+        return section
+    _, sections = split_sections(response.content)
+    # The model repeats the heading; keep the body only
+    return sections[0][1] if sections else response.content.strip()
+
+
+async def refresh_report(
+    state: ResearchState,
+    llm_provider: LLMProvider,
+) -> str:
+    """
+    Update the previous report with the learnings of this run.
+    
+    New learnings are matched to the sections they are about; only those
+    sections are rewritten (concurrently), and learnings that fit no
+    section go into a new one. The header and the sources are rebuilt.
+    """
+    new_learnings = state["learnings"][state.get("previous_learning_count", 0):]
+    _, sections = split_sections(state["previous_report"])
+    sections = [(heading, text) for heading, text in sections if heading != SOURCES_HEADING]
+    
+    assigned, unassigned = assign_to_sections(new_learnings, sections)
+    if unassigned:
+        existing = [heading for heading, _ in sections]
+        if NEW_FINDINGS_HEADING in existing:
+            assigned.setdefault(existing.index(NEW_FINDINGS_HEADING), []).extend(unassigned)
+        else:
+            # Before the conclusion, if the report ends with one
+            position = len(sections) - 1 if len(sections) > 1 else len(sections)
+            sections.insert(position, (NEW_FINDINGS_HEADING, ""))
+            assigned = {(i + 1 if i >= position else i): l for i, l in assigned.items()}
+            assigned[position] = unassigned
+    
+    print(f"  ✏️ Updating {len(assigned)} of {len(sections)} sections with {len(new_learnings)} new learnings")
+    bodies = await asyncio.gather(*(
+        refresh_section(llm_provider, state["query"], sections[i][0], sections[i][1], learnings)
+        for i, learnings in assigned.items()
+    ))
+    for i, body in zip(assigned, bodies):
+        sections[i] = (sections[i][0], body)
+    
+    header = create_report_header(
+        query=state["query"],
+        breadth=state["breadth"],
+        depth=state["depth"],
+    )
+    sources_section = format_sources(state.get("all_sources", []))
+    # Laid out like a generated report, so the diff shows content changes only
+    return f"{header}\n{join_sections('', sections)}\n{sources_section}"
+
+
+async def outline_report(
+    llm_provider: LLMProvider,
+    query: str,
+    context: str,
+    learnings: list[Learning],
+) -> list[tuple[str, list[Learning]]]:
+    """
+    Group learnings into the body sections of a report.
+    
+    Learnings the outline leaves out go into a final "Other Findings"
+    section, so none is lost.
+    
+    Returns:
+        (heading, learnings) pairs in report order
+    """
+    num_sections = max(1, min(MAX_SECTIONS, len(learnings) // LEARNINGS_PER_SECTION))
+    prompt = REPORT_OUTLINE_PROMPT.format(
+        learnings=format_learnings(learnings),
+        query=query,
+        context=context,
+        num_sections=num_sections,
+    )
+    messages = [
+        SystemMessage(content="You are a research writer planning a report outline. Return only valid JSON."),
+        HumanMessage(content=prompt),
+    ]
+    response = await llm_provider.ainvoke(
+        messages,
+        stage="report_outline",
+        temperature=0.3,
+    )
+    
+    sections = []
+    used: set[int] = set()
+    for item in json_items(parse_json(response.content), "sections"):
+        if not isinstance(item, dict) or not item.get("heading"):
+            continue
+        numbers = [
+            n for n in item.get("learnings", [])
+            if isinstance(n, int) and 1 <= n <= len(learnings) and n not in used
+        ]
+        used.update(numbers)
+        if numbers:
+            sections.append((str(item["heading"]), [learnings[n - 1] for n in numbers]))
+    leftover = [learning for n, learning in enumerate(learnings, 1) if n not in used]
+    if leftover:
+        sections.append((OTHER_FINDINGS_HEADING, leftover))
+    return sections
+
+
+async def write_section(
+    llm_provider: LLMProvider,
+    query: str,
+    heading: str,
+    learnings: list[Learning],
+    sources: dict[str, Source],
+    kind: str = "body",
+) -> str:
+    """
+    Write one report section from its learnings and their sources.
+    
+    Returns:
+        The section body (without its heading); a plain list of the
+        learnings if the call fails
+    """
+    urls = dict.fromkeys(url for learning in learnings for url in learning.sources)
+    sources_text = "\n".join(
+        f"- [{sources[url].title if url in sources and sources[url].title else url}]({url})"
+        for url in urls
+    )
+    prompt = REPORT_SECTION_PROMPT.format(
+        learnings=format_learnings(learnings),
+        sources=sources_text or "None",
+        query=query,
+        instructions=SECTION_INSTRUCTIONS[kind],
+        heading=heading,
+    )
+    messages = [
+        SystemMessage(content="You are a research writer creating a report section."),
+        HumanMessage(content=prompt),
+    ]
+    try:
+        response = await llm_provider.ainvoke(
+            messages,
+            stage="generate_report",
+            temperature=0.7,
+        )
+    except Exception as e:
+        print(f"❌ Error writing section {heading!r}: {e}")
+        return "\n".join(f"- {learning.content}" for learning in learnings)
+    _, sections = split_sections(response.content)
+    return sections[0][1] if sections else response.content.strip()
+
+
+async def generate_sectioned_report(
+    state: ResearchState,
+    learnings: list[Learning],
+    outline_provider: LLMProvider,
+    llm_provider: LLMProvider,
+    context: str,
+) -> str:
+    """
+    Generate a report body in two phases: an outline, then all sections at once.
+    
+    The outline call groups the learnings into sections; each section is
+    then written concurrently from its own learnings and sources, so the
+    wall time approaches that of the longest section.
+    
+    Returns:
+        The report sections in markdown, without header and sources
+    
+    Raises:
+        Exception: If the outline cannot be generated or parsed
+    """
+    outline = await outline_report(outline_provider, state["query"], context, learnings)
+    print(f"  🗂️ Outlined {len(outline)} sections; writing them concurrently")
+    
+    sources = {source.url: source for source in state.get("all_sources", [])}
+    plan = [
+        (SUMMARY_HEADING, learnings, "summary"),
+        *((heading, section_learnings, "body") for heading, section_learnings in outline),
+        (CONCLUSION_HEADING, learnings, "conclusion"),
+    ]
+    bodies = await asyncio.gather(*(
+        write_section(llm_provider, state["query"], heading, section_learnings, sources, kind)
+        for heading, section_learnings, kind in plan
+    ))
+    sections = [(heading, body) for (heading, _, _), body in zip(plan, bodies)]
+    return join_sections("", sections).rstrip()
+
+
+async def generate_report_node(
+    state: ResearchState,
+    config: RunnableConfig | None = None,
+) -> dict:
     """
     Generate the final research report.
     
     This node:
-    1. Compiles all learnings from research iterations
+    1. Selects the best-ranked learnings that fit the token budget
     2. Organizes sources
     3. Generates a comprehensive markdown report
+    4. Lists the learnings left out in an appendix
+    
+    With ``sectioned_report``, an outline call groups the learnings into
+    sections that are then written concurrently. In refresh mode the
+    previous report is updated instead: only the sections the new
+    learnings are about are regenerated. If the run's deadline passes
+    before the model is done, or the model is unavailable, the report lists
+    the learnings.
     
     Args:
         state: Current research state
+        config: Graph run configuration
         
     Returns:
         Updated state with final_report
     """
     print("\n📝 Generating final research report...")
     
-    # Format all learnings
-    learnings_text = format_learnings(state.get("learnings", []))
-    
-    if not learnings_text or learnings_text == "No learnings yet.":
+    learnings = state.get("learnings", [])
+    if not learnings:
         print("⚠️ No learnings to compile into report")
         return {"final_report": "No research data available to generate report."}
     
+    graph_config = GraphConfig.from_runnable_config(config)
+    llm_provider = LLMProvider.from_profile(graph_config.profile_for("generate_report"))
+    
+    if state.get("previous_report"):
+        if len(learnings) <= state.get("previous_learning_count", 0):
+            print("✅ No new learnings; the previous report stands")
+            return {"final_report": state["previous_report"]}
+        full_report = await refresh_report(state, llm_provider)
+        print("✅ Report refreshed successfully")
+        return {"final_report": full_report}
+    
+    # Keep the prompt within budget; the rest goes to the appendix
+    appendix = ""
+    rest = []
+    if graph_config.report_token_budget:
+        learnings, rest = select_learnings(
+            learnings,
+            graph_config.report_token_budget,
+            sources=state.get("all_sources"),
+            count_tokens=count_tokens,
+        )
+        if rest:
+            print(f"  🎯 Using the top {len(learnings)} learnings; {len(rest)} more go to the appendix")
+            appendix = format_appendix(rest)
+    
     # Format context
     context = format_context(
         follow_up_answers=state.get("follow_up_answers"),
     )
     
+    header = create_report_header(
+        query=state["query"],
+        breadth=state["breadth"],
+        depth=state["depth"],
+    )
+    sources_section = format_sources(state.get("all_sources", []))
+    
+    def assemble(report_content: str) -> str:
+        parts = [report_content, appendix, sources_section]
+        return f"{header}\n" + "\n\n".join(part for part in parts if part)
+    
+    def list_findings(error: Exception) -> str:
+        # No model to write with: the learnings themselves are the report
+        if isinstance(error, CircuitOpenError):
+            print("🔌 The model is unavailable; listing the learnings instead")
+            intro = "The model was unavailable to write up these findings:"
+        else:
+            print("⏱️ Out of time for the report; listing the learnings instead")
+            intro = "The run's deadline left no time to write up these findings:"
+        findings = format_appendix(learnings + rest, heading="Findings", intro=intro)
+        return f"{header}\n" + "\n\n".join([findings, sources_section])
+    
+    if graph_config.sectioned_report:
+        outline_provider = LLMProvider.from_profile(graph_config.profile_for("report_outline"))
+        try:
+            report_content = await generate_sectioned_report(
+                state, learnings, outline_provider, llm_provider, context
+            )
+            print("✅ Report generated successfully")
+            return {"final_report": assemble(report_content)}
+        except (TimeoutError, CircuitOpenError) as e:
+            return {"final_report": list_findings(e)}
+        except Exception as e:
+            print(f"⚠️ Sectioned report failed ({e}); generating it in one call")
+    
     # Build prompt
     prompt = GENERATE_REPORT_PROMPT.format(
         query=state["query"],
         context=context,
-        learnings=learnings_text,
+        learnings=format_learnings(learnings),
     )
     
-    # Generate report using LLM
-    llm_provider = LLMProvider()
-    llm = llm_provider.get_llm(temperature=0.7)
-    
     messages = [
         SystemMessage(content="You are a professional research writer creating comprehensive reports."),
         HumanMessage(content=prompt),
     ]
     
     try:
-        response = await llm.ainvoke(messages)
-        report_content = response.content
-        
-        # Add header
-        header = create_report_header(
-            query=state["query"],
-            breadth=state["breadth"],
-            depth=state["depth"],
+        response = await llm_provider.ainvoke(
+            messages,
+            stage="generate_report",
+            temperature=0.7,
         )
-        
-        # Add sources section
-        sources_section = format_sources(state.get("all_sources", []))
-        
-        # Combine all parts
-        full_report = f"{header}\n{report_content}\n\n{sources_section}"
+        full_report = assemble(response.content)
         
         print("✅ Report generated successfully")
         
         return {"final_report": full_report}
         
+    except (TimeoutError, CircuitOpenError) as e:
+        return {"final_report": list_findings(e)}
     except Exception as e:
         print(f"❌ Error generating report: {e}")
         return {"final_report": f"Error generating report: {str(e)}"}
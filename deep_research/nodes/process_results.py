@@ -2,88 +2,207 @@
 Process search results and extract learnings node.
 """
 
-import json
+import asyncio
+import re
+
+from langchain_core.runnables import RunnableConfig
 from langchain_core.messages import HumanMessage, SystemMessage
 
-from ..state import ResearchState, Learning, ResearchDirection
+from ..context import get_run_context
+from ..state import ResearchState, Learning, ResearchDirection, GraphConfig, ModelProfile
 from ..tools import LLMProvider, truncate_to_tokens
+from ..tools.workers import run_cpu
+from ..observability.metrics import LEARNINGS_PER_ITERATION, record_cache
 from ..utils import (
     PROCESS_RESULTS_PROMPT,
     GENERATE_DIRECTIONS_PROMPT,
+    GENERATE_DIRECTIONS_WITH_QUERIES_PROMPT,
     format_search_results,
+    result_excerpt,
     format_learnings,
-    extract_json_from_text,
+    format_context,
+    parse_json,
+    json_items,
 )
 
 
-async def process_results_node(state: ResearchState) -> dict:
+# Header of a result entry in format_search_results' output
+RESULT_ENTRY_PATTERN = re.compile(r"^\*\*Result \d+: .*\*\*\nURL: (.*)$", re.MULTILINE)
+
+
+def format_results_prompt(results_by_query: dict[str, list[dict]], max_tokens: int) -> tuple[str, set[str]]:
+    """
+    Search results formatted for extraction, truncated to keep within token
+    limits, and the URLs of the results the truncated text holds in full.
+    """
+    full = format_search_results(results_by_query)
+    text = truncate_to_tokens(full, max_tokens=max_tokens)
+    entries = list(RESULT_ENTRY_PATTERN.finditer(full))
+    ends = [entry.start() for entry in entries[1:]] + [len(full)]
+    included = {entry.group(1) for entry, end in zip(entries, ends) if end <= len(text)}
+    return text, included
+
+
+async def process_results_node(
+    state: ResearchState,
+    config: RunnableConfig | None = None,
+) -> dict:
     """
     Process search results to extract learnings and generate next directions.
     
     This node:
-    1. Analyzes search results
-    2. Extracts key learnings
+    1. Analyzes search results not processed earlier in the run
+    2. Extracts key learnings (reusing those of already-processed sources)
     3. Generates next research directions (if depth > 0)
+    4. Optionally starts prefetching searches for the top direction
     
     Args:
         state: Current research state
+        config: Graph run configuration
         
     Returns:
         Updated state with learnings and next_directions
     """
-    search_results = state.get("search_results", [])
-    if not search_results:
-        print("⚠️ No search results to process")
-        return {"learnings": [], "next_directions": []}
-    
-    print(f"\n🧠 Processing {len(search_results)} search results...")
+    graph_config = GraphConfig.from_runnable_config(config)
+    context = get_run_context()
+    index = context.source_index if context and graph_config.incremental_processing else None
     
-    # Format results for LLM
-    results_by_query = {}
-    for result in search_results:
-        query = result["query"]
-        if query not in results_by_query:
-            results_by_query[query] = []
-        results_by_query[query].append(result)
+    # Sources analyzed earlier in the run contribute the learnings they
+    # produced then; near-duplicates of pages seen earlier carry no new content
+    search_results = []
+    known_learnings: list[Learning] = []
+    for result in state.get("search_results", []):
+        known = None
+        if index is not None:
+            if result.get("duplicate_of"):
+                known = index.lookup(url=result["duplicate_of"])
+            else:
+                known = index.lookup(content=result.get("content"))
+            record_cache("processed_source", known is not None)
+        if known is not None:
+            known_learnings.extend(l for l in known if l not in known_learnings)
+        elif not result.get("duplicate_of"):
+            search_results.append(result)
     
-    results_text = format_search_results(results_by_query)
+    if not search_results and not known_learnings:
+        print("⚠️ No search results to process")
+        return {"learnings": [], "next_directions": []}
     
-    # Truncate if too long (keep within token limits)
-    results_text = truncate_to_tokens(results_text, max_tokens=8000)
+    learnings = []
+    if search_results:
+        print(f"\n🧠 Processing {len(search_results)} search results...")
+        
+        # Format results for LLM, sending the CPU pool only the excerpts shown
+        results_by_query = {}
+        size = 0
+        for result in search_results:
+            query = result["query"]
+            if query not in results_by_query:
+                results_by_query[query] = []
+            excerpt = result_excerpt(result)
+            size += len(excerpt)
+            results_by_query[query].append({
+                "title": result.get("title", "Untitled"),
+                "url": result.get("url", ""),
+                "content": excerpt,
+                "deep": result.get("deep", False),
+            })
+        
+        results_text, included = await run_cpu(format_results_prompt, results_by_query, 8000, size=size)
+        
+        # Extract learnings
+        extracted = await extract_learnings(
+            state["current_goal"],
+            results_text,
+            streaming=graph_config.streaming_json,
+            profile=graph_config.profile_for("extract_learnings"),
+        )
+        learnings = extracted or []
+        
+        print(f"✅ Extracted {len(learnings)} learnings")
+        
+        # Results cut off by truncation were not analyzed, nor were any
+        # when extraction failed
+        analyzed = [
+            result for result in search_results
+            if extracted is not None and result.get("content") and result["url"] in included
+        ]
+        if index is not None:
+            for result in analyzed:
+                index.add(
+                    result["url"],
+                    result["content"],
+                    [learning for learning in learnings if result["url"] in learning.sources],
+                )
+        if context and context.knowledge is not None and extracted is not None:
+            await asyncio.to_thread(
+                context.knowledge.add_learnings, learnings, analyzed=[result["url"] for result in analyzed],
+            )
     
-    # Extract learnings
-    learnings = await extract_learnings(state["current_goal"], results_text)
+    if known_learnings:
+        print(f"♻️ Reused {len(known_learnings)} learnings from already-processed sources")
+    LEARNINGS_PER_ITERATION.observe(len(learnings))
     
-    print(f"✅ Extracted {len(learnings)} learnings")
+    # Learnings of sources from the knowledge base are new to this run
+    carried = [l for l in known_learnings if l not in state.get("learnings", []) and l not in learnings]
     
     # Generate next directions if we haven't reached max depth
     next_directions = []
     if state["current_depth"] < state["depth"]:
         print(f"\n🎯 Generating next research directions (depth {state['current_depth'] + 1}/{state['depth']})...")
+        fused_context = None
+        if graph_config.fused_planning:
+            fused_context = format_context(
+                follow_up_answers=state.get("follow_up_answers"),
+                current_depth=state["current_depth"] + 1,
+                total_depth=state["depth"],
+            )
         next_directions = await generate_next_directions(
             state["query"],
             state["current_goal"],
-            learnings,
+            learnings + known_learnings,
             state["breadth"],
+            fused_context=fused_context,
+            streaming=graph_config.streaming_json,
+            profile=graph_config.profile_for("generate_directions"),
         )
         print(f"✅ Generated {len(next_directions)} new directions")
+        
+        # Search for the direction prepare_next will pick while queries are generated
+        if next_directions and context and graph_config.speculative_prefetch:
+            top = next_directions[0]
+            print(f"⚡ Prefetching searches for: {top.goal}")
+            context.prefetcher.prefetch(top.queries or [top.goal])
     
     return {
-        "learnings": learnings,
+        "learnings": learnings + carried,
         "next_directions": next_directions,
     }
 
 
-async def extract_learnings(goal: str, results: str) -> list[Learning]:
-    """Extract key learnings from search results."""
+async def extract_learnings(
+    goal: str,
+    results: str,
+    streaming: bool = False,
+    profile: ModelProfile | None = None,
+) -> list[Learning] | None:
+    """
+    Extract key learnings from search results.
+    
+    In streaming mode the response is parsed as it arrives, so a response
+    cut off mid-way still yields every learning completed before the cut.
+    
+    Returns:
+        The learnings, or None if the LLM call failed (the results were
+        not analyzed)
+    """
     
     prompt = PROCESS_RESULTS_PROMPT.format(
         goal=goal,
         results=results,
     )
     
-    llm_provider = LLMProvider()
-    llm = llm_provider.get_reasoning_llm()
+    llm_provider = LLMProvider.from_profile(profile)
     
     messages = [
         SystemMessage(content="You are a research analyst. Return only valid JSON."),
@@ -91,13 +210,26 @@ async def extract_learnings(goal: str, results: str) -> list[Learning]:
     ]
     
     try:
-        response = await llm.ainvoke(messages)
-        content = extract_json_from_text(response.content)
-        data = json.loads(content)
+        if streaming:
+            items = await llm_provider.astream_json(
+                messages,
+                key="learnings",
+                stage="extract_learnings",
+                temperature=0.9,
+            )
+        else:
+            response = await llm_provider.ainvoke(
+                messages,
+                stage="extract_learnings",
+                temperature=0.9,
+            )
+            items = json_items(parse_json(response.content), "learnings")
         
         # Parse learnings
         learnings = []
-        for item in data.get("learnings", []):
+        for item in items:
+            if not isinstance(item, dict):
+                continue
             learnings.append(Learning(
                 content=item.get("content", ""),
                 sources=item.get("sources", []),
@@ -108,7 +240,7 @@ async def extract_learnings(goal: str, results: str) -> list[Learning]:
         
     except Exception as e:
         print(f"❌ Error extracting learnings: {e}")
-        return []
+        return None
 
 
 async def generate_next_directions(
@@ -116,20 +248,39 @@ async def generate_next_directions(
     current_goal: str,
     learnings: list[Learning],
     breadth: int,
+    fused_context: str | None = None,
+    streaming: bool = False,
+    profile: ModelProfile | None = None,
 ) -> list[ResearchDirection]:
-    """Generate next research directions based on learnings."""
+    """
+    Generate next research directions based on learnings.
+    
+    When ``fused_context`` is given (fused planning mode), the same call also
+    returns ready-to-run search queries for the top direction, so the next
+    iteration can skip generate_queries_node. In streaming mode every
+    direction is collected before the ``breadth`` highest-priority ones are
+    kept, as in non-streaming mode.
+    """
     
     learnings_text = format_learnings(learnings)
     
-    prompt = GENERATE_DIRECTIONS_PROMPT.format(
-        query=query,
-        goal=current_goal,
-        learnings=learnings_text,
-        breadth=breadth,
-    )
+    if fused_context is not None:
+        prompt = GENERATE_DIRECTIONS_WITH_QUERIES_PROMPT.format(
+            query=query,
+            goal=current_goal,
+            context=fused_context,
+            learnings=learnings_text,
+            breadth=breadth,
+        )
+    else:
+        prompt = GENERATE_DIRECTIONS_PROMPT.format(
+            query=query,
+            goal=current_goal,
+            learnings=learnings_text,
+            breadth=breadth,
+        )
     
-    llm_provider = LLMProvider()
-    llm = llm_provider.get_reasoning_llm()
+    llm_provider = LLMProvider.from_profile(profile)
     
     messages = [
         SystemMessage(content="You are a research planner. Return only valid JSON."),
@@ -137,17 +288,31 @@ async def generate_next_directions(
     ]
     
     try:
-        response = await llm.ainvoke(messages)
-        content = extract_json_from_text(response.content)
-        data = json.loads(content)
+        if streaming:
+            items = await llm_provider.astream_json(
+                messages,
+                key="directions",
+                stage="generate_directions",
+                temperature=0.9,
+            )
+        else:
+            response = await llm_provider.ainvoke(
+                messages,
+                stage="generate_directions",
+                temperature=0.9,
+            )
+            items = json_items(parse_json(response.content), "directions")
         
         # Parse directions
         directions = []
-        for item in data.get("directions", []):
+        for item in items:
+            if not isinstance(item, dict):
+                continue
             directions.append(ResearchDirection(
                 goal=item.get("goal", ""),
                 rationale=item.get("rationale", ""),
                 priority=item.get("priority", 1),
+                queries=[q for q in item.get("queries", []) if isinstance(q, str)][:breadth],
             ))
         
         # Sort by priority
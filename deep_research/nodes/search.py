@@ -4,21 +4,211 @@ Search execution node for the research graph.
 
 import os
 import asyncio
-from ..state import ResearchState, Source
-from ..tools import get_firecrawl_client
+from typing import Awaitable, Callable
+from langchain_core.runnables import RunnableConfig
 
+from ..context import RunContext, get_run_context
+from ..state import ResearchState, Source, GraphConfig
+from ..tools import FirecrawlClient, get_firecrawl_client, normalize_query, query_words
+from ..tools.breaker import CLOSED, get_breaker
+from ..tools.workers import run_cpu
+from ..utils import clean_pages, MinHashIndex
+from ..observability import record_cache
+from ..observability.metrics import SEARCH_RESULTS_PER_QUERY, SEARCH_CONTENT_BYTES
 
-async def search_node(state: ResearchState) -> dict:
+
+# Share of a query's content words a result must contain to be relevant
+MIN_QUERY_COVERAGE = 0.5
+
+
+async def clean_results(
+    search_results: dict[str, list[dict]],
+    seen_blocks: dict[str, set[str]] | None = None,
+) -> tuple[int, int]:
+    """
+    Strip boilerplate from result content in place.
+    
+    Blocks repeated across the pages of one site (headers and footers) are
+    kept only once; pass the same ``seen_blocks`` to clean later pages of
+    the search. The pages are cleaned as one task of the CPU pool.
+    
+    Returns:
+        Content size in bytes before and after cleaning
+    """
+    seen_blocks = {} if seen_blocks is None else seen_blocks
+    results = [result for results in search_results.values() for result in results]
+    pages = [result.get("content") or "" for result in results]
+    urls = [result.get("url") or "" for result in results]
+    raw_bytes = sum(len(page.encode()) for page in pages)
+    cleaned, added = await run_cpu(clean_pages, pages, urls, seen_blocks, size=raw_bytes)
+    for site, blocks in added.items():
+        seen_blocks.setdefault(site, set()).update(blocks)
+    for result, content in zip(results, cleaned):
+        result["content"] = content
+    return raw_bytes, sum(len(content.encode()) for content in cleaned)
+
+
+async def seed_known_sources(
+    context: RunContext,
+    stored: dict[str, list[dict]],
+    max_age: float | None = None,
+):
+    """Let knowledge-base sources bring the learnings extracted from them before."""
+    results = [result for results in stored.values() for result in results]
+    learnings = await asyncio.to_thread(
+        context.knowledge.learnings_for, [result["url"] for result in results], max_age=max_age,
+    )
+    for result in results:
+        if result["url"] in learnings:
+            context.source_index.add(result["url"], result["content"], learnings[result["url"]])
+
+
+def query_coverage(query: str, result: dict) -> float:
+    """Share of the content words of its query that a result contains."""
+    words = set(query_words(query))
+    if not words:
+        return 1.0
+    text = f"{result.get('title', '')} {result.get('content', '')}".lower()
+    return sum(word in text for word in words) / len(words)
+
+
+def is_relevant(query: str, result: dict) -> bool:
+    """Whether a result contains most of the content words of its query."""
+    return query_coverage(query, result) >= MIN_QUERY_COVERAGE
+
+
+class PageYield:
+    """
+    Measures how much of each page of search results is worth having.
+    
+    A result counts if it is relevant to its query and new: its URL is not
+    among the results seen so far in this search nor the sources the run
+    has analyzed, and its content is no near-duplicate of a page seen so
+    far in the search or earlier in the run.
+    
+    Args:
+        context: Run context, for what the run already has
+        threshold: Near-duplicate similarity; None compares URLs only
+    """
+    
+    def __init__(self, context: RunContext | None, threshold: float | None):
+        self.run_index = context.content_index if context and threshold else None
+        self.source_index = context.source_index if context else None
+        self.search_index = MinHashIndex(threshold=threshold) if threshold else None
+        self.urls: set[str] = set()
+    
+    def _is_new(self, result: dict, signature) -> bool:
+        url = result.get("url", "")
+        if url in self.urls or (self.source_index and self.source_index.lookup(url=url) is not None):
+            return False
+        self.urls.add(url)
+        if signature is None:
+            return True
+        if self.search_index.query(signature) or (self.run_index and self.run_index.query(signature)):
+            return False
+        self.search_index.add(url, signature)
+        return True
+    
+    async def measure(self, pages: dict[str, list[dict]]) -> dict[str, float]:
+        """
+        Share of each query's page of results that are new and relevant
+        (0 for an empty page), the pages being signed in one task of the CPU
+        pool.
+        """
+        results = [result for page in pages.values() for result in page]
+        signatures = [None] * len(results)
+        if self.search_index is not None:
+            contents = [result.get("content") or "" for result in results]
+            signatures = await run_cpu(self.search_index.hasher, contents, size=sum(map(len, contents)))
+        signed = iter(signatures)
+        yields = {}
+        for query, page in pages.items():
+            gained = sum(self._is_new(result, next(signed)) and is_relevant(query, result) for result in page)
+            yields[query] = gained / len(page) if page else 0.0
+        return yields
+
+
+async def fetch_more_results(
+    client: FirecrawlClient,
+    fetched: dict[str, list[dict]],
+    graph_config: GraphConfig,
+    context: RunContext | None,
+    concurrency_limit: int,
+    prepare: Callable[[dict[str, list[dict]]], Awaitable[None]],
+) -> int:
+    """
+    Page further into the searches that keep yielding new material.
+    
+    Every search starts with one page of ``search_page_size`` results.
+    Searches whose last page had a yield (see PageYield) of at least
+    ``min_page_yield`` get another page, all at once, until none does or
+    they reach ``max_results_per_query``.
+    
+    Args:
+        client: Firecrawl client
+        fetched: First pages by query; later pages are appended in place
+        graph_config: Graph configuration
+        context: Run context
+        concurrency_limit: Maximum concurrent requests
+        prepare: Called on each round of new pages before they are measured
+            (cleans them in place)
+    
+    Returns:
+        Number of results added
+    """
+    page_size = graph_config.search_page_size
+    page_yield = PageYield(context, graph_config.near_duplicate_threshold)
+    last_pages = dict(fetched)
+    offsets = dict.fromkeys(fetched, page_size)
+    added = 0
+    while True:
+        yields = await page_yield.measure(last_pages)
+        productive = [
+            query for query in last_pages
+            if yields[query] >= graph_config.min_page_yield
+            and offsets[query] + page_size <= graph_config.max_results_per_query
+        ]
+        if not productive or (context and context.out_of_time()):
+            return added
+        offsets = {query: offsets[query] for query in productive}
+        last_pages = await client.batch_search(
+            queries=list(offsets),
+            num_results=page_size,
+            concurrency_limit=concurrency_limit,
+            since=graph_config.search_since,
+            offsets=offsets,
+        )
+        await prepare(last_pages)
+        for query, page in last_pages.items():
+            fetched[query].extend(page)
+            added += len(page)
+            offsets[query] += page_size
+
+
+async def search_node(
+    state: ResearchState,
+    config: RunnableConfig | None = None,
+) -> dict:
     """
     Execute searches for all generated queries.
     
     This node:
     1. Takes the generated search queries
-    2. Executes searches concurrently using Firecrawl
-    3. Collects and structures results
+    2. Reuses the results of earlier searches the queries repeat, fresh
+       material from the knowledge base, and matching speculative
+       prefetches, if any
+    3. Executes the remaining searches concurrently using Firecrawl,
+       fetching further pages only for searches that keep yielding new,
+       relevant results
+    4. Strips boilerplate from the fetched pages
+    5. While Firecrawl is unavailable (circuit breaker not closed), answers
+       failed searches from the knowledge base regardless of age
+    6. Collapses pages that near-duplicate one seen earlier in the run
+    7. Collects and structures results
     
     Args:
         state: Current research state
+        config: Graph run configuration
         
     Returns:
         Updated state with search_results and all_sources
@@ -33,22 +223,164 @@ async def search_node(state: ResearchState) -> dict:
     # Get concurrency limit from environment
     concurrency_limit = int(os.getenv("CONCURRENCY_LIMIT", "3"))
     
-    # Get Firecrawl client and perform searches
+    graph_config = GraphConfig.from_runnable_config(config)
+    context = get_run_context()
+    registry = context.query_registry if context and graph_config.query_dedup_threshold else None
+    
+    # Queries repeating one searched earlier in the run reuse its results
+    reused = {}
+    if registry is not None:
+        for query in queries:
+            repeated = registry.match(query)
+            results = registry.results(repeated) if repeated else None
+            record_cache("query_registry", results is not None)
+            if results is not None:
+                reused[query] = results
+    if reused:
+        print(f"  ↩️ Reusing results of {len(reused)} earlier searches")
+    
+    # Fresh material from earlier runs stands in for a search
+    knowledge = context.knowledge if context else None
+    stored = {}
+    if knowledge is not None:
+        lookups = await asyncio.to_thread(lambda: {
+            query: knowledge.find_sources(query, limit=graph_config.search_page_size)
+            for query in queries
+            if query not in reused
+        })
+        for query, results in lookups.items():
+            record_cache("knowledge_base", bool(results))
+            if results:
+                stored[query] = results
+    if stored:
+        print(f"  📚 Answering {len(stored)} searches from the knowledge base")
+        if graph_config.incremental_processing:
+            await seed_known_sources(context, stored)
+    
+    # Claim prefetched searches; the rest are no longer useful
+    pending = [q for q in queries if q not in reused and q not in stored]
+    claimed = context.prefetcher.claim(pending) if context else {}
+    prefetched = {query: task for query, (_, task) in claimed.items()}
+    # Results of a prefetch claimed by a merely similar query were not
+    # searched for that query, so they are not remembered under it
+    approximate = {
+        query for query, (searched, _) in claimed.items()
+        if normalize_query(searched) != normalize_query(query)
+    }
+    if context:
+        context.prefetcher.cancel_all()
+    for query in pending:
+        record_cache("search_prefetch", query in prefetched)
+    if prefetched:
+        print(f"  ⚡ Reusing {len(prefetched)} prefetched searches")
+    
+    # Get Firecrawl client and fetch the first page of the remaining searches
     client = get_firecrawl_client()
-    search_results_dict = await client.batch_search(
-        queries=queries,
-        num_results=5,
-        concurrency_limit=concurrency_limit,
+    fetched, prefetched_results = await asyncio.gather(
+        client.batch_search(
+            queries=[q for q in pending if q not in prefetched],
+            num_results=graph_config.search_page_size,
+            concurrency_limit=concurrency_limit,
+            since=graph_config.search_since,
+        ),
+        asyncio.gather(*prefetched.values(), return_exceptions=True),
     )
+    for query, results in zip(prefetched, prefetched_results):
+        fetched[query] = [] if isinstance(results, BaseException) else results
+    
+    seen_blocks: dict[str, set[str]] = {}
+    content_bytes = {"raw": 0, "clean": 0}
+    
+    async def prepare(results: dict[str, list[dict]]):
+        if graph_config.clean_content:
+            raw_bytes, clean_bytes = await clean_results(results, seen_blocks)
+            content_bytes["raw"] += raw_bytes
+            content_bytes["clean"] += clean_bytes
+    
+    await prepare(fetched)
+    # More pages only for the searches that keep yielding new material
+    if graph_config.max_results_per_query > graph_config.search_page_size:
+        more = await fetch_more_results(client, fetched, graph_config, context, concurrency_limit, prepare)
+        if more:
+            print(f"  📑 Fetched {more} more results for productive searches")
+    
+    # While Firecrawl is down, older material beats no results
+    if knowledge is not None and get_breaker("firecrawl").state != CLOSED:
+        lookups = await asyncio.to_thread(lambda: {
+            query: knowledge.find_sources(query, limit=graph_config.search_page_size, max_age=float("inf"))
+            for query in pending
+            if not fetched.get(query)
+        })
+        stale = {query: results for query, results in lookups.items() if results}
+        if stale:
+            print(f"  📦 Firecrawl is unavailable; answering {len(stale)} searches from older knowledge")
+            if graph_config.incremental_processing:
+                await seed_known_sources(context, stale, max_age=float("inf"))
+            stored.update(stale)
+    
+    raw_bytes, clean_bytes = content_bytes["raw"], content_bytes["clean"]
+    SEARCH_CONTENT_BYTES.inc(raw_bytes, stage="raw")
+    SEARCH_CONTENT_BYTES.inc(clean_bytes, stage="clean")
+    if raw_bytes:
+        saved = raw_bytes - clean_bytes
+        # ~4 bytes per token, as in count_tokens' fallback
+        print(
+            f"  🧹 Cleaned content: {raw_bytes / 1024:.0f} KB -> {clean_bytes / 1024:.0f} KB "
+            f"(-{saved / raw_bytes:.0%}, ~{saved // 4:,} tokens)"
+        )
+    # Failed searches (no results) are not remembered
+    if registry is not None:
+        for query, results in {**fetched, **stored}.items():
+            if results and query not in approximate:
+                registry.add(query, results)
+    if knowledge is not None:
+        searches = {
+            query: results for query, results in fetched.items()
+            if results and query not in approximate
+        }
+        
+        def add_searches():
+            for query, results in searches.items():
+                knowledge.add_search(query, results)
+        
+        await asyncio.to_thread(add_searches)
+    
+    fetched.update(reused)
+    fetched.update(stored)
+    search_results_dict = {q: fetched[q] for q in queries if q in fetched}
     
     # Structure results and sources
     all_results = []
     new_sources = []
+    index = context.content_index if context and graph_config.near_duplicate_threshold else None
+    duplicates = 0
+    signatures = iter(())
+    if index is not None:
+        # Sign every page in one task of the CPU pool; look up in order here
+        pages = [result["content"] for results in search_results_dict.values() for result in results]
+        signatures = iter(await run_cpu(index.hasher, pages, size=sum(map(len, pages))))
     
     for query, results in search_results_dict.items():
         print(f"  📄 {query}: {len(results)} results")
+        SEARCH_RESULTS_PER_QUERY.observe(len(results))
         
         for result in results:
+            duplicate_of = None
+            if index is not None:
+                duplicate_of = index.match_or_add(result["url"], next(signatures))
+                record_cache("near_duplicate", duplicate_of is not None)
+            if duplicate_of is not None:
+                # Keep a reference only; the content is already in the run
+                duplicates += 1
+                all_results.append({
+                    "query": query,
+                    "url": result["url"],
+                    "title": result["title"],
+                    "content": "",
+                    "duplicate_of": duplicate_of,
+                })
+                continue
+            
             all_results.append({
                 "query": query,
                 "url": result["url"],
@@ -63,6 +395,8 @@ async def search_node(state: ResearchState) -> dict:
                 content=result["content"],
             ))
     
+    if duplicates:
+        print(f"  🔁 Collapsed {duplicates} near-duplicate results")
     print(f"✅ Retrieved {len(all_results)} total results from {len(queries)} queries")
     
     return {
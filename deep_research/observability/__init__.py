@@ -0,0 +1,45 @@
+"""Observability: tracing, metrics, memory profiling and node instrumentation."""
+
+from .tracing import (
+    Tracer,
+    ConsoleSpanExporter,
+    OTLPJsonFileExporter,
+    configure_tracing,
+    get_tracer,
+    start_span,
+    current_span,
+)
+from .metrics import (
+    MetricsRegistry,
+    REGISTRY,
+    record_cache,
+    cache_hit_ratio,
+    start_http_server,
+    start_from_env,
+)
+from .profiling import MemoryProfiler, profile_memory, active_memory_profiler
+from .instrumentation import instrument_node
+
+__all__ = [
+    # Tracing
+    "Tracer",
+    "ConsoleSpanExporter",
+    "OTLPJsonFileExporter",
+    "configure_tracing",
+    "get_tracer",
+    "start_span",
+    "current_span",
+    # Metrics
+    "MetricsRegistry",
+    "REGISTRY",
+    "record_cache",
+    "cache_hit_ratio",
+    "start_http_server",
+    "start_from_env",
+    # Memory profiling
+    "MemoryProfiler",
+    "profile_memory",
+    "active_memory_profiler",
+    # Instrumentation
+    "instrument_node",
+]
@@ -0,0 +1,85 @@
+"""
+Instrumentation wrappers for graph nodes.
+"""
+
+import functools
+import inspect
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, Callable, Iterator
+
+from .metrics import NODE_LATENCY, STATE_ITEMS
+from .profiling import active_memory_profiler
+from .tracing import start_span
+
+
+STATE_LIST_FIELDS = ("learnings", "all_sources", "search_results")
+
+
+def _node_attributes(name: str, state: dict) -> dict[str, Any]:
+    return {
+        "graph.node": name,
+        "research.query": state.get("query"),
+        "research.goal": state.get("current_goal"),
+        "research.depth": state.get("current_depth"),
+        "research.breadth": state.get("breadth"),
+    }
+
+
+def _record_state_size(state: dict):
+    for field in STATE_LIST_FIELDS:
+        STATE_ITEMS.observe(len(state.get(field) or ()), field=field)
+
+
+def _record_update(span, update: Any):
+    """Record the size of each list in a node's state update."""
+    if not isinstance(update, dict):
+        return
+    for key, value in update.items():
+        if isinstance(value, list):
+            span.set_attribute(f"update.{key}.count", len(value))
+
+
+@contextmanager
+def _observe_node(name: str, state: dict) -> Iterator[dict]:
+    """Trace, time and (if a profiler is active) memory-profile one node run."""
+    _record_state_size(state)
+    profiler = active_memory_profiler()
+    tracking = profiler.track_node(name, state) if profiler else nullcontext({})
+    t0 = time.perf_counter()
+    with tracking as result, start_span(f"node.{name}", _node_attributes(name, state)) as span:
+        try:
+            yield result
+        finally:
+            NODE_LATENCY.observe(time.perf_counter() - t0, node=name)
+        _record_update(span, result.get("update"))
+
+
+def instrument_node(name: str, fn: Callable) -> Callable:
+    """
+    Wrap a graph node so that each execution is traced and timed.
+    
+    The wrapper keeps the node's signature, so LangGraph still passes
+    ``config`` to nodes that ask for it.
+    
+    Args:
+        name: Node name as registered in the graph
+        fn: The node function (sync or async)
+        
+    Returns:
+        The wrapped node
+    """
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def async_wrapper(state, *args, **kwargs):
+            with _observe_node(name, state) as result:
+                result["update"] = await fn(state, *args, **kwargs)
+            return result["update"]
+        return async_wrapper
+
+    @functools.wraps(fn)
+    def sync_wrapper(state, *args, **kwargs):
+        with _observe_node(name, state) as result:
+            result["update"] = fn(state, *args, **kwargs)
+        return result["update"]
+    return sync_wrapper
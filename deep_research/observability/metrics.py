@@ -0,0 +1,408 @@
+"""
+Always-on metrics with Prometheus text exposition.
+
+Counters, gauges and fixed-bucket histograms are cheap enough to record on
+every call. Each labelled series keeps one shard per writing thread, so the
+hot path only touches memory owned by the current thread and never takes a
+lock; shards are summed when the registry is rendered.
+
+Exposition:
+    REGISTRY.render()                 Prometheus text format 0.0.4
+    REGISTRY.dump("metrics.prom")     Atomic file dump
+    start_http_server(9464)           Serve /metrics from a daemon thread
+
+Configuration (environment, applied by ``start_from_env``):
+    METRICS_PORT: Serve /metrics on this port
+    METRICS_FILE: Dump metrics to this file at exit
+"""
+
+import abc
+import atexit
+import bisect
+import math
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (0, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterSeries:
+    """One labelled counter series, sharded per thread."""
+
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards: dict[int, list[float]] = {}
+
+    def inc(self, value: float = 1.0):
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(threading.get_ident(), [0.0])
+        shard[0] += value
+
+    @property
+    def value(self) -> float:
+        return sum(shard[0] for shard in list(self._shards.values()))
+
+
+class _GaugeSeries:
+    """One labelled gauge series; a set is a single attribute store."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+
+class _HistogramSeries:
+    """One labelled histogram series, sharded per thread."""
+
+    __slots__ = ("_buckets", "_shards")
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self._buckets = buckets
+        self._shards: dict[int, list[float]] = {}
+
+    def observe(self, value: float):
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            # Layout: one count per bucket, then +Inf, then sum
+            shard = self._shards.setdefault(
+                threading.get_ident(),
+                [0] * (len(self._buckets) + 1) + [0.0],
+            )
+        shard[bisect.bisect_left(self._buckets, value)] += 1
+        shard[-1] += value
+
+    def snapshot(self) -> tuple[list[int], float]:
+        """Non-cumulative bucket counts (last is +Inf) and the sum."""
+        counts = [0] * (len(self._buckets) + 1)
+        total = 0.0
+        for shard in list(self._shards.values()):
+            for i in range(len(counts)):
+                counts[i] += shard[i]
+            total += shard[-1]
+        return counts, total
+
+
+class _Metric(abc.ABC):
+    """Base class for a metric family with optional labels."""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series: dict[tuple[str, ...], object] = {}
+
+    @abc.abstractmethod
+    def _new_series(self):
+        """Create the series of a new set of label values."""
+
+    def labels(self, *values, **labels):
+        """Get the series for a set of label values."""
+        if labels:
+            values = tuple(str(labels[name]) for name in self.labelnames)
+        else:
+            values = tuple(str(v) for v in values)
+        series = self._series.get(values)
+        if series is None:
+            series = self._series.setdefault(values, self._new_series())
+        return series
+
+    def render(self) -> list[str]:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        for values, series in sorted(self._series.items()):
+            lines.extend(self._render_series(values, series))
+        return lines
+
+    def _render_series(self, values, series) -> list[str]:
+        labels = _format_labels(self.labelnames, values)
+        return [f"{self.name}{labels} {_format_value(series.value)}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing value."""
+
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterSeries()
+
+    def inc(self, value: float = 1.0, **labels):
+        self.labels(**labels).inc(value)
+
+    def total(self, **labels) -> float:
+        """Sum of all series matching the given label values."""
+        index = {name: i for i, name in enumerate(self.labelnames)}
+        return sum(
+            series.value
+            for values, series in list(self._series.items())
+            if all(values[index[name]] == str(value) for name, value in labels.items())
+        )
+
+
+class Gauge(_Metric):
+    """Value that can go up and down."""
+
+    kind = "gauge"
+
+    def _new_series(self):
+        return _GaugeSeries()
+
+    def set(self, value: float, **labels):
+        self.labels(**labels).set(value)
+
+
+class Histogram(_Metric):
+    """Distribution of observations over fixed buckets."""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramSeries(self.buckets)
+
+    def observe(self, value: float, **labels):
+        self.labels(**labels).observe(value)
+
+    def _render_series(self, values, series) -> list[str]:
+        counts, total = series.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(
+                f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}"
+            )
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """A named collection of metrics."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def get(self, name: str) -> _Metric | None:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text format."""
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Write the text format to a file atomically."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.render())
+        os.replace(tmp_path, path)
+
+
+REGISTRY = MetricsRegistry()
+
+# --- Upstream calls ---
+FIRECRAWL_LATENCY = REGISTRY.histogram(
+    "firecrawl_request_duration_seconds",
+    "Firecrawl request latency.",
+    ("operation",),
+)
+FIRECRAWL_REQUESTS = REGISTRY.counter(
+    "firecrawl_requests_total",
+    "Firecrawl requests by HTTP status code (or 'error' for transport errors).",
+    ("operation", "status"),
+)
+FIRECRAWL_RESPONSE_BYTES = REGISTRY.histogram(
+    "firecrawl_response_bytes",
+    "Firecrawl response body bytes read.",
+    ("operation",),
+    buckets=(1e4, 1e5, 5e5, 1e6, 2e6, 5e6, 1e7),
+)
+FIRECRAWL_TRUNCATIONS = REGISTRY.counter(
+    "firecrawl_truncations_total",
+    "Firecrawl response parts cut at their byte cap (result strings, or whole responses).",
+    ("operation", "kind"),
+)
+LLM_LATENCY = REGISTRY.histogram(
+    "llm_request_duration_seconds",
+    "LLM call latency by pipeline stage.",
+    ("stage", "provider"),
+)
+LLM_REQUESTS = REGISTRY.counter(
+    "llm_requests_total",
+    "LLM calls by pipeline stage and outcome.",
+    ("stage", "provider", "outcome"),
+)
+LLM_TOKENS = REGISTRY.counter(
+    "llm_tokens_total",
+    "LLM tokens by pipeline stage and kind (input, output, cached).",
+    ("stage", "kind"),
+)
+LLM_QUEUE_WAIT = REGISTRY.histogram(
+    "llm_rate_limit_wait_seconds",
+    "Time LLM calls waited for the rate limiter.",
+    ("limiter",),
+)
+LLM_QUEUE_DEPTH = REGISTRY.gauge(
+    "llm_rate_limit_queued",
+    "LLM calls waiting in the rate limiter.",
+    ("limiter",),
+)
+
+# --- Graph stages ---
+NODE_LATENCY = REGISTRY.histogram(
+    "graph_node_duration_seconds",
+    "Graph node execution time.",
+    ("node",),
+)
+SEARCH_RESULTS_PER_QUERY = REGISTRY.histogram(
+    "search_results_per_query",
+    "Search results returned per query.",
+    buckets=COUNT_BUCKETS,
+)
+SEARCH_CONTENT_BYTES = REGISTRY.counter(
+    "search_content_bytes_total",
+    "Search result content bytes as fetched (raw) and after cleaning (clean).",
+    ("stage",),
+)
+LEARNINGS_PER_ITERATION = REGISTRY.histogram(
+    "learnings_per_iteration",
+    "Learnings extracted per research iteration.",
+    buckets=COUNT_BUCKETS,
+)
+STATE_ITEMS = REGISTRY.histogram(
+    "research_state_items",
+    "Number of items in list fields of the research state entering a node.",
+    ("field",),
+    buckets=SIZE_BUCKETS,
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    "cache_requests_total",
+    "Cache lookups by cache and result (hit, miss).",
+    ("cache", "result"),
+)
+
+
+def record_cache(cache: str, hit: bool):
+    """Record a cache lookup."""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def cache_hit_ratio(cache: str) -> float:
+    """Hit ratio of a cache so far (0.0 if unused)."""
+    hits = CACHE_REQUESTS.labels(cache=cache, result="hit").value
+    misses = CACHE_REQUESTS.labels(cache=cache, result="miss").value
+    total = hits + misses
+    return hits / total if total else 0.0
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry: MetricsRegistry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = self.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(
+    port: int,
+    addr: str = "127.0.0.1",
+    registry: MetricsRegistry = REGISTRY,
+) -> ThreadingHTTPServer:
+    """Serve the registry at /metrics from a daemon thread."""
+    handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+    server = ThreadingHTTPServer((addr, port), handler)
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+_started_from_env = False
+
+
+def start_from_env():
+    """Start the HTTP endpoint and/or exit dump configured in the environment."""
+    global _started_from_env
+    if _started_from_env:
+        return
+    _started_from_env = True
+
+    port = os.getenv("METRICS_PORT")
+    if port:
+        start_http_server(int(port))
+    path = os.getenv("METRICS_FILE")
+    if path:
+        atexit.register(REGISTRY.dump, path)
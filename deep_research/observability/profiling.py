@@ -0,0 +1,205 @@
+"""
+Opt-in memory profiling of graph runs.
+
+While a profiler is active, every instrumented node is bracketed by
+tracemalloc measurements, recording:
+
+- peak memory allocated while the node ran (above its starting point)
+- memory retained once it returned
+- the serialized size of each ResearchState field after the step
+
+Snapshots taken at the start and end of the profile give the top allocation
+sites. Profile one session at a time: tracemalloc is process-wide, so
+concurrent sessions would be attributed to each other's nodes.
+
+Example:
+    with profile_memory() as profiler:
+        await agent.run_async(query, skip_follow_up=True)
+    print(profiler.report())
+"""
+
+import json
+import operator
+import tracemalloc
+import typing
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+from pydantic import BaseModel, Field
+
+from ..state import ResearchState
+
+
+def _accumulated_fields() -> set[str]:
+    """State fields whose updates are appended rather than replaced."""
+    hints = typing.get_type_hints(ResearchState, include_extras=True)
+    return {
+        name for name, hint in hints.items()
+        if operator.add in getattr(hint, "__metadata__", ())
+    }
+
+
+ACCUMULATED_FIELDS = _accumulated_fields()
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, BaseModel):
+        return value.model_dump()
+    return str(value)
+
+
+def serialized_size(value: Any) -> int:
+    """Size in bytes of a value serialized as JSON."""
+    return len(json.dumps(value, default=_json_default, ensure_ascii=False).encode())
+
+
+def apply_update(state: dict, update: Any) -> dict:
+    """State after a node's update, honouring accumulating fields."""
+    if not isinstance(update, dict):
+        return dict(state)
+    merged = dict(state)
+    for key, value in update.items():
+        if key in ACCUMULATED_FIELDS:
+            merged[key] = list(state.get(key) or []) + list(value or [])
+        else:
+            merged[key] = value
+    return merged
+
+
+class NodeMemoryRecord(BaseModel):
+    """Memory measurements for one node execution."""
+    node: str
+    step: int
+    peak_bytes: int
+    retained_bytes: int
+    field_sizes: dict[str, int] = Field(default_factory=dict)
+
+
+class MemoryProfiler:
+    """
+    Collects per-node memory usage with tracemalloc.
+
+    Args:
+        top_n: Number of allocation sites in the report
+        frames: Stack frames kept per allocation (more is slower)
+    """
+
+    def __init__(self, top_n: int = 10, frames: int = 1):
+        self.top_n = top_n
+        self.frames = frames
+        self.records: list[NodeMemoryRecord] = []
+        self._start_snapshot: tracemalloc.Snapshot | None = None
+        self._end_snapshot: tracemalloc.Snapshot | None = None
+        self._started_tracing = False
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+            self._started_tracing = True
+        self._start_snapshot = tracemalloc.take_snapshot()
+
+    def stop(self):
+        self._end_snapshot = tracemalloc.take_snapshot()
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+    @contextmanager
+    def track_node(self, name: str, state: dict) -> Iterator[dict]:
+        """
+        Measure one node execution.
+
+        The caller stores the node's update under ``"update"`` in the yielded
+        dict so field sizes can be computed for the resulting state.
+        """
+        result: dict[str, Any] = {}
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            yield result
+        finally:
+            after, peak = tracemalloc.get_traced_memory()
+            new_state = apply_update(state, result.get("update"))
+            self.records.append(NodeMemoryRecord(
+                node=name,
+                step=len(self.records),
+                peak_bytes=max(0, peak - before),
+                retained_bytes=after - before,
+                field_sizes={key: serialized_size(value) for key, value in new_state.items()},
+            ))
+
+    def top_allocators(self) -> list[tracemalloc.StatisticDiff]:
+        """Allocation sites that grew the most over the profile."""
+        if self._start_snapshot is None or self._end_snapshot is None:
+            return []
+        stats = self._end_snapshot.compare_to(self._start_snapshot, "lineno")
+        return stats[:self.top_n]
+
+    def node_summary(self) -> dict[str, dict[str, int]]:
+        """Per-node call count, max peak and total retained bytes."""
+        summary: dict[str, dict[str, int]] = {}
+        for record in self.records:
+            entry = summary.setdefault(
+                record.node,
+                {"calls": 0, "max_peak_bytes": 0, "retained_bytes": 0},
+            )
+            entry["calls"] += 1
+            entry["max_peak_bytes"] = max(entry["max_peak_bytes"], record.peak_bytes)
+            entry["retained_bytes"] += record.retained_bytes
+        return summary
+
+    def report(self) -> str:
+        """Render a text report of node memory, state sizes and allocators."""
+        kb = 1024
+        lines = ["## Memory by node", f"{'node':<18}{'calls':>6}{'max peak KB':>14}{'retained KB':>14}"]
+        for node, entry in self.node_summary().items():
+            lines.append(
+                f"{node:<18}{entry['calls']:>6}"
+                f"{entry['max_peak_bytes'] / kb:>14.1f}{entry['retained_bytes'] / kb:>14.1f}"
+            )
+
+        if self.records:
+            fields = sorted(self.records[-1].field_sizes, key=lambda f: -self.records[-1].field_sizes[f])
+            lines += ["", "## State field size after each step (KB)"]
+            lines.append(f"{'step':<24}" + "".join(f"{f[:14]:>16}" for f in fields[:6]))
+            for record in self.records:
+                label = f"{record.step}:{record.node}"
+                lines.append(
+                    f"{label:<24}"
+                    + "".join(f"{record.field_sizes.get(f, 0) / kb:>16.1f}" for f in fields[:6])
+                )
+
+        top = self.top_allocators()
+        if top:
+            lines += ["", f"## Top {len(top)} allocation sites"]
+            for stat in top:
+                frame = stat.traceback[0]
+                lines.append(
+                    f"{stat.size_diff / kb:>10.1f} KB {stat.count_diff:>+8} blocks  "
+                    f"{frame.filename}:{frame.lineno}"
+                )
+        return "\n".join(lines)
+
+
+_active_profiler: ContextVar[MemoryProfiler | None] = ContextVar(
+    "deep_research_memory_profiler",
+    default=None,
+)
+
+
+def active_memory_profiler() -> MemoryProfiler | None:
+    """The memory profiler for the current context, if any."""
+    return _active_profiler.get()
+
+
+@contextmanager
+def profile_memory(top_n: int = 10, frames: int = 1) -> Iterator[MemoryProfiler]:
+    """Profile memory of graph nodes run inside the ``with`` block."""
+    profiler = MemoryProfiler(top_n=top_n, frames=frames)
+    profiler.start()
+    token = _active_profiler.set(profiler)
+    try:
+        yield profiler
+    finally:
+        _active_profiler.reset(token)
+        profiler.stop()
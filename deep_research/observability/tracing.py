@@ -0,0 +1,321 @@
+"""
+Lightweight tracing with OpenTelemetry-compatible local export.
+
+Spans are kept in a context variable so that nested work (graph node ->
+LLM call, graph node -> Firecrawl request) is linked automatically, including
+across asyncio tasks. Finished spans go to an exporter:
+
+- ``console``: one line per span on stderr
+- ``otlp-json``: OTLP/JSON ``ExportTraceServiceRequest`` lines appended to a
+  file, readable by the OpenTelemetry collector's ``otlpjsonfile`` receiver
+  and most trace viewers
+- ``none``: tracing disabled (default)
+
+Configuration (environment):
+    TRACING_EXPORTER: none | console | otlp-json
+    TRACING_FILE: Output file for otlp-json (default: traces.jsonl)
+    TRACING_SAMPLE_RATIO: Fraction of traces to record, 0.0-1.0 (default: 1.0)
+
+Sampling is decided once per trace from the trace id, so an unsampled run
+creates no span objects at all.
+"""
+
+import atexit
+import json
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator
+
+
+SERVICE_NAME = "deep-research"
+
+AttributeValue = str | int | float | bool
+
+
+class Span:
+    """A timed operation with attributes."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id",
+        "start_ns", "end_ns", "attributes", "status", "status_message",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_span_id: str | None = None,
+        attributes: dict[str, AttributeValue] | None = None,
+    ):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes: dict[str, AttributeValue] = dict(attributes or {})
+        self.status = "UNSET"
+        self.status_message = ""
+
+    @property
+    def is_recording(self) -> bool:
+        return True
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: AttributeValue | None):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, attributes: dict[str, AttributeValue | None]):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def record_exception(self, error: BaseException):
+        self.status = "ERROR"
+        self.status_message = f"{type(error).__name__}: {error}"
+
+
+class NonRecordingSpan:
+    """Span stand-in used when tracing is off or the trace is not sampled."""
+
+    is_recording = False
+
+    def __init__(self, trace_id: str = ""):
+        self.trace_id = trace_id
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, attributes: dict[str, Any]):
+        pass
+
+    def record_exception(self, error: BaseException):
+        pass
+
+
+_NOOP_SPAN = NonRecordingSpan()
+_current_span: ContextVar["Span | NonRecordingSpan | None"] = ContextVar(
+    "deep_research_current_span",
+    default=None,
+)
+
+
+def _encode_value(value: AttributeValue) -> dict[str, Any]:
+    """Encode an attribute value as an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def span_to_otlp(span: Span) -> dict[str, Any]:
+    """Convert a finished span to its OTLP/JSON representation."""
+    data = {
+        "traceId": span.trace_id,
+        "spanId": span.span_id,
+        "name": span.name,
+        "kind": 1,  # SPAN_KIND_INTERNAL
+        "startTimeUnixNano": str(span.start_ns),
+        "endTimeUnixNano": str(span.end_ns),
+        "attributes": [
+            {"key": key, "value": _encode_value(value)}
+            for key, value in span.attributes.items()
+        ],
+        "status": {"code": {"UNSET": 0, "OK": 1, "ERROR": 2}[span.status]},
+    }
+    if span.parent_span_id:
+        data["parentSpanId"] = span.parent_span_id
+    if span.status_message:
+        data["status"]["message"] = span.status_message
+    return data
+
+
+class ConsoleSpanExporter:
+    """Print one line per finished span."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def export(self, span: Span):
+        attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        status = "" if span.status != "ERROR" else f" ERROR({span.status_message})"
+        print(
+            f"[trace {span.trace_id[:8]}] {span.name} {span.duration_ms:.1f}ms{status} {attributes}",
+            file=self.stream,
+        )
+
+    def shutdown(self):
+        pass
+
+
+class OTLPJsonFileExporter:
+    """
+    Append spans to a file as OTLP/JSON, one export request per line.
+
+    Spans are buffered and written in batches of ``batch_size`` (and on
+    shutdown) so the hot path never touches the file system.
+    """
+
+    def __init__(self, path: str = "traces.jsonl", batch_size: int = 64):
+        self.path = path
+        self.batch_size = batch_size
+        self._buffer: list[Span] = []
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        self._buffer.append(span)
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            batch, self._buffer = self._buffer, []
+        if not batch:
+            return
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": SERVICE_NAME}},
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "deep_research"},
+                    "spans": [span_to_otlp(span) for span in batch],
+                }],
+            }],
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(request) + "\n")
+
+    def shutdown(self):
+        self.flush()
+
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to an exporter.
+
+    Args:
+        exporter: Span exporter, or None to disable tracing
+        sample_ratio: Fraction of traces to record
+    """
+
+    def __init__(self, exporter=None, sample_ratio: float = 1.0):
+        self.exporter = exporter
+        self.sample_ratio = max(0.0, min(1.0, sample_ratio))
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def _sampled(self, trace_id: str) -> bool:
+        return int(trace_id[:16], 16) < self.sample_ratio * 2**64
+
+    @contextmanager
+    def start_span(
+        self,
+        name: str,
+        attributes: dict[str, AttributeValue | None] | None = None,
+    ) -> Iterator["Span | NonRecordingSpan"]:
+        """
+        Start a span as a child of the current span.
+
+        The span becomes current for the duration of the ``with`` block and
+        is marked as failed if the block raises.
+        """
+        if not self.enabled:
+            yield _NOOP_SPAN
+            return
+
+        parent = _current_span.get()
+        if parent is None:
+            trace_id = f"{random.getrandbits(128):032x}"
+            if not self._sampled(trace_id):
+                span = NonRecordingSpan(trace_id)
+            else:
+                span = Span(name, trace_id)
+        elif not parent.is_recording:
+            span = parent
+        else:
+            span = Span(name, parent.trace_id, parent.span_id)
+
+        if attributes:
+            span.set_attributes(attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            if span.is_recording:
+                span.end_ns = time.time_ns()
+                if span.status == "UNSET":
+                    span.status = "OK"
+                self.exporter.export(span)
+
+    def shutdown(self):
+        if self.exporter is not None:
+            self.exporter.shutdown()
+
+
+def _tracer_from_env() -> Tracer:
+    exporter_name = os.getenv("TRACING_EXPORTER", "none").lower()
+    sample_ratio = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+    if exporter_name == "console":
+        return Tracer(ConsoleSpanExporter(), sample_ratio)
+    if exporter_name in ("otlp-json", "otlp_json", "file"):
+        return Tracer(OTLPJsonFileExporter(os.getenv("TRACING_FILE", "traces.jsonl")), sample_ratio)
+    return Tracer()
+
+
+_tracer: Tracer | None = None
+
+
+def get_tracer() -> Tracer:
+    """Get or create the process-wide tracer from the environment."""
+    global _tracer
+    if _tracer is None:
+        _tracer = _tracer_from_env()
+        atexit.register(_tracer.shutdown)
+    return _tracer
+
+
+def configure_tracing(exporter=None, sample_ratio: float = 1.0) -> Tracer:
+    """
+    Replace the process-wide tracer.
+
+    Args:
+        exporter: ConsoleSpanExporter, OTLPJsonFileExporter or None to disable
+        sample_ratio: Fraction of traces to record
+    """
+    global _tracer
+    if _tracer is not None:
+        _tracer.shutdown()
+    _tracer = Tracer(exporter, sample_ratio)
+    atexit.register(_tracer.shutdown)
+    return _tracer
+
+
+def start_span(
+    name: str,
+    attributes: dict[str, AttributeValue | None] | None = None,
+):
+    """Start a span on the process-wide tracer."""
+    return get_tracer().start_span(name, attributes)
+
+
+def current_span() -> "Span | NonRecordingSpan":
+    """The active span, or a non-recording span outside of any trace."""
+    return _current_span.get() or _NOOP_SPAN
@@ -2,8 +2,10 @@
 State management for the Deep Research agent using Pydantic models.
 """
 
+from datetime import date, datetime
 from typing import TypedDict, Annotated, Sequence
 from pydantic import BaseModel, Field
+from langchain_core.runnables import RunnableConfig
 import operator
 
 
@@ -27,6 +29,25 @@ class ResearchDirection(BaseModel):
     goal: str
     rationale: str
     priority: int = 1
+    queries: list[str] = Field(default_factory=list)  # Set in fused planning mode
+
+
+class RunSnapshot(BaseModel):
+    """
+    What a finished run leaves for a later refresh of the same query.
+    
+    Source content is not kept; ``content_hashes`` tells whether a page
+    fetched again has changed.
+    """
+    query: str
+    breadth: int
+    depth: int
+    follow_up_answers: list[str] = Field(default_factory=list)
+    started_at: datetime
+    report: str
+    learnings: list[Learning] = Field(default_factory=list)
+    sources: list[Source] = Field(default_factory=list)
+    content_hashes: dict[str, str] = Field(default_factory=dict)
 
 
 class ResearchState(TypedDict):
@@ -58,17 +79,126 @@ class ResearchState(TypedDict):
     # Final output
     final_report: str
     
+    # Refresh mode: report of the earlier run and how many of the learnings
+    # came from it (empty and 0 otherwise)
+    previous_report: str
+    previous_learning_count: int
+    
     # Metadata
     total_tokens_used: int
     error: str | None
 
 
+class ModelProfile(BaseModel):
+    """
+    LLM settings for one pipeline stage.
+    
+    Unset fields fall back to the environment defaults of LLMProvider.
+    """
+    provider: str | None = None
+    model: str | None = None
+    max_tokens: int | None = Field(default=None, ge=1)
+    timeout: float | None = Field(default=None, gt=0)  # Seconds per attempt
+    cached_content: str | None = None  # Gemini context cache name
+
+
 class GraphConfig(BaseModel):
     """Configuration for the research graph."""
     concurrency_limit: int = Field(default=3, ge=1, le=10)
     max_tokens_per_query: int = Field(default=4000)
     llm_temperature: float = Field(default=0.5, ge=0.0, le=2.0)
     enable_checkpointing: bool = Field(default=False)
+    
+    # Start searches for the top next direction while queries are generated
+    speculative_prefetch: bool = Field(default=False)
+    prefetch_min_overlap: float = Field(default=0.5, ge=0.0, le=1.0)
+    
+    # Plan directions and the next depth's queries in one LLM call
+    fused_planning: bool = Field(default=False)
+    
+    # Stream structured LLM calls and parse array items as they arrive
+    streaming_json: bool = Field(default=False)
+    
+    # Per-stage LLM settings, keyed by stage: follow_up_questions,
+    # generate_queries, extract_learnings, generate_directions,
+    # report_outline, generate_report
+    model_profiles: dict[str, ModelProfile] = Field(default_factory=dict)
+    
+    # Tokens of learnings sent to the report prompt; the best-ranked ones
+    # that fit are used and the rest listed in an appendix. None: all
+    report_token_budget: int | None = Field(default=12000, ge=1)
+    
+    # Generate the report as an outline, then all sections concurrently
+    sectioned_report: bool = Field(default=False)
+    
+    # Results per query: a first page of search_page_size, then further pages
+    # of that size (up to max_results_per_query in all) only while at least
+    # min_page_yield of the last page was new to the run and relevant to the
+    # query
+    search_page_size: int = Field(default=3, ge=1, le=20)
+    max_results_per_query: int = Field(default=9, ge=1, le=50)
+    min_page_yield: float = Field(default=0.5, ge=0.0, le=1.0)
+    
+    # Deep-scrape stage between search and processing: the full pages of
+    # the deep_scrape_top_k results of each iteration most relevant to their
+    # queries are scraped (at most deep_scrape_per_host at a time per host)
+    # and given more room in the extraction prompt; 0 disables
+    deep_scrape_top_k: int = Field(default=0, ge=0, le=20)
+    deep_scrape_per_host: int = Field(default=2, ge=1)
+    
+    # Strip navigation, banners and repeated blocks from fetched pages
+    clean_content: bool = Field(default=True)
+    
+    # Collapse results whose content is a near-duplicate (estimated Jaccard
+    # similarity at least this) of a page seen earlier in the run; None disables
+    near_duplicate_threshold: float | None = Field(default=0.8, gt=0.0, le=1.0)
+    
+    # Replace or answer from earlier results any generated query whose
+    # similarity to a query already searched in the run is at least this;
+    # None disables
+    query_dedup_threshold: float | None = Field(default=0.7, gt=0.0, le=1.0)
+    
+    # SQLite file of the knowledge base shared across runs; None disables.
+    # Stored sources and learnings older than knowledge_max_age_hours are
+    # fetched and extracted again
+    knowledge_base: str | None = Field(default=None)
+    knowledge_max_age_hours: float = Field(default=168.0, gt=0.0)
+    
+    # Refresh mode: only search for pages published since this date
+    search_since: date | None = Field(default=None)
+    
+    # Send only sources not analyzed earlier in the run to extract_learnings;
+    # known sources contribute the learnings they produced before
+    incremental_processing: bool = Field(default=True)
+    
+    # Seconds from the start of the graph run by which the report must be
+    # ready; None: no deadline. Research stops report_reserve_seconds (at most
+    # half the deadline) before it, skipping remaining depths and cutting off
+    # searches in flight, and the report is written from the learnings so far
+    deadline_seconds: float | None = Field(default=None, gt=0.0)
+    report_reserve_seconds: float = Field(default=60.0, ge=0.0)
+    
+    # Total seconds a run may wait for Firecrawl to come back when its
+    # circuit breaker opens and a search returns nothing; beyond that (or
+    # the deadline) the run goes on to the report
+    outage_max_wait_seconds: float = Field(default=60.0, ge=0.0)
+    
+    # Weight of this run's LLM calls when the rate limiter queues them
+    llm_share: float = Field(default=1.0, gt=0.0)
+    
+    def profile_for(self, stage: str) -> ModelProfile | None:
+        """The model profile configured for a stage, if any."""
+        return self.model_profiles.get(stage)
+    
+    @classmethod
+    def from_runnable_config(cls, config: RunnableConfig | None = None) -> "GraphConfig":
+        """Read the configuration from a graph run's ``configurable`` section."""
+        configurable = (config or {}).get("configurable", {})
+        return cls(**{
+            name: configurable[name]
+            for name in cls.model_fields
+            if name in configurable
+        })
 
 
 def create_initial_state(
@@ -91,6 +221,8 @@ def create_initial_state(
         search_queries=[],
         search_results=[],
         final_report="",
+        previous_report="",
+        previous_learning_count=0,
         total_tokens_used=0,
         error=None,
     )
@@ -1,12 +1,32 @@
 """Tools module."""
 
 from .llm import LLMProvider, count_tokens, truncate_to_tokens
+from .breaker import CircuitBreaker, CircuitOpenError, get_breaker
 from .firecrawl import FirecrawlClient, get_firecrawl_client
+from .knowledge import KnowledgeBase
+from .prefetch import SearchPrefetcher
+from .queries import QueryRegistry, normalize_query, query_similarity, query_words
+from .routing import LLMRouter, get_router
+from .workers import CPUPool, get_cpu_pool, run_cpu
 
 __all__ = [
     "LLMProvider",
     "count_tokens",
     "truncate_to_tokens",
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "get_breaker",
     "FirecrawlClient",
     "get_firecrawl_client",
+    "KnowledgeBase",
+    "SearchPrefetcher",
+    "QueryRegistry",
+    "normalize_query",
+    "query_similarity",
+    "query_words",
+    "LLMRouter",
+    "get_router",
+    "CPUPool",
+    "get_cpu_pool",
+    "run_cpu",
 ]
@@ -0,0 +1,200 @@
+"""
+Circuit breakers around upstream services (Firecrawl, each LLM provider).
+
+During an outage every call to an upstream would otherwise wait out its
+timeout, and calls pile up on connections that will not answer. A breaker
+watches the outcomes of the latest calls to its upstream:
+
+- closed: calls go through. Once at least ``min_calls`` of the latest
+  ``window`` calls (made within ``window_seconds``) are known and at least
+  ``error_rate`` of them failed, the breaker opens
+- open: calls fail fast with ``CircuitOpenError`` for ``open_seconds``
+- half-open: then one trial call goes through. Success closes the breaker;
+  failure opens it again for twice as long, up to ``max_open_seconds``
+
+Only upstream failures count (timeouts, connection errors, 429 and 5xx
+responses), not bad requests or calls cancelled by the caller. Breakers are
+process-wide, so every run benefits from what the others have observed.
+
+Configuration (environment):
+    CIRCUIT_ERROR_RATE: Failure share that opens a breaker (default: 0.5)
+    CIRCUIT_MIN_CALLS: Calls in the window before it can open (default: 5)
+    CIRCUIT_WINDOW: Latest calls considered (default: 20)
+    CIRCUIT_WINDOW_SECONDS: Age beyond which calls are forgotten (default: 60)
+    CIRCUIT_OPEN_SECONDS: First open period in seconds (default: 30)
+"""
+
+import os
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from ..observability.metrics import REGISTRY
+
+
+CIRCUIT_EVENTS = REGISTRY.counter(
+    "circuit_breaker_events_total",
+    "Circuit breaker events by upstream (open, half_open, close, rejected).",
+    ("upstream", "event"),
+)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of calling an upstream whose breaker is open."""
+
+    def __init__(self, upstream: str, retry_in: float):
+        super().__init__(f"{upstream} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.upstream = upstream
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open breaker of one upstream.
+
+    Args:
+        name: Upstream name, e.g. "firecrawl" or "llm:openai"
+        error_rate: Failure share of the window that opens the breaker
+        min_calls: Outcomes needed before the breaker can open
+        window: Latest outcomes considered
+        window_seconds: Age beyond which outcomes are forgotten
+        open_seconds: First open period
+        max_open_seconds: Upper bound of the doubling open period
+    """
+
+    def __init__(
+        self,
+        name: str,
+        error_rate: float = 0.5,
+        min_calls: int = 5,
+        window: int = 20,
+        window_seconds: float = 60.0,
+        open_seconds: float = 30.0,
+        max_open_seconds: float = 300.0,
+    ):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        # (time, succeeded) of the latest calls
+        self._outcomes: deque[tuple[float, bool]] = deque(maxlen=window)
+        self._state = CLOSED
+        self._open_until = 0.0
+        self._open_for = open_seconds
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() >= self._open_until:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+            CIRCUIT_EVENTS.inc(upstream=self.name, event="half_open")
+        return self._state
+
+    def retry_in(self) -> float:
+        """Seconds until a trial call may go through (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self._open_until - time.monotonic())
+
+    def _open(self, seconds: float):
+        self._state = OPEN
+        self._open_for = seconds
+        self._open_until = time.monotonic() + seconds
+        self._outcomes.clear()
+        CIRCUIT_EVENTS.inc(upstream=self.name, event="open")
+        print(f"  🔌 {self.name} is failing; failing fast for {seconds:.0f}s")
+
+    def before_call(self):
+        """
+        Take permission for a call.
+
+        Raises:
+            CircuitOpenError: If the breaker is open, or half-open with its
+                trial call already in flight
+        """
+        state = self.state
+        if state == OPEN or (state == HALF_OPEN and self._trial_in_flight):
+            CIRCUIT_EVENTS.inc(upstream=self.name, event="rejected")
+            raise CircuitOpenError(self.name, self.retry_in())
+        if state == HALF_OPEN:
+            self._trial_in_flight = True
+
+    def record_success(self):
+        if self._state == HALF_OPEN:
+            self._state = CLOSED
+            self._open_for = self.open_seconds
+            self._outcomes.clear()
+            CIRCUIT_EVENTS.inc(upstream=self.name, event="close")
+        self._trial_in_flight = False
+        self._outcomes.append((time.monotonic(), True))
+
+    def record_failure(self):
+        if self._state == HALF_OPEN:
+            self._open(min(self.max_open_seconds, self._open_for * 2))
+            return
+        now = time.monotonic()
+        self._outcomes.append((now, False))
+        while self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+        failures = sum(not succeeded for _, succeeded in self._outcomes)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+            self._open(self.open_seconds)
+
+    @contextmanager
+    def call(self, is_failure: Callable[[BaseException], bool]) -> Iterator[None]:
+        """
+        Guard a call to the upstream and record its outcome.
+
+        Errors for which ``is_failure`` is false count as successes (the
+        upstream answered); cancellation records nothing.
+
+        Raises:
+            CircuitOpenError: If the call may not go through
+        """
+        self.before_call()
+        try:
+            yield
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            else:
+                self.record_success()
+            raise
+        except BaseException:
+            self._trial_in_flight = False
+            raise
+        self.record_success()
+
+
+def _settings_from_env() -> dict[str, float]:
+    settings = {}
+    for name, key, kind in (
+        ("CIRCUIT_ERROR_RATE", "error_rate", float),
+        ("CIRCUIT_MIN_CALLS", "min_calls", int),
+        ("CIRCUIT_WINDOW", "window", int),
+        ("CIRCUIT_WINDOW_SECONDS", "window_seconds", float),
+        ("CIRCUIT_OPEN_SECONDS", "open_seconds", float),
+    ):
+        value = os.getenv(name)
+        if value:
+            settings[key] = kind(value)
+    return settings
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the process-wide breaker of an upstream."""
+    breaker = _breakers.get(name)
+    if breaker is None:
+        breaker = _breakers.setdefault(name, CircuitBreaker(name, **_settings_from_env()))
+    return breaker
@@ -4,19 +4,67 @@ Firecrawl integration for web search and content extraction.
 
 import os
 import asyncio
-from typing import Any
+import functools
+import ssl
+import time
+from contextlib import asynccontextmanager
+from datetime import date
+from typing import Any, AsyncIterator
+from urllib.parse import urlsplit
 import httpx
 
+from ..observability import start_span
+from ..observability.metrics import (
+    FIRECRAWL_LATENCY,
+    FIRECRAWL_REQUESTS,
+    FIRECRAWL_RESPONSE_BYTES,
+    FIRECRAWL_TRUNCATIONS,
+)
+from ..utils.json_stream import JSONArrayByteStreamParser
+from .breaker import CircuitOpenError, get_breaker
+from .routing import is_retryable
+
+
+@functools.lru_cache(maxsize=None)
+def _ssl_context() -> ssl.SSLContext:
+    """SSL context shared by every client (loading the CA bundle blocks for tens of ms)."""
+    return httpx.create_ssl_context()
+
+
+def is_upstream_failure(error: BaseException) -> bool:
+    """Whether an error means Firecrawl itself is failing."""
+    return isinstance(error, httpx.TransportError) or is_retryable(error)
+
 
 class FirecrawlClient:
     """
     Client for Firecrawl API supporting search and content extraction.
+    
+    Requests go through the "firecrawl" circuit breaker: while Firecrawl
+    is failing they return no results at once instead of waiting out
+    their timeout.
+    
+    Responses are streamed and parsed as they arrive rather than read
+    whole: each string of a result (its markdown, mostly) is cut at
+    ``max_result_bytes`` while reading, and reading stops after
+    ``max_response_bytes``, keeping the results complete by then. A
+    search's memory is bounded however large the pages it scrapes.
+    
+    Args:
+        api_key: Firecrawl API key (default: FIRECRAWL_API_KEY)
+        base_url: API base URL (default: FIRECRAWL_BASE_URL)
+        max_result_bytes: Bytes kept of each string of a result
+            (default: FIRECRAWL_MAX_RESULT_BYTES or 100 kB)
+        max_response_bytes: Bytes read of a response
+            (default: FIRECRAWL_MAX_RESPONSE_BYTES or 10 MB)
     """
     
     def __init__(
         self,
         api_key: str | None = None,
         base_url: str | None = None,
+        max_result_bytes: int | None = None,
+        max_response_bytes: int | None = None,
     ):
         self.api_key = api_key or os.getenv("FIRECRAWL_API_KEY", "")
         self.base_url = base_url or os.getenv(
@@ -27,20 +75,78 @@ class FirecrawlClient:
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json",
         }
+        self.max_result_bytes = max_result_bytes or int(
+            os.getenv("FIRECRAWL_MAX_RESULT_BYTES", 100_000)
+        )
+        self.max_response_bytes = max_response_bytes or int(
+            os.getenv("FIRECRAWL_MAX_RESPONSE_BYTES", 10_000_000)
+        )
+    
+    async def _post(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        payload: dict[str, Any],
+        operation: str,
+        span,
+    ) -> tuple[int, list[dict[str, Any]]]:
+        """
+        POST a request and stream the items under "data" of its response
+        (a single object there counts as one item).
+        
+        Returns:
+            The status code and the items
+        
+        Raises:
+            httpx.HTTPError: On transport errors and error statuses
+        """
+        parser = JSONArrayByteStreamParser(key="data", max_string_bytes=self.max_result_bytes)
+        items: list[dict[str, Any]] = []
+        capped = False
+        async with client.stream("POST", url, json=payload, headers=self.headers) as response:
+            span.set_attribute("http.status_code", response.status_code)
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                items += parser.feed(chunk)
+                if parser.bytes_received >= self.max_response_bytes:
+                    capped = True
+                    break
+        items += parser.finish()
+        
+        span.set_attributes({
+            "http.response_bytes": parser.bytes_received,
+            "firecrawl.truncated_strings": parser.truncated,
+            "firecrawl.response_capped": capped,
+        })
+        FIRECRAWL_RESPONSE_BYTES.observe(parser.bytes_received, operation=operation)
+        if parser.truncated:
+            FIRECRAWL_TRUNCATIONS.inc(parser.truncated, operation=operation, kind="result")
+        if capped:
+            FIRECRAWL_TRUNCATIONS.inc(operation=operation, kind="response")
+        return response.status_code, [item for item in items if isinstance(item, dict)]
     
     async def search(
         self,
         query: str,
         num_results: int = 5,
         timeout: int = 30,
+        since: date | None = None,
+        offset: int = 0,
     ) -> list[dict[str, Any]]:
         """
         Perform a web search using Firecrawl.
         
+        The v1 search endpoint has no offset. A later page (``offset`` > 0)
+        is fetched by listing the result links up to the end of the page
+        without scraping them, then scraping only the links of the page.
+        
         Args:
             query: The search query
             num_results: Number of results to return
-            timeout: Request timeout in seconds
+            timeout: Request timeout in seconds (the run's deadline may
+                cut the request off earlier)
+            since: Only return pages published on or after this date
+            offset: Number of leading results to skip
             
         Returns:
             List of search results with url, title, and content
@@ -48,41 +154,75 @@ class FirecrawlClient:
         url = f"{self.base_url}/v1/search"
         payload = {
             "query": query,
-            "limit": num_results,
-            "scrapeOptions": {
-                "formats": ["markdown"],
-            }
+            "limit": offset + num_results,
         }
+        if not offset:
+            payload["scrapeOptions"] = {"formats": ["markdown"]}
+        if since is not None:
+            # Google-style custom date range
+            payload["tbs"] = f"cdr:1,cd_min:{since.month}/{since.day}/{since.year}"
         
-        try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(
-                    url,
-                    json=payload,
-                    headers=self.headers,
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                # Extract results
-                results = []
-                for item in data.get("data", []):
-                    results.append({
-                        "url": item.get("url", ""),
-                        "title": item.get("title", ""),
-                        "content": item.get("markdown", ""),
-                    })
-                
-                return results
-                
-        except httpx.HTTPError as e:
-            print(f"Error searching with Firecrawl: {e}")
-            return []
+        attributes = {
+            "firecrawl.query": query,
+            "firecrawl.limit": num_results,
+            "firecrawl.offset": offset,
+        }
+        with start_span("firecrawl.search", attributes) as span:
+            t0 = time.perf_counter()
+            status = "error"
+            try:
+                async with _time_limit(), httpx.AsyncClient(timeout=timeout, verify=_ssl_context()) as client:
+                    with get_breaker("firecrawl").call(is_upstream_failure):
+                        status_code, items = await self._post(client, url, payload, "search", span)
+                        status = str(status_code)
+                    
+                    # Extract results
+                    results = []
+                    for item in items[offset:]:
+                        results.append({
+                            "url": item.get("url", ""),
+                            "title": item.get("title", ""),
+                            "content": item.get("markdown", ""),
+                        })
+                    
+                    span.set_attribute("firecrawl.results", len(results))
+                    
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.HTTPStatusError):
+                    status = str(e.response.status_code)
+                span.record_exception(e)
+                print(f"Error searching with Firecrawl: {e}")
+                return []
+            except TimeoutError:
+                status = "timeout"
+                print(f"⏱️ Search cut off: {query}")
+                return []
+            except CircuitOpenError:
+                status = "circuit_open"
+                return []
+            finally:
+                FIRECRAWL_LATENCY.observe(time.perf_counter() - t0, operation="search")
+                FIRECRAWL_REQUESTS.inc(operation="search", status=status)
+        
+        if offset:
+            pages = await self.batch_scrape(
+                [result["url"] for result in results if result["url"]],
+                concurrency_limit=len(results) or 1,
+                timeout=timeout,
+            )
+            results = [
+                {**result, "title": result["title"] or pages[result["url"]]["title"],
+                 "content": pages[result["url"]]["content"]}
+                for result in results
+                if result["url"] in pages
+            ]
+        return results
     
     async def scrape(
         self,
         url: str,
         timeout: int = 30,
+        client: httpx.AsyncClient | None = None,
     ) -> dict[str, Any]:
         """
         Scrape content from a URL using Firecrawl.
@@ -90,6 +230,8 @@ class FirecrawlClient:
         Args:
             url: The URL to scrape
             timeout: Request timeout in seconds
+            client: HTTP client to send the request with (default: a new
+                one for this request)
             
         Returns:
             Scraped content with url, title, and markdown
@@ -100,31 +242,87 @@ class FirecrawlClient:
             "formats": ["markdown"],
         }
         
-        try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                response = await client.post(
-                    endpoint,
-                    json=payload,
-                    headers=self.headers,
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                return {
-                    "url": url,
-                    "title": data.get("data", {}).get("title", ""),
-                    "content": data.get("data", {}).get("markdown", ""),
-                }
-                
-        except httpx.HTTPError as e:
-            print(f"Error scraping URL {url}: {e}")
-            return {"url": url, "title": "", "content": ""}
+        with start_span("firecrawl.scrape", {"firecrawl.url": url}) as span:
+            t0 = time.perf_counter()
+            status = "error"
+            try:
+                async with _time_limit(), _http_client(client, timeout) as client:
+                    with get_breaker("firecrawl").call(is_upstream_failure):
+                        status_code, items = await self._post(client, endpoint, payload, "scrape", span)
+                        status = str(status_code)
+                    data = items[0] if items else {}
+                    
+                    return {
+                        "url": url,
+                        "title": data.get("title", ""),
+                        "content": data.get("markdown", ""),
+                    }
+                    
+            except httpx.HTTPError as e:
+                if isinstance(e, httpx.HTTPStatusError):
+                    status = str(e.response.status_code)
+                span.record_exception(e)
+                print(f"Error scraping URL {url}: {e}")
+                return {"url": url, "title": "", "content": ""}
+            except TimeoutError:
+                status = "timeout"
+                print(f"⏱️ Scrape cut off: {url}")
+                return {"url": url, "title": "", "content": ""}
+            except CircuitOpenError:
+                status = "circuit_open"
+                return {"url": url, "title": "", "content": ""}
+            finally:
+                FIRECRAWL_LATENCY.observe(time.perf_counter() - t0, operation="scrape")
+                FIRECRAWL_REQUESTS.inc(operation="scrape", status=status)
+    
+    async def batch_scrape(
+        self,
+        urls: list[str],
+        concurrency_limit: int = 3,
+        per_host_limit: int = 2,
+        timeout: int = 30,
+    ) -> dict[str, dict[str, Any]]:
+        """
+        Scrape several URLs concurrently.
+        
+        The requests share one connection pool. At most
+        ``concurrency_limit`` run at once, and at most ``per_host_limit``
+        for pages of the same host, so a batch does not hammer one site.
+        Repeated URLs are scraped once.
+        
+        Args:
+            urls: URLs to scrape
+            concurrency_limit: Maximum concurrent requests
+            per_host_limit: Maximum concurrent requests per host
+            timeout: Request timeout in seconds
+            
+        Returns:
+            Dictionary mapping URLs to their scraped content (like
+            ``scrape``'s); URLs that yielded no content are left out
+        """
+        urls = list(dict.fromkeys(urls))
+        if not urls:
+            return {}
+        semaphore = asyncio.Semaphore(concurrency_limit)
+        hosts: dict[str, asyncio.Semaphore] = {}
+        limits = httpx.Limits(max_connections=concurrency_limit, max_keepalive_connections=concurrency_limit)
+        
+        async with httpx.AsyncClient(timeout=timeout, limits=limits, verify=_ssl_context()) as client:
+            async def scrape_with_limit(url: str) -> dict[str, Any]:
+                host = hosts.setdefault(urlsplit(url).netloc, asyncio.Semaphore(per_host_limit))
+                async with host, semaphore:
+                    return await self.scrape(url, timeout, client=client)
+            
+            pages = await asyncio.gather(*(scrape_with_limit(url) for url in urls))
+        return {page["url"]: page for page in pages if page["content"]}
     
     async def batch_search(
         self,
         queries: list[str],
         num_results: int = 5,
         concurrency_limit: int = 3,
+        since: date | None = None,
+        offsets: dict[str, int] | None = None,
     ) -> dict[str, list[dict[str, Any]]]:
         """
         Perform multiple searches concurrently.
@@ -133,6 +331,8 @@ class FirecrawlClient:
             queries: List of search queries
             num_results: Number of results per query
             concurrency_limit: Maximum concurrent requests
+            since: Only return pages published on or after this date
+            offsets: Leading results to skip, by query (default: none)
             
         Returns:
             Dictionary mapping queries to their results
@@ -141,7 +341,8 @@ class FirecrawlClient:
         
         async def search_with_limit(query: str):
             async with semaphore:
-                results = await self.search(query, num_results)
+                offset = offsets.get(query, 0) if offsets else 0
+                results = await self.search(query, num_results, since=since, offset=offset)
                 return query, results
         
         tasks = [search_with_limit(q) for q in queries]
@@ -159,6 +360,23 @@ class FirecrawlClient:
         return search_results
 
 
+@asynccontextmanager
+async def _http_client(client: httpx.AsyncClient | None, timeout: float) -> AsyncIterator[httpx.AsyncClient]:
+    """The given client, or a new one closed on exit."""
+    if client is not None:
+        yield client
+        return
+    async with httpx.AsyncClient(timeout=timeout, verify=_ssl_context()) as client:
+        yield client
+
+
+def _time_limit():
+    """Time limit of the research run in progress, if any."""
+    # Imported here: the run context module imports the tools package
+    from ..context import time_limit
+    return time_limit("search")
+
+
 # Singleton instance
 _firecrawl_client: FirecrawlClient | None = None
 
@@ -0,0 +1,295 @@
+"""
+Persistent knowledge base shared across research runs.
+
+Runs on overlapping topics fetch the same pages and extract the same
+learnings again. The knowledge base keeps them in a local SQLite database:
+
+- sources: URL, title, cleaned content, when it was fetched and when it
+  was last analyzed for learnings
+- learnings: content, confidence, cited source URLs and when extracted
+- searches: the URLs each (normalized) query returned
+
+Sources and learnings are indexed with FTS5 for full-text lookup. Every
+lookup takes a maximum age; anything older counts as missing, so it is
+fetched (and extracted) again and the stored copy replaced. That age is the
+freshness policy.
+
+Methods are blocking; callers on the event loop run them in a thread
+(``asyncio.to_thread``). One connection is shared by every thread, one
+method at a time.
+"""
+
+import functools
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from ..state import Learning
+from .queries import normalize_query, query_words
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    id INTEGER PRIMARY KEY,
+    url TEXT UNIQUE NOT NULL,
+    title TEXT NOT NULL DEFAULT '',
+    content TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    analyzed_at REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS sources_fts USING fts5(
+    title, content, content='sources', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS sources_insert AFTER INSERT ON sources BEGIN
+    INSERT INTO sources_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS sources_delete AFTER DELETE ON sources BEGIN
+    INSERT INTO sources_fts(sources_fts, rowid, title, content)
+    VALUES ('delete', old.id, old.title, old.content);
+END;
+CREATE TRIGGER IF NOT EXISTS sources_update AFTER UPDATE ON sources BEGIN
+    INSERT INTO sources_fts(sources_fts, rowid, title, content)
+    VALUES ('delete', old.id, old.title, old.content);
+    INSERT INTO sources_fts(rowid, title, content) VALUES (new.id, new.title, new.content);
+END;
+
+CREATE TABLE IF NOT EXISTS learnings (
+    id INTEGER PRIMARY KEY,
+    content TEXT UNIQUE NOT NULL,
+    confidence REAL NOT NULL,
+    sources TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS learning_sources (
+    learning_id INTEGER NOT NULL REFERENCES learnings(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    PRIMARY KEY (learning_id, url)
+);
+CREATE INDEX IF NOT EXISTS learning_sources_url ON learning_sources(url);
+CREATE VIRTUAL TABLE IF NOT EXISTS learnings_fts USING fts5(
+    content, content='learnings', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS learnings_insert AFTER INSERT ON learnings BEGIN
+    INSERT INTO learnings_fts(rowid, content) VALUES (new.id, new.content);
+END;
+CREATE TRIGGER IF NOT EXISTS learnings_delete AFTER DELETE ON learnings BEGIN
+    INSERT INTO learnings_fts(learnings_fts, rowid, content) VALUES ('delete', old.id, old.content);
+END;
+
+CREATE TABLE IF NOT EXISTS searches (
+    query TEXT PRIMARY KEY,
+    urls TEXT NOT NULL,
+    searched_at REAL NOT NULL
+);
+"""
+
+
+def _locked(method: Callable) -> Callable:
+    """Serialize calls to the shared connection."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def _match_expression(text: str, operator: str) -> str | None:
+    """FTS5 query matching the content words of a text."""
+    words = query_words(text)
+    if not words:
+        return None
+    return f" {operator} ".join(f'"{word}"' for word in dict.fromkeys(words))
+
+
+class KnowledgeBase:
+    """
+    SQLite store of sources and learnings from past runs.
+
+    Args:
+        path: Database file (":memory:" for a throwaway one)
+        max_age: Seconds after which stored material is stale
+    """
+
+    def __init__(self, path: str, max_age: float = 7 * 24 * 3600):
+        self.path = path
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            self._db.execute("PRAGMA journal_mode = WAL")
+        self._db.executescript(SCHEMA)
+
+    @_locked
+    def close(self):
+        self._db.close()
+
+    def _fresh_since(self, max_age: float | None) -> float:
+        return time.time() - (self.max_age if max_age is None else max_age)
+
+    def _sources(self, urls: list[str], since: float) -> list[dict[str, Any]]:
+        rows = self._db.execute(
+            f"SELECT url, title, content FROM sources "
+            f"WHERE fetched_at >= ? AND url IN ({','.join('?' * len(urls))})",
+            [since, *urls],
+        ).fetchall()
+        by_url = {row["url"]: dict(row) for row in rows}
+        return [by_url[url] for url in urls if url in by_url]
+
+    @_locked
+    def find_sources(
+        self,
+        query: str,
+        limit: int = 5,
+        max_age: float | None = None,
+    ) -> list[dict[str, Any]]:
+        """
+        Fresh sources for a search query, best first.
+
+        The results of an earlier search for the same (normalized) query are
+        returned if all of them are still fresh. Otherwise sources matching
+        every content word of the query are, ranked by BM25, if there are
+        ``limit`` of them to stand in for a search.
+
+        Returns:
+            Results like ``FirecrawlClient.search``'s (at most ``limit``),
+            or an empty list
+        """
+        since = self._fresh_since(max_age)
+        row = self._db.execute(
+            "SELECT urls FROM searches WHERE query = ? AND searched_at >= ?",
+            (normalize_query(query), since),
+        ).fetchone()
+        if row is not None:
+            urls = json.loads(row["urls"])[:limit]
+            sources = self._sources(urls, since)
+            if urls and len(sources) == len(urls):
+                return sources
+
+        expression = _match_expression(query, "AND")
+        if expression is None:
+            return []
+        rows = self._db.execute(
+            "SELECT s.url, s.title, s.content FROM sources_fts "
+            "JOIN sources s ON s.id = sources_fts.rowid "
+            "WHERE sources_fts MATCH ? AND s.fetched_at >= ? "
+            "ORDER BY bm25(sources_fts) LIMIT ?",
+            (expression, since, limit),
+        ).fetchall()
+        return [dict(row) for row in rows] if len(rows) >= limit else []
+
+    @_locked
+    def add_search(self, query: str, results: list[dict[str, Any]]):
+        """Store a search and the sources it returned."""
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "INSERT INTO sources (url, title, content, fetched_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET "
+                "title = excluded.title, content = excluded.content, fetched_at = excluded.fetched_at, "
+                # Learnings of changed content no longer apply
+                "analyzed_at = CASE WHEN content = excluded.content THEN analyzed_at END",
+                [
+                    (result["url"], result.get("title") or "", result["content"], now)
+                    for result in results
+                    if result.get("url") and result.get("content")
+                ],
+            )
+            self._db.execute(
+                "INSERT OR REPLACE INTO searches (query, urls, searched_at) VALUES (?, ?, ?)",
+                (normalize_query(query), json.dumps([r["url"] for r in results if r.get("url")]), now),
+            )
+
+    @_locked
+    def add_learnings(self, learnings: Iterable[Learning], analyzed: Iterable[str] = ()):
+        """
+        Store learnings, replacing older copies of the same ones.
+
+        Args:
+            learnings: Extracted learnings
+            analyzed: URLs of every source the learnings were extracted
+                from, including those that produced none
+        """
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "UPDATE sources SET analyzed_at = ? WHERE url = ?",
+                [(now, url) for url in analyzed],
+            )
+            for learning in learnings:
+                self._db.execute("DELETE FROM learnings WHERE content = ?", (learning.content,))
+                cursor = self._db.execute(
+                    "INSERT INTO learnings (content, confidence, sources, created_at) VALUES (?, ?, ?, ?)",
+                    (learning.content, learning.confidence, json.dumps(learning.sources), now),
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO learning_sources (learning_id, url) VALUES (?, ?)",
+                    [(cursor.lastrowid, url) for url in learning.sources],
+                )
+
+    @staticmethod
+    def _learning(row: sqlite3.Row) -> Learning:
+        return Learning(
+            content=row["content"],
+            sources=json.loads(row["sources"]),
+            confidence=row["confidence"],
+        )
+
+    @_locked
+    def learnings_for(
+        self,
+        urls: list[str],
+        max_age: float | None = None,
+    ) -> dict[str, list[Learning]]:
+        """
+        Learnings of the sources among ``urls`` analyzed within the max age.
+
+        Returns:
+            Mapping of analyzed URL to the fresh learnings citing it
+            (possibly none); sources never analyzed are left out
+        """
+        if not urls:
+            return {}
+        since = self._fresh_since(max_age)
+        placeholders = ",".join("?" * len(urls))
+        learnings: dict[str, list[Learning]] = {
+            row["url"]: []
+            for row in self._db.execute(
+                f"SELECT url FROM sources WHERE analyzed_at >= ? AND url IN ({placeholders})",
+                [since, *urls],
+            )
+        }
+        rows = self._db.execute(
+            "SELECT ls.url, l.content, l.confidence, l.sources FROM learning_sources ls "
+            "JOIN learnings l ON l.id = ls.learning_id "
+            f"WHERE l.created_at >= ? AND ls.url IN ({placeholders}) "
+            "ORDER BY l.id",
+            [since, *urls],
+        ).fetchall()
+        for row in rows:
+            if row["url"] in learnings:
+                learnings[row["url"]].append(self._learning(row))
+        return learnings
+
+    @_locked
+    def find_learnings(
+        self,
+        text: str,
+        limit: int = 10,
+        max_age: float | None = None,
+    ) -> list[Learning]:
+        """Fresh learnings sharing words with a text, most relevant first."""
+        expression = _match_expression(text, "OR")
+        if expression is None:
+            return []
+        rows = self._db.execute(
+            "SELECT l.content, l.confidence, l.sources FROM learnings_fts "
+            "JOIN learnings l ON l.id = learnings_fts.rowid "
+            "WHERE learnings_fts MATCH ? AND l.created_at >= ? "
+            "ORDER BY bm25(learnings_fts) LIMIT ?",
+            (expression, self._fresh_since(max_age), limit),
+        ).fetchall()
+        return [self._learning(row) for row in rows]
@@ -2,17 +2,82 @@
 """
 LLM provider management supporting multiple providers.
 Prioritizes Google Gemini by default, with support for Groq, Fireworks, and OpenAI.
+
+Setting LLM_PROVIDERS to a comma-separated list (e.g. "gemini,groq,openai")
+routes each call to the fastest healthy provider of the list, failing over
+on rate limits and server errors (see tools/routing.py).
+
+Routing configuration (environment):
+    LLM_PROVIDERS: Providers to route across
+    LLM_ROUTE_DEADLINE: Seconds allowed for a call including failovers
+        (default: the per-attempt timeout times the number of providers
+        when a timeout is set, otherwise 120 except for the report stages,
+        which are not cut off)
+    LLM_HEDGE_AFTER: Hedge short structured calls after this many seconds (default: off)
 """
 
+import asyncio
+import functools
 import os
-from typing import Any, Literal, Optional
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Iterator, Literal, Optional
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_openai import ChatOpenAI
 from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+
+from ..state import ModelProfile
+
+from ..observability import start_span, record_cache
+from ..utils.json_stream import JSONArrayStreamParser
+from ..observability.metrics import LLM_LATENCY, LLM_REQUESTS, LLM_TOKENS
+from .breaker import CircuitBreaker, get_breaker
+from .routing import get_router, is_retryable
+from .ratelimit import DEFAULT_SESSION, get_rate_limiter
 
 # Define supported providers type for clarity
 ProviderType = Literal["gemini", "groq", "fireworks", "openai"]
 
+SUPPORTED_PROVIDERS = ("gemini", "groq", "fireworks", "openai")
+
+# Stages whose output is a short JSON list, cheap enough to send twice
+HEDGED_STAGES = frozenset({"follow_up_questions", "generate_queries", "generate_directions"})
+
+# Stages writing long output, which the default routing deadline does not cut off
+REPORT_STAGES = frozenset({"report_outline", "generate_report"})
+
+# The official OpenAI API, the only OpenAI endpoint sent prompt cache keys
+OPENAI_BASE_URL = "https://api.openai.com/v1"
+
+# Completion tokens assumed for rate limiting when max_tokens is not set
+DEFAULT_COMPLETION_ESTIMATE = 1000
+
+
+def _providers_from_env() -> list[ProviderType]:
+    names = [name.strip().lower() for name in os.getenv("LLM_PROVIDERS", "").split(",")]
+    return [name for name in names if name in SUPPORTED_PROVIDERS]
+
+
+def _float_from_env(name: str, default: float | None) -> float | None:
+    value = os.getenv(name)
+    return float(value) if value else default
+
+async def _wait_for(awaitable, timeout: float | None):
+    """
+    ``asyncio.wait_for`` raising the builtin ``TimeoutError``.
+    
+    Before Python 3.11, ``asyncio.TimeoutError`` is a separate class that
+    callers (and ``is_retryable``) would not recognize as a timeout.
+    """
+    try:
+        return await asyncio.wait_for(awaitable, timeout)
+    except asyncio.TimeoutError as e:
+        if isinstance(e, TimeoutError):
+            raise
+        raise TimeoutError(f"No response within {timeout:.1f}s") from e
+
+
 class LLMProvider:
     """
     Manages LLM providers with the following priority (unless strictly overridden):
@@ -29,12 +94,65 @@ class LLMProvider:
         base_url: Optional[str] = None,
         model: Optional[str] = None,
         temperature: float = 0.7,
+        providers: Optional[list[ProviderType]] = None,
+        deadline: Optional[float] = None,
+        hedge_after: Optional[float] = None,
+        max_tokens: Optional[int] = None,
+        timeout: Optional[float] = None,
+        cached_content: Optional[str] = None,
     ):
-        self.provider = provider or self._resolve_provider()
+        if providers is None:
+            providers = _providers_from_env()
+        self.provider = provider or (providers[0] if providers else self._resolve_provider())
         self.api_key = api_key or self._get_api_key(self.provider)
         self.base_url = base_url or self._get_base_url(self.provider)
         self.model = model or self._get_default_model(self.provider)
         self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.timeout = timeout
+        self.cached_content = cached_content
+        
+        # Routing across providers; this instance is the first route
+        self.routes: list[LLMProvider] = [self] + [
+            LLMProvider(
+                provider=name,
+                temperature=temperature,
+                providers=[name],
+                max_tokens=max_tokens,
+                timeout=timeout,
+            )
+            for name in dict.fromkeys(providers)
+            if name != self.provider
+        ]
+        self.deadline = deadline or _float_from_env("LLM_ROUTE_DEADLINE", None)
+        self.hedge_after = hedge_after or _float_from_env("LLM_HEDGE_AFTER", None)
+
+    @classmethod
+    def from_profile(cls, profile: Optional[ModelProfile] = None) -> "LLMProvider":
+        """
+        Create a provider for a stage's model profile.
+        
+        A profile naming a provider pins the stage to it (no routing); a
+        profile naming only a model keeps the default provider selection.
+        """
+        if profile is None:
+            return cls()
+        return cls(
+            provider=profile.provider,
+            model=profile.model,
+            providers=[profile.provider] if profile.provider else None,
+            max_tokens=profile.max_tokens,
+            timeout=profile.timeout,
+            cached_content=profile.cached_content,
+        )
+
+    def _route_deadline(self, stage: str) -> float | None:
+        """Seconds allowed for a routed call of a stage, failovers included."""
+        if self.deadline:
+            return self.deadline
+        if self.timeout:
+            return self.timeout * len(self.routes)
+        return None if stage in REPORT_STAGES else 120.0
 
     def _resolve_provider(self) -> ProviderType:
         """
@@ -96,6 +214,11 @@ class LLMProvider:
         
         return "gpt-4o-mini" # OpenAI Default
     
+    @property
+    def breaker(self) -> CircuitBreaker:
+        """Circuit breaker of this provider (shared by its models)."""
+        return get_breaker(f"llm:{self.provider}")
+    
     def get_llm(self, **kwargs) -> BaseChatModel:
         """
         Get a configured LLM instance.
@@ -109,19 +232,269 @@ class LLMProvider:
             "api_key": self.api_key,
         }
         
-        if "max_tokens" in kwargs:
-            params["max_tokens"] = kwargs["max_tokens"]
+        max_tokens = kwargs.get("max_tokens", self.max_tokens)
+        if max_tokens:
+            params["max_tokens"] = max_tokens
 
         # --- Gemini Logic ---
         if self.provider == "gemini":
+            if self.cached_content:
+                params["cached_content"] = self.cached_content
             return ChatGoogleGenerativeAI(**params)
         
         # --- OpenAI Compatible Logic (Groq, Fireworks, OpenAI) ---
         if self.base_url:
             params["base_url"] = self.base_url
+        
+        # Report token usage on streamed responses too
+        params["stream_usage"] = True
             
         return ChatOpenAI(**params)
     
+    def _cache_hints(self, stage: str) -> dict[str, Any]:
+        """
+        Provider-specific hints that keep calls sharing a prompt prefix on
+        the same cache.
+        
+        Prompts start with stage-specific instructions followed by the run's
+        learnings, so calls of one stage within one run share the longest
+        prefix. Gemini caches implicitly (or explicitly via
+        ``cached_content``) and needs no per-call hint.
+        """
+        key = f"deep-research:{stage}:{_run_session()[0]}"
+        # OpenAI-compatible servers behind OPENAI_ENDPOINT may reject the field
+        if self.provider == "openai" and (self.base_url or OPENAI_BASE_URL).rstrip("/") == OPENAI_BASE_URL:
+            return {"prompt_cache_key": key}
+        if self.provider == "fireworks":
+            return {"extra_headers": {"x-session-affinity": key}}
+        return {}
+    
+    def _estimate_tokens(self, messages: list[BaseMessage], **kwargs) -> int:
+        """Prompt tokens plus the completion budget of a call."""
+        prompt = "\n".join(str(m.content) for m in messages)
+        completion = kwargs.get("max_tokens", self.max_tokens) or DEFAULT_COMPLETION_ESTIMATE
+        return count_tokens(prompt, self.model) + completion
+    
+    @asynccontextmanager
+    async def _rate_limited(
+        self,
+        messages: list[BaseMessage],
+        **kwargs,
+    ) -> AsyncIterator[dict]:
+        """
+        Wait for the provider's rate limiter, fairly across research runs.
+        
+        The caller stores the response's usage metadata under ``"usage"``
+        in the yielded dict so the token budget can be corrected.
+        """
+        limiter = get_rate_limiter(self.provider, self.model)
+        call: dict[str, Any] = {}
+        if limiter.unlimited:
+            yield call
+            return
+        
+        session, weight = _run_session()
+        estimate = self._estimate_tokens(messages, **kwargs)
+        async with limiter.acquire(estimate, session, weight):
+            yield call
+        usage = call.get("usage") or {}
+        limiter.settle(estimate, usage.get("total_tokens", 0))
+    
+    @contextmanager
+    def _observe_call(
+        self,
+        stage: str,
+        messages: list[BaseMessage],
+    ) -> Iterator[tuple[Any, dict]]:
+        """
+        Trace an LLM call and record its latency, outcome and token usage.
+        
+        The caller stores the response's usage metadata under ``"usage"``
+        in the yielded dict.
+        """
+        attributes = {
+            "llm.stage": stage,
+            "llm.provider": self.provider,
+            "llm.model": self.model,
+            "llm.prompt_chars": sum(len(str(m.content)) for m in messages),
+        }
+        call: dict[str, Any] = {}
+        with start_span("llm.invoke", attributes) as span:
+            t0 = time.perf_counter()
+            try:
+                yield span, call
+            except asyncio.CancelledError:
+                LLM_REQUESTS.inc(stage=stage, provider=self.provider, outcome="cancelled")
+                raise
+            except Exception:
+                LLM_REQUESTS.inc(stage=stage, provider=self.provider, outcome="error")
+                raise
+            finally:
+                LLM_LATENCY.observe(time.perf_counter() - t0, stage=stage, provider=self.provider)
+            LLM_REQUESTS.inc(stage=stage, provider=self.provider, outcome="ok")
+            
+            usage = call.get("usage") or {}
+            input_tokens = usage.get("input_tokens", 0)
+            output_tokens = usage.get("output_tokens", 0)
+            cached_tokens = (usage.get("input_token_details") or {}).get("cache_read") or 0
+            LLM_TOKENS.inc(input_tokens, stage=stage, kind="input")
+            LLM_TOKENS.inc(output_tokens, stage=stage, kind="output")
+            LLM_TOKENS.inc(cached_tokens, stage=stage, kind="cached")
+            if input_tokens:
+                record_cache("llm_prompt", cached_tokens > 0)
+            span.set_attributes({
+                "llm.input_tokens": input_tokens,
+                "llm.output_tokens": output_tokens,
+                "llm.cached_tokens": cached_tokens,
+            })
+    
+    async def ainvoke(
+        self,
+        messages: list[BaseMessage],
+        stage: str = "",
+        **kwargs,
+    ) -> BaseMessage:
+        """
+        Invoke a configured LLM, tracing the call and recording metrics.
+        
+        With several providers configured, the call is routed to the fastest
+        healthy one and fails over on rate limits and server errors. Short
+        structured stages are hedged when ``hedge_after`` is set.
+        
+        Within a research run, the call is cut off (``TimeoutError``) when
+        the stage runs out of the run's time.
+        While a provider's circuit breaker is open, calls to it fail fast
+        (``CircuitOpenError``) and routed calls fail over at once.
+        
+        Args:
+            messages: Chat messages to send
+            stage: Pipeline stage making the call (e.g. "generate_queries")
+            **kwargs: Parameters passed to get_llm (temperature, max_tokens)
+            
+        Returns:
+            The model response
+        """
+        async with _time_limit(stage):
+            if len(self.routes) == 1:
+                return await self._ainvoke(messages, stage, **kwargs)
+            return await get_router().call(
+                self.routes,
+                lambda route: route._ainvoke(messages, stage, **kwargs),
+                deadline=self._route_deadline(stage),
+                hedge_after=self.hedge_after if stage in HEDGED_STAGES else None,
+            )
+    
+    async def _ainvoke(
+        self,
+        messages: list[BaseMessage],
+        stage: str = "",
+        **kwargs,
+    ) -> BaseMessage:
+        """Invoke this provider directly, without routing."""
+        llm = self.get_llm(**kwargs)
+        with self.breaker.call(is_retryable):
+            async with self._rate_limited(messages, **kwargs) as limited:
+                with self._observe_call(stage, messages) as (span, call):
+                    response = await _wait_for(llm.ainvoke(messages, **self._cache_hints(stage)), self.timeout)
+                    call["usage"] = limited["usage"] = getattr(response, "usage_metadata", None)
+        return response
+    
+    async def astream_json(
+        self,
+        messages: list[BaseMessage],
+        key: str | None = None,
+        limit: int | None = None,
+        on_item: Callable[[Any], None] | None = None,
+        stage: str = "",
+        keep: Callable[[Any], bool] | None = None,
+        **kwargs,
+    ) -> list[Any]:
+        """
+        Stream a JSON response and parse its array elements as they complete.
+        
+        Generation is stopped as soon as ``limit`` elements have been
+        parsed, and a truncated or slightly malformed response still yields
+        its complete elements.
+        
+        Args:
+            messages: Chat messages to send
+            key: Name of the array when the response is an object
+                (a bare top-level array is also accepted)
+            limit: Stop after this many elements
+            on_item: Called with each element as soon as it is parsed
+            stage: Pipeline stage making the call
+            keep: Elements for which this returns False are dropped and do
+                not count toward ``limit``
+            **kwargs: Parameters passed to get_llm
+            
+        Returns:
+            The parsed elements, at most ``limit``
+        """
+        async with _time_limit(stage):
+            if len(self.routes) == 1:
+                return await self._astream_json(messages, key, limit, on_item, stage, keep, **kwargs)
+            # Not hedged: ``on_item`` would see the items of both attempts
+            return await get_router().call(
+                self.routes,
+                lambda route: route._astream_json(messages, key, limit, on_item, stage, keep, **kwargs),
+                deadline=self._route_deadline(stage),
+            )
+    
+    async def _astream_json(
+        self,
+        messages: list[BaseMessage],
+        key: str | None = None,
+        limit: int | None = None,
+        on_item: Callable[[Any], None] | None = None,
+        stage: str = "",
+        keep: Callable[[Any], bool] | None = None,
+        **kwargs,
+    ) -> list[Any]:
+        """Stream from this provider directly, without routing."""
+        llm = self.get_llm(**kwargs)
+        parser = JSONArrayStreamParser(key=key)
+        items: list[Any] = []
+        
+        def accept(new_items: list[Any]) -> bool:
+            for item in new_items:
+                if limit is not None and len(items) >= limit:
+                    return False
+                if keep and not keep(item):
+                    continue
+                items.append(item)
+                if on_item:
+                    on_item(item)
+            return limit is None or len(items) < limit
+        
+        with self.breaker.call(is_retryable):
+            async with self._rate_limited(messages, **kwargs) as limited:
+                with self._observe_call(stage, messages) as (span, call):
+                    stream = llm.astream(messages, **self._cache_hints(stage))
+                    aggregate = None
+                    stopped_early = False
+                    
+                    async def consume():
+                        nonlocal aggregate, stopped_early
+                        async for chunk in stream:
+                            aggregate = chunk if aggregate is None else aggregate + chunk
+                            if not accept(parser.feed(_chunk_text(chunk))):
+                                stopped_early = True
+                                break
+                    
+                    try:
+                        await _wait_for(consume(), self.timeout)
+                    finally:
+                        # Closing the stream stops generation on the provider side
+                        await stream.aclose()
+                    if not stopped_early:
+                        accept(parser.finish())
+                    call["usage"] = limited["usage"] = getattr(aggregate, "usage_metadata", None)
+                    span.set_attributes({
+                        "llm.stream.items": len(items),
+                        "llm.stream.stopped_early": stopped_early,
+                    })
+        return items
+    
     def get_reasoning_llm(self) -> BaseChatModel:
         """Get LLM configured for reasoning tasks (higher temperature)."""
         return self.get_llm(temperature=0.9)
@@ -131,36 +504,72 @@ class LLMProvider:
         return self.get_llm(temperature=0.3)
 
 
+def _run_session() -> tuple[str, float]:
+    """Session id and rate-limit weight of the research run in progress."""
+    # Imported here: the run context module imports the tools package
+    from ..context import get_run_context
+    context = get_run_context()
+    if context is None:
+        return DEFAULT_SESSION, 1.0
+    return context.session_id, context.config.llm_share
+
+
+def _time_limit(stage: str):
+    """Time limit of the research run in progress for a stage, if any."""
+    from ..context import time_limit
+    return time_limit(stage)
+
+
+def _chunk_text(chunk: BaseMessage) -> str:
+    """Text of a streamed message chunk (content may be a list of parts)."""
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in chunk.content
+    )
+
+
 # --- Token Counting Utilities ---
 
-def count_tokens(text: str, model: str = "gpt-4") -> int:
+@functools.lru_cache(maxsize=None)
+def _encoding(model: str):
     """
-    Count tokens in text using tiktoken (OpenAI estimation).
-    Note: For Gemini and Llama, this is an approximation.
+    tiktoken encoding of a model, or None if unavailable.
+    
+    Cached, failures included: loading an encoding the first time reads
+    (or downloads) its BPE file, which must not happen again on every call
+    when it is missing.
     """
     try:
         import tiktoken
-        encoding_model = model if "gpt" in model else "gpt-4"
-        encoding = tiktoken.encoding_for_model(encoding_model)
-        return len(encoding.encode(text))
+        return tiktoken.encoding_for_model(model if "gpt" in model else "gpt-4")
     except Exception:
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4") -> int:
+    """
+    Count tokens in text using tiktoken (OpenAI estimation).
+    Note: For Gemini and Llama, this is an approximation.
+    """
+    encoding = _encoding(model)
+    if encoding is None:
         # Fallback: rough estimate
         return len(text) // 4
+    return len(encoding.encode(text, disallowed_special=()))
 
 
 def truncate_to_tokens(text: str, max_tokens: int, model: str = "gpt-4") -> str:
     """
     Truncate text to a maximum number of tokens.
     """
-    try:
-        import tiktoken
-        encoding_model = model if "gpt" in model else "gpt-4"
-        encoding = tiktoken.encoding_for_model(encoding_model)
-        tokens = encoding.encode(text)
-        if len(tokens) <= max_tokens:
-            return text
-        return encoding.decode(tokens[:max_tokens])
-    except Exception:
+    encoding = _encoding(model)
+    if encoding is None:
         # Fallback: rough character-based truncation
         max_chars = max_tokens * 4
-        return text[:max_chars] if len(text) > max_chars else text 
\ No newline at end of file
+        return text[:max_chars] if len(text) > max_chars else text
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
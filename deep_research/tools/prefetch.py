@@ -0,0 +1,103 @@
+"""
+Speculative search prefetching.
+
+Searches for likely next-depth queries are started while the graph is still
+busy with LLM calls (direction planning, query generation). When
+search_node runs, generated queries that closely match a prefetched query
+reuse its results instead of searching again; prefetches nobody claimed are
+cancelled.
+"""
+
+import asyncio
+from datetime import date
+from typing import Any
+
+from .firecrawl import get_firecrawl_client
+from .queries import query_words
+
+
+def query_overlap(a: str, b: str) -> float:
+    """
+    Overlap coefficient of the content words of two queries.
+    
+    Returns 1.0 when the words of the shorter query all appear in the other.
+    """
+    words_a = set(query_words(a))
+    words_b = set(query_words(b))
+    if not words_a or not words_b:
+        return 0.0
+    return len(words_a & words_b) / min(len(words_a), len(words_b))
+
+
+class SearchPrefetcher:
+    """
+    Tracks speculative Firecrawl searches for one research run.
+    
+    Args:
+        num_results: Results requested per prefetched search
+        concurrency_limit: Maximum prefetches in flight
+        min_overlap: Minimum query_overlap for a generated query to claim
+            a prefetched one
+        since: Only search for pages published on or after this date
+    """
+    
+    def __init__(
+        self,
+        num_results: int = 5,
+        concurrency_limit: int = 3,
+        min_overlap: float = 0.5,
+        since: date | None = None,
+    ):
+        self.num_results = num_results
+        self.min_overlap = min_overlap
+        self.since = since
+        self._semaphore = asyncio.Semaphore(concurrency_limit)
+        self._pending: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.cancelled = 0
+    
+    async def _search(self, query: str) -> list[dict[str, Any]]:
+        async with self._semaphore:
+            return await get_firecrawl_client().search(query, self.num_results, since=self.since)
+    
+    def prefetch(self, queries: list[str]):
+        """Start searches for queries that are not already in flight."""
+        for query in queries:
+            if query and query not in self._pending:
+                self._pending[query] = asyncio.create_task(self._search(query))
+    
+    def claim(self, queries: list[str]) -> dict[str, tuple[str, asyncio.Task]]:
+        """
+        Match generated queries to prefetched searches.
+        
+        Each prefetch is claimed by at most one query, preferring the
+        closest matches. Claimed prefetches stop being pending.
+        
+        Returns:
+            Mapping of generated query to the prefetched query it claimed
+            and the task holding that search's results
+        """
+        candidates = sorted(
+            (
+                (query_overlap(query, prefetched), query, prefetched)
+                for query in queries
+                for prefetched in self._pending
+            ),
+            reverse=True,
+        )
+        claimed: dict[str, tuple[str, asyncio.Task]] = {}
+        for score, query, prefetched in candidates:
+            if score < self.min_overlap:
+                break
+            if query in claimed or prefetched not in self._pending:
+                continue
+            claimed[query] = (prefetched, self._pending.pop(prefetched))
+        self.hits += len(claimed)
+        return claimed
+    
+    def cancel_all(self):
+        """Cancel every prefetch that was not claimed."""
+        for task in self._pending.values():
+            if task.cancel():
+                self.cancelled += 1
+        self._pending.clear()
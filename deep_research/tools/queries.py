@@ -0,0 +1,109 @@
+"""
+Search query normalization and near-duplicate detection.
+
+Queries generated at a later depth often differ from earlier ones only in
+case, word order, filler words or a plural, yet each one costs a search and
+extraction tokens. Queries are normalized (lowercased, stopwords dropped,
+words sorted) and compared by the Jaccard similarity of the character
+trigrams of the normalized form, which also absorbs small inflections.
+
+The run's ``QueryRegistry`` remembers every query searched, with its
+results, so a redundant query can be replaced before it is searched or
+answered from the earlier results.
+"""
+
+import re
+from typing import Any
+
+
+WORD_PATTERN = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = frozenset({
+    "a", "about", "an", "and", "are", "as", "at", "be", "between", "by",
+    "can", "do", "does", "for", "from", "how", "in", "into", "is", "it",
+    "its", "of", "on", "or", "the", "their", "this", "to", "vs", "versus",
+    "what", "when", "where", "which", "who", "why", "with",
+})
+
+
+def query_words(query: str) -> list[str]:
+    """Words of a query without stopwords (all words if that leaves none)."""
+    words = WORD_PATTERN.findall(query.lower())
+    return [word for word in words if word not in STOPWORDS] or words
+
+
+def normalize_query(query: str) -> str:
+    """Canonical form of a query: distinct content words, sorted."""
+    return " ".join(sorted(set(query_words(query))))
+
+
+def query_shingles(query: str, size: int = 3) -> frozenset[str]:
+    """Character shingles of the normalized query."""
+    normalized = f" {normalize_query(query)} "
+    if len(normalized) <= size:
+        return frozenset({normalized}) if normalized.strip() else frozenset()
+    return frozenset(normalized[i:i + size] for i in range(len(normalized) - size + 1))
+
+
+def query_similarity(a: str, b: str) -> float:
+    """Jaccard similarity of the shingles of two queries."""
+    shingles_a, shingles_b = query_shingles(a), query_shingles(b)
+    if not shingles_a or not shingles_b:
+        return 0.0
+    return len(shingles_a & shingles_b) / len(shingles_a | shingles_b)
+
+
+class QueryRegistry:
+    """
+    Queries searched so far in a run, with their results.
+
+    Args:
+        threshold: Similarity from which a query is a near-duplicate of an
+            earlier one
+    """
+
+    def __init__(self, threshold: float = 0.7):
+        self.threshold = threshold
+        self._shingles: dict[str, frozenset[str]] = {}
+        self._results: dict[str, list[dict[str, Any]]] = {}
+
+    def __len__(self) -> int:
+        return len(self._shingles)
+
+    @property
+    def queries(self) -> list[str]:
+        """Registered queries, oldest first."""
+        return list(self._shingles)
+
+    def match(self, query: str, among: list[str] | None = None) -> str | None:
+        """
+        Find the registered query (or one of ``among``) that a query repeats.
+
+        Returns:
+            The most similar query at or above the threshold, or None
+        """
+        shingles = query_shingles(query)
+        if not shingles:
+            return None
+        candidates = list(self._shingles.items())
+        candidates += [(other, query_shingles(other)) for other in among or ()]
+        best, best_score = None, self.threshold
+        for other, other_shingles in candidates:
+            if not other_shingles:
+                continue
+            score = len(shingles & other_shingles) / len(shingles | other_shingles)
+            if score >= best_score:
+                best, best_score = other, score
+        return best
+
+    def add(self, query: str, results: list[dict[str, Any]] | None = None):
+        """Register a searched query and, once known, its results."""
+        self._shingles.setdefault(query, query_shingles(query))
+        if results is not None:
+            # Copies: search_node cleans result content in place
+            self._results[query] = [dict(result) for result in results]
+
+    def results(self, query: str) -> list[dict[str, Any]] | None:
+        """Copies of the results of a registered query, if it has them."""
+        results = self._results.get(query)
+        return None if results is None else [dict(result) for result in results]
@@ -0,0 +1,253 @@
+"""
+Process-wide LLM rate limiting with fair queueing across sessions.
+
+Every LLM call takes a slot from the limiter of its provider+model before it
+is sent. A limiter combines three budgets:
+
+- requests per minute (token bucket)
+- estimated tokens per minute (token bucket; prompt tokens from
+  ``count_tokens`` plus the completion budget, corrected with the actual
+  usage once the call returns)
+- calls in flight
+
+Calls that do not fit wait in per-session queues served by weighted fair
+queueing: each session advances a virtual clock by ``cost / weight`` when it
+is served, and the session with the earliest next finish time goes first.
+A run with hundreds of queued calls therefore cannot starve a small run that
+arrives later; it only gets its weighted share.
+
+Configuration (environment):
+    LLM_RPM: Requests per minute for every provider+model
+    LLM_TPM: Estimated tokens per minute for every provider+model
+    LLM_MAX_CONCURRENCY: Calls in flight for every provider+model
+    LLM_RATE_LIMITS: JSON overrides per "provider:model", e.g.
+        {"openai:gpt-4o-mini": {"rpm": 500, "tpm": 200000, "max_concurrency": 32}}
+
+Unset budgets are unlimited, so without configuration calls are never held.
+"""
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from ..observability.metrics import LLM_QUEUE_DEPTH, LLM_QUEUE_WAIT
+
+
+DEFAULT_SESSION = "default"
+
+
+class _TokenBucket:
+    """Continuously refilling bucket; ``rate`` units per second."""
+
+    __slots__ = ("capacity", "rate", "level", "updated")
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until ``amount`` is available (0 if it is now)."""
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+    def take(self, amount: float):
+        self.level -= min(amount, self.capacity)
+
+    def give(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+
+class _Session:
+    """Queue and virtual clock of one session."""
+
+    __slots__ = ("waiters", "weight", "finish")
+
+    def __init__(self):
+        self.waiters: deque[tuple[asyncio.Future, int]] = deque()
+        self.weight = 1.0
+        self.finish = 0.0
+
+
+class RateLimiter:
+    """
+    Rate limiter for one provider+model.
+
+    Args:
+        name: Label used in metrics (normally "provider:model")
+        rpm: Requests per minute, or None for unlimited
+        tpm: Estimated tokens per minute, or None for unlimited
+        max_concurrency: Calls in flight, or None for unlimited
+    """
+
+    def __init__(
+        self,
+        name: str,
+        rpm: float | None = None,
+        tpm: float | None = None,
+        max_concurrency: int | None = None,
+    ):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self._requests = _TokenBucket(rpm) if rpm else None
+        self._tokens = _TokenBucket(tpm) if tpm else None
+        self._in_flight = 0
+        self._sessions: dict[str, _Session] = {}
+        self._virtual_time = 0.0
+        self._timer: asyncio.TimerHandle | None = None
+        self._timer_loop: asyncio.AbstractEventLoop | None = None
+
+    @property
+    def unlimited(self) -> bool:
+        return self._requests is None and self._tokens is None and self.max_concurrency is None
+
+    @property
+    def queued(self) -> int:
+        return sum(len(session.waiters) for session in self._sessions.values())
+
+    def _timer_armed(self) -> bool:
+        """
+        Whether a dispatch is scheduled on the running loop.
+
+        Limiters outlive event loops (each ``asyncio.run`` has its own); a
+        timer left by a loop that has ended never fires, so it is dropped.
+        """
+        if self._timer is not None and self._timer_loop is not asyncio.get_running_loop():
+            self._timer = None
+        return self._timer is not None
+
+    def _next_session(self) -> _Session | None:
+        """Session whose head waiter has the earliest virtual finish time."""
+        best = None
+        best_finish = 0.0
+        for key, session in list(self._sessions.items()):
+            while session.waiters and session.waiters[0][0].done():
+                session.waiters.popleft()  # Cancelled while queued
+            if not session.waiters:
+                # An idle session keeps its clock only while it is ahead
+                if session.finish <= self._virtual_time:
+                    del self._sessions[key]
+                continue
+            _, cost = session.waiters[0]
+            finish = max(session.finish, self._virtual_time) + cost / session.weight
+            if best is None or finish < best_finish:
+                best, best_finish = session, finish
+        return best
+
+    def _dispatch(self):
+        """Grant slots to queued calls while the budgets allow."""
+        self._timer = None
+        while True:
+            session = self._next_session()
+            if session is None:
+                break
+            if self.max_concurrency is not None and self._in_flight >= self.max_concurrency:
+                break  # Resumed by release()
+
+            future, cost = session.waiters[0]
+            now = time.monotonic()
+            wait = 0.0
+            for bucket, amount in ((self._requests, 1), (self._tokens, cost)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    wait = max(wait, bucket.wait_time(amount))
+            if wait > 0:
+                self._timer_loop = asyncio.get_running_loop()
+                self._timer = self._timer_loop.call_later(wait, self._dispatch)
+                break
+
+            session.waiters.popleft()
+            start = max(session.finish, self._virtual_time)
+            session.finish = start + cost / session.weight
+            self._virtual_time = start
+            if self._requests is not None:
+                self._requests.take(1)
+            if self._tokens is not None:
+                self._tokens.take(cost)
+            self._in_flight += 1
+            future.set_result(None)
+        LLM_QUEUE_DEPTH.set(self.queued, limiter=self.name)
+
+    def _release(self):
+        self._in_flight -= 1
+        if not self._timer_armed():
+            self._dispatch()
+
+    def settle(self, estimated: int, actual: int):
+        """Correct the token budget once a call's real usage is known."""
+        if self._tokens is not None and actual:
+            self._tokens.refill(time.monotonic())
+            self._tokens.give(estimated - actual)
+
+    @asynccontextmanager
+    async def acquire(
+        self,
+        tokens: int = 0,
+        session: str = DEFAULT_SESSION,
+        weight: float = 1.0,
+    ) -> AsyncIterator[None]:
+        """
+        Hold a slot for one call.
+
+        Args:
+            tokens: Estimated tokens of the call (prompt plus completion)
+            session: Fair-queueing key, normally the research run
+            weight: Share of the session relative to others (default 1)
+        """
+        if self.unlimited:
+            yield
+            return
+
+        state = self._sessions.get(session)
+        if state is None:
+            state = self._sessions[session] = _Session()
+        state.weight = max(weight, 1e-3)
+
+        future = asyncio.get_running_loop().create_future()
+        t0 = time.perf_counter()
+        state.waiters.append((future, max(1, tokens)))
+        if not self._timer_armed():
+            self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release()  # Granted just as the caller was cancelled
+            raise
+        finally:
+            LLM_QUEUE_WAIT.observe(time.perf_counter() - t0, limiter=self.name)
+        try:
+            yield
+        finally:
+            self._release()
+
+
+def _limits_from_env() -> tuple[dict, dict[str, dict]]:
+    defaults = {
+        "rpm": float(os.getenv("LLM_RPM")) if os.getenv("LLM_RPM") else None,
+        "tpm": float(os.getenv("LLM_TPM")) if os.getenv("LLM_TPM") else None,
+        "max_concurrency": int(os.getenv("LLM_MAX_CONCURRENCY")) if os.getenv("LLM_MAX_CONCURRENCY") else None,
+    }
+    overrides = json.loads(os.getenv("LLM_RATE_LIMITS") or "{}")
+    return defaults, overrides
+
+
+_limiters: dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(provider: str, model: str) -> RateLimiter:
+    """Get the process-wide limiter of a provider+model."""
+    key = f"{provider}:{model}"
+    limiter = _limiters.get(key)
+    if limiter is None:
+        defaults, overrides = _limits_from_env()
+        limiter = _limiters.setdefault(key, RateLimiter(key, **{**defaults, **overrides.get(key, {})}))
+    return limiter
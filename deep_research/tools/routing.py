@@ -0,0 +1,284 @@
+"""
+Latency-aware routing and failover across LLM providers.
+
+When several providers are configured, each call goes to the provider with
+the lowest expected latency among those that are healthy. The router keeps a
+rolling (exponentially weighted) latency and error rate per provider+model:
+
+- A 429, 5xx, timeout or connection error puts the provider in a cooldown
+  that grows with consecutive failures (or follows Retry-After), and the
+  call fails over to the next provider while its deadline allows.
+- Other errors (bad request, authentication) are raised immediately; they
+  would fail the same way everywhere.
+- Optionally a call is hedged: if the first provider has not answered after
+  ``hedge_after`` seconds, the same request is sent to the next provider and
+  whichever answers first wins. The loser is cancelled.
+
+Statistics are process-wide, so every session benefits from what the
+others have observed.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, TypeVar
+
+from ..observability.metrics import REGISTRY
+
+
+LLM_ROUTE_EVENTS = REGISTRY.counter(
+    "llm_route_events_total",
+    "LLM routing events by provider (failover, hedge, hedge_win, cooldown).",
+    ("provider", "event"),
+)
+LLM_PROVIDER_LATENCY = REGISTRY.gauge(
+    "llm_provider_latency_ewma_seconds",
+    "Rolling LLM call latency per provider, as used for routing.",
+    ("provider",),
+)
+
+RETRYABLE_STATUS = {408, 409, 429}
+
+Route = TypeVar("Route")
+Result = TypeVar("Result")
+
+
+def error_status(error: BaseException) -> int | None:
+    """HTTP status code carried by a provider SDK error, if any."""
+    for candidate in (error, getattr(error, "response", None)):
+        for attribute in ("status_code", "code", "status"):
+            value = getattr(candidate, attribute, None)
+            if isinstance(value, int) and 100 <= value < 600:
+                return value
+    return None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Whether another provider might succeed where this one failed."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    # SDK errors without a status: APIConnectionError, APITimeoutError, ...
+    name = type(error).__name__
+    return "Timeout" in name or "Connection" in name
+
+
+def retry_after(error: BaseException) -> float | None:
+    """Retry-After of a rate-limited response, in seconds."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ProviderStats:
+    """
+    Rolling health of one provider+model.
+
+    Args:
+        alpha: Weight of the newest sample in the moving averages
+    """
+
+    __slots__ = ("alpha", "latency", "error_rate", "failures", "cooldown_until")
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self.latency: float | None = None
+        self.error_rate = 0.0
+        self.failures = 0
+        self.cooldown_until = 0.0
+
+    def observe_latency(self, seconds: float):
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += self.alpha * (seconds - self.latency)
+
+    def record_success(self, seconds: float):
+        self.observe_latency(seconds)
+        self.error_rate *= 1 - self.alpha
+        self.failures = 0
+
+    def record_failure(self, cooldown: float):
+        self.error_rate += self.alpha * (1 - self.error_rate)
+        self.failures += 1
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + cooldown)
+
+    @property
+    def healthy(self) -> bool:
+        return time.monotonic() >= self.cooldown_until
+
+    def score(self) -> float:
+        """Expected latency inflated by the error rate (lower is better)."""
+        # Unmeasured providers score 0 so each one gets tried
+        latency = self.latency or 0.0
+        return latency / max(0.05, 1 - self.error_rate)
+
+
+class LLMRouter:
+    """
+    Chooses among provider routes and fails over between them.
+
+    Routes are any objects with ``provider`` and ``model`` attributes.
+
+    Args:
+        base_cooldown: Cooldown after a first retryable failure, in seconds
+        max_cooldown: Upper bound of the doubling cooldown
+        alpha: Weight of the newest sample in the moving averages
+    """
+
+    def __init__(
+        self,
+        base_cooldown: float = 1.0,
+        max_cooldown: float = 60.0,
+        alpha: float = 0.2,
+    ):
+        self.base_cooldown = base_cooldown
+        self.max_cooldown = max_cooldown
+        self.alpha = alpha
+        self._stats: dict[str, ProviderStats] = {}
+
+    @staticmethod
+    def route_key(route: Any) -> str:
+        return f"{route.provider}:{route.model}"
+
+    def stats(self, route: Any) -> ProviderStats:
+        key = self.route_key(route)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats.setdefault(key, ProviderStats(self.alpha))
+        return stats
+
+    def rank(self, routes: list[Route]) -> list[Route]:
+        """
+        Routes in the order they should be tried.
+
+        Healthy routes come first, fastest first; routes in cooldown follow,
+        soonest available first, so a call still goes somewhere when every
+        provider is struggling.
+        """
+        def order(indexed: tuple[int, Route]):
+            index, route = indexed
+            stats = self.stats(route)
+            if stats.healthy:
+                return (0, stats.score(), index)
+            return (1, stats.cooldown_until, index)
+        return [route for _, route in sorted(enumerate(routes), key=order)]
+
+    def _record_failure(self, route: Any, error: BaseException):
+        stats = self.stats(route)
+        cooldown = retry_after(error)
+        if cooldown is None:
+            cooldown = min(self.max_cooldown, self.base_cooldown * 2 ** stats.failures)
+        stats.record_failure(cooldown)
+        LLM_ROUTE_EVENTS.inc(provider=route.provider, event="cooldown")
+
+    async def _attempt(
+        self,
+        route: Route,
+        invoke: Callable[[Route], Awaitable[Result]],
+    ) -> Result:
+        stats = self.stats(route)
+        t0 = time.perf_counter()
+        try:
+            result = await invoke(route)
+        except asyncio.CancelledError:
+            # A hedge loser or a call cut off by its deadline took at least
+            # this long; count it so a slow provider loses its rank
+            stats.observe_latency(time.perf_counter() - t0)
+            raise
+        except Exception as e:
+            if is_retryable(e):
+                self._record_failure(route, e)
+            raise
+        stats.record_success(time.perf_counter() - t0)
+        LLM_PROVIDER_LATENCY.set(stats.latency, provider=route.provider)
+        return result
+
+    async def call(
+        self,
+        routes: list[Route],
+        invoke: Callable[[Route], Awaitable[Result]],
+        deadline: float | None = None,
+        hedge_after: float | None = None,
+    ) -> Result:
+        """
+        Run ``invoke`` on the best route, failing over on retryable errors.
+
+        Args:
+            routes: Candidate routes
+            invoke: Makes the call on one route
+            deadline: Seconds allowed for all attempts together
+            hedge_after: Send a second, concurrent attempt to the next route
+                if the first has not finished after this many seconds
+
+        Raises:
+            TimeoutError: If the deadline passes before any route answers
+            Exception: The error of the last attempt if every route failed,
+                or any non-retryable error
+        """
+        candidates = self.rank(routes)
+        deadline_at = time.monotonic() + deadline if deadline else None
+        pending: dict[asyncio.Task, Route] = {}
+        hedged = False
+        last_error: BaseException | None = None
+
+        def launch():
+            route = candidates.pop(0)
+            pending[asyncio.create_task(self._attempt(route, invoke))] = route
+            return route
+
+        launch()
+        try:
+            while pending:
+                timeout = None if deadline_at is None else deadline_at - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    raise TimeoutError(
+                        f"No LLM provider answered within the {deadline:.1f}s routing deadline"
+                    ) from last_error
+                can_hedge = hedge_after is not None and not hedged and candidates
+                if can_hedge:
+                    timeout = hedge_after if timeout is None else min(timeout, hedge_after)
+
+                done, _ = await asyncio.wait(
+                    pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    if can_hedge:
+                        hedged = True
+                        route = launch()
+                        LLM_ROUTE_EVENTS.inc(provider=route.provider, event="hedge")
+                    continue
+
+                for task in done:
+                    route = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        if hedged:
+                            LLM_ROUTE_EVENTS.inc(provider=route.provider, event="hedge_win")
+                        return task.result()
+                    if not is_retryable(error):
+                        raise error
+                    last_error = error
+                    if candidates and not pending:
+                        route = launch()
+                        LLM_ROUTE_EVENTS.inc(provider=route.provider, event="failover")
+            raise last_error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+_router: LLMRouter | None = None
+
+
+def get_router() -> LLMRouter:
+    """Get the process-wide router."""
+    global _router
+    if _router is None:
+        _router = LLMRouter()
+    return _router
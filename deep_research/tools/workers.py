@@ -0,0 +1,150 @@
+"""
+Worker pool for CPU-bound text work.
+
+Cleaning fetched pages, hashing them for near-duplicate detection and
+formatting and tokenizing the extraction prompt take from milliseconds to
+tens of milliseconds per search. On the event loop, that time stalls every
+other session's calls in flight. ``run_cpu`` runs such work in a pool
+instead:
+
+- process: worker processes (started by a fork server where available).
+  Arguments and results are pickled, so tasks take a whole batch (every
+  page of a search, not one page at a time), callers send only what the
+  work reads, and results come back compact (e.g. MinHash signatures)
+- thread: worker threads. Nothing is copied; the work runs in parallel on
+  free-threaded Python builds, and with the GIL the loop still gets the
+  interpreter back every switch interval
+- none: the work runs inline, as it did before the pool existed
+
+Payloads smaller than ``CPU_OFFLOAD_MIN_BYTES`` always run inline: handing
+them to a worker costs more than the work. The pool is process-wide and
+created on first use.
+
+Configuration (environment):
+    CPU_POOL: "process", "thread", "auto" (threads on free-threaded builds,
+        processes otherwise) or "none" (default: none)
+    CPU_WORKERS: Workers in the pool (default: CPU count, at most 4)
+    CPU_OFFLOAD_MIN_BYTES: Smaller payloads run inline (default: 32768)
+"""
+
+import asyncio
+import multiprocessing
+import os
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, TypeVar
+
+from ..observability.metrics import REGISTRY
+
+
+T = TypeVar("T")
+
+CPU_TASKS = REGISTRY.counter(
+    "cpu_offload_tasks_total",
+    "CPU-bound tasks by where they ran (inline, thread, process).",
+    ("where",),
+)
+
+POOL_KINDS = ("process", "thread", "auto", "none")
+
+
+def _free_threaded() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled is not None and not is_gil_enabled()
+
+
+class CPUPool:
+    """
+    Pool running CPU-bound functions off the event loop.
+
+    Args:
+        kind: "process", "thread", "auto" or "none"
+        workers: Workers in the pool
+        min_bytes: Payload size below which work runs inline
+    """
+
+    def __init__(self, kind: str = "none", workers: int | None = None, min_bytes: int = 32768):
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown CPU pool kind: {kind!r} (expected one of {', '.join(POOL_KINDS)})")
+        if kind == "auto":
+            kind = "thread" if _free_threaded() else "process"
+        self.kind = kind
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.min_bytes = min_bytes
+        self._executor: Executor | None = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=context)
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="cpu")
+        return self._executor
+
+    async def run(self, func: Callable[..., T], *args: Any, size: int = 0) -> T:
+        """
+        Run ``func(*args)`` in the pool, or inline for small payloads.
+
+        In a process pool, ``func`` must be a module-level function (or a
+        partial of one) and its arguments and result picklable.
+
+        Args:
+            func: CPU-bound function
+            *args: Its arguments
+            size: Payload size in bytes, compared with ``min_bytes``
+        """
+        if self.kind == "none" or size < self.min_bytes:
+            CPU_TASKS.inc(where="inline")
+            return func(*args)
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(self._get_executor(), func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a new pool next time
+            self._executor = None
+            CPU_TASKS.inc(where="inline")
+            return func(*args)
+        CPU_TASKS.inc(where=self.kind)
+        return result
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+def _pool_from_env() -> CPUPool:
+    workers = os.getenv("CPU_WORKERS")
+    return CPUPool(
+        kind=os.getenv("CPU_POOL", "none"),
+        workers=int(workers) if workers else None,
+        min_bytes=int(os.getenv("CPU_OFFLOAD_MIN_BYTES", 32768)),
+    )
+
+
+_pool: CPUPool | None = None
+
+
+def get_cpu_pool() -> CPUPool:
+    """Get or create the process-wide CPU pool."""
+    global _pool
+    if _pool is None:
+        _pool = _pool_from_env()
+    return _pool
+
+
+def configure_cpu_pool(kind: str, workers: int | None = None, min_bytes: int = 32768) -> CPUPool:
+    """Replace the process-wide CPU pool, e.g. to compare pool kinds in a benchmark."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+    _pool = CPUPool(kind, workers, min_bytes)
+    return _pool
+
+
+async def run_cpu(func: Callable[..., T], *args: Any, size: int = 0) -> T:
+    """Run a CPU-bound function in the process-wide pool (see ``CPUPool.run``)."""
+    return await get_cpu_pool().run(func, *args, size=size)
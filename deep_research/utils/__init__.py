@@ -5,19 +5,36 @@ from .prompts import (
     GENERATE_QUERIES_PROMPT,
     PROCESS_RESULTS_PROMPT,
     GENERATE_DIRECTIONS_PROMPT,
+    GENERATE_DIRECTIONS_WITH_QUERIES_PROMPT,
     GENERATE_REPORT_PROMPT,
     ANSWER_QUERY_PROMPT,
+    REFRESH_SECTION_PROMPT,
+    REPORT_OUTLINE_PROMPT,
+    REPORT_SECTION_PROMPT,
 )
 from .formatting import (
     format_learnings,
     format_sources,
+    format_appendix,
     format_search_results,
+    result_excerpt,
     create_report_header,
     create_answer_header,
     format_context,
     truncate_content,
     extract_json_from_text,
 )
+from .cleaning import clean_markdown, clean_pages
+from .dedup import MinHashIndex, SourceIndex, content_hash
+from .selection import score_learnings, select_learnings
+from .sections import split_sections, join_sections, assign_to_sections, report_diff
+from .json_stream import (
+    repair_json,
+    parse_json,
+    json_items,
+    JSONArrayStreamParser,
+    JSONArrayByteStreamParser,
+)
 
 __all__ = [
     # Prompts
@@ -25,15 +42,41 @@ __all__ = [
     "GENERATE_QUERIES_PROMPT",
     "PROCESS_RESULTS_PROMPT",
     "GENERATE_DIRECTIONS_PROMPT",
+    "GENERATE_DIRECTIONS_WITH_QUERIES_PROMPT",
     "GENERATE_REPORT_PROMPT",
     "ANSWER_QUERY_PROMPT",
+    "REFRESH_SECTION_PROMPT",
+    "REPORT_OUTLINE_PROMPT",
+    "REPORT_SECTION_PROMPT",
     # Formatting
     "format_learnings",
     "format_sources",
+    "format_appendix",
     "format_search_results",
+    "result_excerpt",
     "create_report_header",
     "create_answer_header",
     "format_context",
     "truncate_content",
     "extract_json_from_text",
+    # Content cleaning
+    "clean_markdown",
+    "clean_pages",
+    "MinHashIndex",
+    "SourceIndex",
+    "content_hash",
+    # Learning selection
+    "score_learnings",
+    "select_learnings",
+    # Report sections
+    "split_sections",
+    "join_sections",
+    "assign_to_sections",
+    "report_diff",
+    # JSON parsing
+    "repair_json",
+    "parse_json",
+    "json_items",
+    "JSONArrayStreamParser",
+    "JSONArrayByteStreamParser",
 ]
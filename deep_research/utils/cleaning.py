@@ -0,0 +1,154 @@
+"""
+Boilerplate removal for scraped markdown.
+
+Firecrawl returns whole pages: navigation menus, cookie banners, link farms,
+image tags and footers around the article. ``clean_markdown`` keeps the
+article text using precompiled regexes and per-line heuristics only (no
+parsing), so it is cheap enough to run on every search result:
+
+- image tags and HTML remnants are removed, links are reduced to their text
+- lines made mostly of links (menus, tag clouds, "related" lists) are dropped
+- short lines matching common boilerplate phrases are dropped
+- repeated blocks are kept once within a page; with ``seen_blocks``, short
+  blocks (site chrome) are also kept once across the pages of one site.
+  Pages of different sites never share blocks: a short paragraph found on
+  two sites is corroboration, not chrome. Long blocks repeated across pages
+  are left for near-duplicate detection, which collapses the whole page
+  instead
+"""
+
+import re
+from urllib.parse import urlsplit
+
+
+IMAGE_PATTERN = re.compile(r"!\[[^\]]*\]\([^)]*\)")
+LINK_PATTERN = re.compile(r"\[([^\]]*)\]\((?:[^()\s]|\([^()]*\))*(?:\s+\"[^\"]*\")?\)")
+AUTOLINK_PATTERN = re.compile(r"<https?://[^>\s]+>")
+HTML_TAG_PATTERN = re.compile(r"</?[a-zA-Z][^>\n]{0,200}>")
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+WORD_PATTERN = re.compile(r"\w+")
+NORMALIZE_PATTERN = re.compile(r"\W+")
+
+BOILERPLATE_PATTERN = re.compile(
+    r"^[\s>#*|_-]*(?:©|(?:"
+    r"accept(?: all)?(?: cookies)?|we use cookies|cookie (?:policy|settings|preferences)"
+    r"|manage (?:consent|preferences)|privacy policy|terms (?:of|and) (?:use|service|conditions)"
+    r"|all rights reserved|\(c\) \d{4}|copyright \d{4}"
+    r"|skip to (?:main )?content|back to top|jump to"
+    r"|sign (?:in|up)|log ?in|register|my account|subscribe|newsletter"
+    r"|share (?:this|on)|follow us|advertisement|sponsored"
+    r"|related (?:articles|posts|stories)|read more|see also|you may also like"
+    r")\b)",
+    re.IGNORECASE,
+)
+# Navigation words that are boilerplate only as a whole line
+NAV_LINE_PATTERN = re.compile(
+    r"^\W*(?:menu|search|home|more|share|print|close|next|previous|top)\W*$",
+    re.IGNORECASE,
+)
+
+# Lines this long are content even if they mention a boilerplate phrase
+MAX_BOILERPLATE_LINE = 100
+# A line is navigation if links make up this share of it ...
+MAX_LINK_DENSITY = 0.5
+# ... and it has fewer words outside of links than this
+MIN_PROSE_WORDS = 6
+# Longest block deduplicated across pages
+MAX_SHARED_BLOCK = 300
+
+
+def _clean_line(line: str) -> str | None:
+    """Cleaned line, or None if it is boilerplate."""
+    stripped = line.strip()
+    if not stripped:
+        return ""
+
+    without_links = LINK_PATTERN.sub("", stripped)
+    if len(without_links) != len(stripped):
+        link_density = 1 - len(without_links.strip()) / len(stripped)
+        prose_words = len(WORD_PATTERN.findall(without_links))
+        if link_density > MAX_LINK_DENSITY and prose_words < MIN_PROSE_WORDS:
+            return None
+        stripped = LINK_PATTERN.sub(r"\1", stripped)
+
+    if len(stripped) <= MAX_BOILERPLATE_LINE and (
+        BOILERPLATE_PATTERN.match(stripped) or NAV_LINE_PATTERN.match(stripped)
+    ):
+        return None
+    if not WORD_PATTERN.search(stripped):
+        # Separators, bullets and leftovers of removed images
+        return None if not stripped.startswith(("---", "***")) else stripped
+    return stripped
+
+
+def clean_markdown(text: str, seen_blocks: set[str] | None = None) -> str:
+    """
+    Strip boilerplate from scraped markdown.
+
+    Args:
+        text: Page markdown
+        seen_blocks: Normalized short blocks already kept; repeated ones
+            are dropped and new ones added. Share one set between pages
+            of one site to drop the chrome repeated across them.
+
+    Returns:
+        The cleaned markdown
+    """
+    if not text:
+        return ""
+    text = IMAGE_PATTERN.sub("", text)
+    text = AUTOLINK_PATTERN.sub("", text)
+    text = HTML_TAG_PATTERN.sub("", text)
+
+    shared = set() if seen_blocks is None else seen_blocks
+    seen = set()
+    blocks = []
+    for block in text.split("\n\n"):
+        lines = [line for line in map(_clean_line, block.split("\n")) if line]
+        if not lines:
+            continue
+        cleaned = "\n".join(lines)
+        key = NORMALIZE_PATTERN.sub(" ", cleaned.lower()).strip()
+        if key in seen or key in shared:
+            continue
+        seen.add(key)
+        if len(key) <= MAX_SHARED_BLOCK:
+            shared.add(key)
+        blocks.append(cleaned)
+
+    return BLANK_LINES_PATTERN.sub("\n\n", "\n\n".join(blocks))
+
+
+def _site(url: str) -> str:
+    """Host of a page's URL without "www.", the scope of shared blocks."""
+    host = urlsplit(url).hostname or ""
+    return host.removeprefix("www.")
+
+
+def clean_pages(
+    pages: list[str],
+    urls: list[str],
+    seen_blocks: dict[str, set[str]],
+) -> tuple[list[str], dict[str, set[str]]]:
+    """
+    Clean pages in order, sharing the seen blocks of each site.
+
+    A single task for a worker pool: in another process ``seen_blocks``
+    is a copy, so the blocks it gained are returned for the caller to add.
+
+    Args:
+        pages: Page markdown
+        urls: URL of each page; pages without one share no blocks
+        seen_blocks: Seen blocks by site (host without "www.")
+
+    Returns:
+        The cleaned pages and the blocks added, by site
+    """
+    known = {site: set(blocks) for site, blocks in seen_blocks.items()}
+    cleaned = []
+    for page, url in zip(pages, urls):
+        site = _site(url)
+        shared = seen_blocks.setdefault(site, set()) if site else None
+        cleaned.append(clean_markdown(page, shared))
+    added = {site: blocks - known.get(site, set()) for site, blocks in seen_blocks.items()}
+    return cleaned, {site: blocks for site, blocks in added.items() if blocks}
@@ -0,0 +1,213 @@
+"""
+Near-duplicate detection for page content with MinHash and LSH.
+
+Different queries often return the same article, or syndicated copies of it
+under other URLs. Each page is reduced to a MinHash signature of its word
+shingles; signatures are split into bands and bucketed (locality-sensitive
+hashing), so a new page is only compared with pages sharing at least one
+band, and a duplicate is confirmed by the estimated Jaccard similarity.
+
+All hashing is vectorized with NumPy: a 20 KB page takes a few
+milliseconds. ``MinHashIndex.hasher`` signs a batch of pages, e.g. in a
+worker pool, for ``match_or_add`` to look up and index.
+
+``SourceIndex`` is the exact counterpart used after extraction: it remembers
+which sources have been analyzed and the learnings each one produced.
+"""
+
+import functools
+import hashlib
+import re
+import zlib
+from typing import Any, Callable, Hashable
+
+import numpy as np
+
+
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def _shingle_hashes(text: str, shingle_size: int) -> np.ndarray | None:
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < shingle_size:
+        return None
+    word_hashes = np.fromiter(
+        (zlib.crc32(word.encode()) for word in words),
+        dtype=np.uint64,
+        count=len(words),
+    )
+    # Polynomial combination of each window of word hashes (wraps mod 2^64)
+    count = len(words) - shingle_size + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset in range(shingle_size):
+        shingles = shingles * np.uint64(1_000_003) + word_hashes[offset:offset + count]
+    return np.unique(shingles)
+
+
+def minhash_signatures(
+    seeds: np.ndarray,
+    multipliers: np.ndarray,
+    shingle_size: int,
+    texts: list[str],
+) -> list[np.ndarray | None]:
+    """MinHash signatures of texts (see ``MinHashIndex.signature``)."""
+    signatures = []
+    for text in texts:
+        shingles = _shingle_hashes(text, shingle_size)
+        if shingles is None:
+            signatures.append(None)
+            continue
+        with np.errstate(over="ignore"):
+            hashed = ((shingles[np.newaxis, :] ^ seeds) * multipliers) >> np.uint64(32)
+        signatures.append(hashed.min(axis=1).astype(np.uint32))
+    return signatures
+
+
+class MinHashIndex:
+    """
+    Index of content signatures for finding near-duplicates.
+
+    Args:
+        threshold: Estimated Jaccard similarity from which two texts are
+            duplicates
+        num_perm: Hash functions per signature
+        bands: LSH bands; ``num_perm / bands`` rows each. More bands find
+            candidates at lower similarity, at the cost of more comparisons
+        shingle_size: Words per shingle
+        seed: Seed of the hash functions
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.8,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 5,
+        seed: int = 1,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._seeds = rng.integers(0, 2**63, size=(num_perm, 1), dtype=np.uint64)
+        # Odd multipliers make the multiply-shift hashes universal
+        self._multipliers = rng.integers(0, 2**63, size=(num_perm, 1), dtype=np.uint64) | np.uint64(1)
+        self._buckets: list[dict[bytes, list[int]]] = [{} for _ in range(bands)]
+        self._signatures: list[np.ndarray] = []
+        self._keys: list[Hashable] = []
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """
+        MinHash signature of a text.
+
+        Returns:
+            ``num_perm`` 32-bit minimum hashes, or None if the text is too
+            short to compare
+        """
+        return self.hasher([text])[0]
+
+    @property
+    def hasher(self) -> Callable[[list[str]], list[np.ndarray | None]]:
+        """
+        Function computing the signatures of a list of texts.
+
+        A partial of a module-level function holding only the hash
+        parameters, so it can be sent to a worker process.
+        """
+        return functools.partial(minhash_signatures, self._seeds, self._multipliers, self.shingle_size)
+
+    def _band_keys(self, signature: np.ndarray) -> list[bytes]:
+        return [band.tobytes() for band in signature.reshape(self.bands, self.rows)]
+
+    def query(self, signature: np.ndarray) -> list[tuple[Hashable, float]]:
+        """Indexed keys similar to a signature, most similar first."""
+        candidates: set[int] = set()
+        for band, key in zip(self._buckets, self._band_keys(signature)):
+            candidates.update(band.get(key, ()))
+        matches = []
+        for index in candidates:
+            similarity = float(np.mean(self._signatures[index] == signature))
+            if similarity >= self.threshold:
+                matches.append((self._keys[index], similarity))
+        matches.sort(key=lambda match: -match[1])
+        return matches
+
+    def add(self, key: Hashable, signature: np.ndarray):
+        """Index a signature under a key."""
+        index = len(self._keys)
+        self._keys.append(key)
+        self._signatures.append(signature)
+        for band, band_key in zip(self._buckets, self._band_keys(signature)):
+            band.setdefault(band_key, []).append(index)
+
+    def find_or_add(self, key: Hashable, text: str) -> Hashable | None:
+        """
+        Look up a text and index it if it is new.
+
+        Returns:
+            Key of the most similar indexed text if this one is a
+            near-duplicate of it, otherwise None (and the text is indexed)
+        """
+        return self.match_or_add(key, self.signature(text))
+
+    def match_or_add(self, key: Hashable, signature: np.ndarray | None) -> Hashable | None:
+        """``find_or_add`` for a signature computed beforehand (None: too short)."""
+        if signature is None:
+            return None
+        matches = self.query(signature)
+        if matches:
+            return matches[0][0]
+        self.add(key, signature)
+        return None
+
+
+def content_hash(text: str) -> str:
+    """Hash of a text that ignores case and whitespace differences."""
+    normalized = " ".join(text.lower().split())
+    return hashlib.blake2b(normalized.encode(), digest_size=16).hexdigest()
+
+
+class SourceIndex:
+    """
+    Sources already analyzed in a run, with the learnings they produced.
+
+    A source is known by its content hash, and by the URLs it was fetched
+    from, so a later fetch of the same page (or a near-duplicate reference
+    to it) maps back to its learnings without another extraction.
+    """
+
+    def __init__(self):
+        self._learnings: dict[str, list[Any]] = {}
+        self._hashes: dict[str, str] = {}
+
+    def __len__(self) -> int:
+        return len(self._learnings)
+
+    def lookup(self, url: str | None = None, content: str | None = None) -> list[Any] | None:
+        """
+        Learnings of a processed source.
+
+        Returns:
+            The learnings (possibly none) if the URL or content has been
+            processed, otherwise None
+        """
+        digest = self._hashes.get(url) if url else None
+        if digest is None and content:
+            digest = content_hash(content)
+        return self._learnings.get(digest) if digest else None
+
+    def add(self, url: str, content: str, learnings: list[Any]):
+        """Record a processed source and the learnings attributed to it."""
+        self.add_hash(url, content_hash(content), learnings)
+
+    def add_hash(self, url: str, digest: str, learnings: list[Any]):
+        """Record a processed source known by its ``content_hash`` only."""
+        self._hashes[url] = digest
+        self._learnings.setdefault(digest, []).extend(learnings)
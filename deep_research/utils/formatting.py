@@ -7,6 +7,10 @@ from datetime import datetime
 from ..state import Learning, Source
 
 
+# Characters of a deep-scraped result's content shown to the LLM
+DEEP_CONTENT_CHARS = 3000
+
+
 def format_learnings(learnings: list[Learning]) -> str:
     """
     Format learnings into a readable text block.
@@ -59,6 +63,41 @@ def format_sources(sources: list[Source]) -> str:
     return "\n".join(bibliography)
 
 
+def format_appendix(
+    learnings: list[Learning],
+    heading: str = "Appendix: Additional Findings",
+    intro: str = "Lower-ranked findings not covered in the report above:",
+) -> str:
+    """
+    Format learnings left out of the report body as an appendix.
+    
+    Args:
+        learnings: List of Learning objects
+        heading: Section heading
+        intro: Sentence introducing the list
+        
+    Returns:
+        Formatted markdown appendix (empty if there are no learnings)
+    """
+    if not learnings:
+        return ""
+    
+    appendix = [
+        f"## {heading}\n",
+        f"{intro}\n",
+    ]
+    for learning in learnings:
+        links = ", ".join(f"[{i}]({url})" for i, url in enumerate(learning.sources[:3], 1))
+        appendix.append(f"- {learning.content}" + (f" ({links})" if links else ""))
+    
+    return "\n".join(appendix)
+
+
+def result_excerpt(result: dict[str, Any]) -> str:
+    """Content of a search result shown to the LLM (deep-scraped results get more room)."""
+    return result.get("content", "")[:DEEP_CONTENT_CHARS if result.get("deep") else 500]
+
+
 def format_search_results(results: dict[str, list[dict[str, Any]]]) -> str:
     """
     Format search results for LLM consumption.
@@ -81,7 +120,7 @@ def format_search_results(results: dict[str, list[dict[str, Any]]]) -> str:
         for i, result in enumerate(query_results, 1):
             title = result.get("title", "Untitled")
             url = result.get("url", "")
-            content = result.get("content", "")[:500]  # Truncate for brevity
+            content = result_excerpt(result)
             
             formatted.append(f"**Result {i}: {title}**")
             formatted.append(f"URL: {url}")
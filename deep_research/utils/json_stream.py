@@ -0,0 +1,562 @@
+"""
+Tolerant and incremental JSON parsing for LLM output.
+
+LLM responses are often almost-JSON: wrapped in code fences or prose, with
+trailing commas, raw newlines inside strings, or cut off by an output token
+limit. ``repair_json`` fixes these so that a slightly broken response still
+yields its complete parts. ``JSONArrayStreamParser`` parses a streamed
+response and returns each element of the target array as soon as it is
+complete, so callers can act on the first items (or stop generation) before
+the model has finished. ``JSONArrayByteStreamParser`` does the same for
+large HTTP response bodies, capping the strings it keeps.
+"""
+
+import json
+import re
+from typing import Any
+
+from .formatting import extract_json_from_text
+
+try:
+    from orjson import loads as _loads
+except ImportError:  # orjson is optional
+    _loads = json.loads
+
+
+CLOSERS = {"{": "}", "[": "]"}
+
+
+def repair_json(text: str) -> str:
+    """
+    Repair common formatting and truncation errors in JSON text.
+
+    - Drops code fences and any prose before the first ``[`` or ``{``
+      and after the matching close
+    - Removes trailing commas
+    - Escapes raw newlines and tabs inside strings
+    - Cuts a truncated document back to its last complete value and closes
+      the open brackets
+
+    Args:
+        text: Text containing (possibly broken) JSON
+
+    Returns:
+        JSON text; may still be invalid if the input had no usable structure
+    """
+    text = extract_json_from_text(text)
+    starts = [i for i in (text.find("["), text.find("{")) if i != -1]
+    if not starts:
+        return text
+    text = text[min(starts):]
+
+    out: list[str] = []
+    stack: list[str] = []
+    # Per open object: True while the next string is a key
+    expect_key: list[bool] = []
+    in_string = False
+    escape = False
+    string_is_key = False
+    safe = (0, ())
+
+    for c in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+                out.append(c)
+                if not string_is_key:
+                    safe = (len(out), tuple(stack))
+                continue
+            elif c == "\n":
+                out.append("\\n")
+                continue
+            elif c == "\t":
+                out.append("\\t")
+                continue
+            out.append(c)
+            continue
+
+        if c == '"':
+            in_string = True
+            string_is_key = bool(stack) and stack[-1] == "{" and expect_key[-1]
+            out.append(c)
+        elif c in "{[":
+            stack.append(c)
+            if c == "{":
+                expect_key.append(True)
+            out.append(c)
+            safe = (len(out), tuple(stack))
+        elif c in "}]":
+            if not stack or CLOSERS[stack[-1]] != c:
+                continue
+            _strip_trailing_comma(out)
+            if stack.pop() == "{":
+                expect_key.pop()
+            out.append(c)
+            safe = (len(out), tuple(stack))
+            if not stack:
+                return "".join(out)
+        elif c == ",":
+            safe = (len(out), tuple(stack))
+            if stack and stack[-1] == "{":
+                expect_key[-1] = True
+            out.append(c)
+        elif c == ":":
+            if stack and stack[-1] == "{":
+                expect_key[-1] = False
+            out.append(c)
+        else:
+            out.append(c)
+
+    # Truncated: keep everything up to the last complete value and close up
+    length, open_stack = safe
+    out = out[:length]
+    _strip_trailing_comma(out)
+    return "".join(out) + "".join(CLOSERS[c] for c in reversed(open_stack))
+
+
+def _strip_trailing_comma(out: list[str]):
+    while out and out[-1].isspace():
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def parse_json(text: str) -> Any:
+    """
+    Parse JSON from LLM output, repairing it if needed.
+
+    Raises:
+        json.JSONDecodeError: If the text cannot be parsed even after repair
+    """
+    content = extract_json_from_text(text)
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        return json.loads(repair_json(content))
+
+
+def json_items(data: Any, key: str) -> list:
+    """
+    Get the list of items from a parsed response.
+
+    Accepts either a bare array or an object holding the array under ``key``.
+    """
+    if isinstance(data, dict):
+        data = data.get(key, [])
+    return data if isinstance(data, list) else []
+
+
+class JSONArrayStreamParser:
+    """
+    Incrementally parse the elements of one JSON array from a text stream.
+
+    The target array is either the top-level array or the array stored
+    under ``key`` in the top-level object, so both ``["a", "b"]`` and
+    ``{"queries": ["a", "b"]}`` work.
+
+    Example:
+        parser = JSONArrayStreamParser(key="queries")
+        for chunk in chunks:
+            for item in parser.feed(chunk):
+                ...
+        for item in parser.finish():
+            ...
+
+    Args:
+        key: Name of the array in a top-level object
+    """
+
+    def __init__(self, key: str | None = None):
+        self.key = key
+        self.items: list[Any] = []
+        self._buffer = ""
+        self._pos = 0
+        self._stack: list[str] = []
+        self._expect_key: list[bool] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._string_is_key = False
+        self._last_key: str | None = None
+        self._target_depth: int | None = None
+        self._target_seen = False
+        self._element_start: int | None = None
+        self._done = False
+
+    def _at_target(self) -> bool:
+        return self._target_depth is not None and len(self._stack) == self._target_depth
+
+    def _mark_element_start(self, i: int):
+        if self._at_target() and self._element_start is None:
+            self._element_start = i
+
+    def _emit(self, end: int, new_items: list):
+        text = self._buffer[self._element_start:end].strip()
+        self._element_start = None
+        if not text:
+            return
+        try:
+            item = json.loads(text)
+        except json.JSONDecodeError:
+            try:
+                item = json.loads(repair_json(text))
+            except json.JSONDecodeError:
+                return
+        self.items.append(item)
+        new_items.append(item)
+
+    def feed(self, chunk: str) -> list[Any]:
+        """
+        Add streamed text.
+
+        Returns:
+            Elements of the target array completed by this chunk
+        """
+        new_items: list[Any] = []
+        if self._done or not chunk:
+            return new_items
+        self._buffer += chunk
+        buffer = self._buffer
+
+        for i in range(self._pos, len(buffer)):
+            c = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key and len(self._stack) == 1:
+                        try:
+                            self._last_key = json.loads(buffer[self._string_start:i + 1])
+                        except json.JSONDecodeError:
+                            self._last_key = None
+                continue
+
+            if c == '"':
+                self._mark_element_start(i)
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = (
+                    bool(self._stack) and self._stack[-1] == "{" and self._expect_key[-1]
+                )
+            elif c in "{[":
+                self._mark_element_start(i)
+                self._stack.append(c)
+                if c == "{":
+                    self._expect_key.append(True)
+                elif self._target_depth is None and not self._target_seen and (
+                    len(self._stack) == 1
+                    or (len(self._stack) == 2 and self._stack[0] == "{" and self._last_key == self.key)
+                ):
+                    self._target_depth = len(self._stack)
+                    self._target_seen = True
+            elif c in "}]":
+                if self._at_target() and c == "]":
+                    if self._element_start is not None:
+                        self._emit(i, new_items)
+                    self._target_depth = None
+                if self._stack and self._stack.pop() == "{":
+                    self._expect_key.pop()
+                if not self._stack:
+                    self._done = True
+                    break
+            elif c == ",":
+                if self._at_target() and self._element_start is not None:
+                    self._emit(i, new_items)
+                if self._stack and self._stack[-1] == "{":
+                    self._expect_key[-1] = True
+            elif c == ":":
+                if self._stack and self._stack[-1] == "{":
+                    self._expect_key[-1] = False
+            elif not c.isspace():
+                self._mark_element_start(i)
+
+        self._pos = len(buffer)
+        return new_items
+
+    def finish(self) -> list[Any]:
+        """
+        Flush at end of stream.
+
+        Recovers a truncated last element, or falls back to parsing the
+        whole buffer when no target array was found while streaming.
+
+        Returns:
+            Elements not returned by ``feed``
+        """
+        new_items: list[Any] = []
+        if self._target_depth is not None and self._element_start is not None:
+            self._emit(len(self._buffer), new_items)
+        elif not self._target_seen:
+            try:
+                data = parse_json(self._buffer)
+            except json.JSONDecodeError:
+                return new_items
+            for item in json_items(data, self.key):
+                self.items.append(item)
+                new_items.append(item)
+        return new_items
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return self._buffer
+
+
+STRUCTURE_PATTERN = re.compile(rb'["{}\[\],:]')
+# An escape cut short, or the first half of an escaped surrogate pair
+PARTIAL_ESCAPE = re.compile(rb"(\\+)(u[0-9a-fA-F]{0,3}|u[dD][89abAB][0-9a-fA-F]{2})?$")
+
+
+def _backslashes_before(data: bytes, end: int, start: int) -> int:
+    count = 0
+    while end - count > start and data[end - count - 1] == 0x5C:
+        count += 1
+    return count
+
+
+def _string_end(data: bytes, start: int) -> int:
+    """Index of the quote closing a string whose text starts at ``start``, or -1."""
+    pos = start
+    while True:
+        # bytes.find runs at memchr speed over the (long) text
+        quote = data.find(b'"', pos)
+        if quote == -1 or _backslashes_before(data, quote, start) % 2 == 0:
+            return quote
+        pos = quote + 1
+
+
+def _clean_cut(data: bytearray):
+    """Drop a partial escape or UTF-8 sequence from the end of a cut string."""
+    while True:
+        match = PARTIAL_ESCAPE.search(data, max(0, len(data) - 64))
+        if not match or len(match.group(1)) % 2 == 0:
+            break
+        del data[match.end(1) - 1:]
+    start = len(data) - 1
+    while start > 0 and data[start] & 0xC0 == 0x80:
+        start -= 1
+    if start >= 0 and data[start] >= 0x80:
+        lead = data[start]
+        length = 2 if lead < 0xE0 else 3 if lead < 0xF0 else 4
+        if len(data) - start < length:
+            del data[start:]
+
+
+class JSONArrayByteStreamParser:
+    """
+    Incrementally parse the elements of one JSON array from a byte stream,
+    keeping at most ``max_string_bytes`` of every string value in them.
+
+    For large HTTP responses: string text is skipped with ``bytes.find``
+    instead of character by character, each element is decoded with
+    ``loads`` (orjson when installed) once complete, and the kept bytes of
+    an oversized string (say, a page's markdown) are capped while reading,
+    so memory stays bounded however large the response. The target is the
+    top-level array or the value under ``key`` in the top-level object; an
+    object there counts as a one-element array.
+
+    Args:
+        key: Name of the array in a top-level object
+        max_string_bytes: Bytes kept of each string in an element (None
+            keeps all)
+    """
+
+    def __init__(self, key: str | None = None, max_string_bytes: int | None = None):
+        self.key = key
+        self.max_string_bytes = max_string_bytes
+        self.bytes_received = 0
+        # Strings cut at max_string_bytes
+        self.truncated = 0
+        self._rest = b""
+        self._stack: list[int] = []
+        self._expect_key: list[bool] = []
+        self._in_string = False
+        self._string_is_key = False
+        self._string_kept = 0
+        self._key_bytes = bytearray()
+        self._last_key: str | None = None
+        self._target_depth: int | None = None
+        self._target_is_object = False
+        self._target_seen = False
+        self._element: bytearray | None = None
+        self._done = False
+
+    def _at_target(self) -> bool:
+        return self._target_depth is not None and len(self._stack) == self._target_depth
+
+    def _keep(self, data: bytes):
+        if self._element is not None:
+            self._element += data
+
+    def _keep_plain(self, data: bytes):
+        """Keep bytes outside strings: whitespace, numbers and literals."""
+        if self._at_target() and self._element is None and data.strip():
+            self._element = bytearray()
+        self._keep(data)
+
+    def _keep_string(self, data: bytes):
+        if self._string_is_key and len(self._stack) == 1:
+            self._key_bytes += data
+        if self._element is None:
+            return
+        if self.max_string_bytes is None or self._string_is_key:
+            self._element += data
+            return
+        room = self.max_string_bytes - self._string_kept
+        if room <= 0:
+            return
+        self._element += data[:room]
+        self._string_kept += len(data)
+        if self._string_kept > self.max_string_bytes:
+            _clean_cut(self._element)
+            self.truncated += 1
+
+    def _end_string(self):
+        self._in_string = False
+        self._keep(b'"')
+        if self._string_is_key and len(self._stack) == 1:
+            try:
+                self._last_key = _loads(b'"' + bytes(self._key_bytes) + b'"')
+            except ValueError:
+                self._last_key = None
+
+    def _emit(self, new_items: list):
+        data = bytes(self._element).strip()
+        self._element = None
+        if not data:
+            return
+        try:
+            new_items.append(_loads(data))
+        except ValueError:
+            try:
+                new_items.append(json.loads(repair_json(data.decode("utf-8", "replace"))))
+            except json.JSONDecodeError:
+                pass
+
+    def feed(self, chunk: bytes) -> list[Any]:
+        """
+        Add streamed bytes.
+
+        Returns:
+            Elements of the target array completed by this chunk
+        """
+        new_items: list[Any] = []
+        if self._done or not chunk:
+            return new_items
+        self.bytes_received += len(chunk)
+        buffer = self._rest + chunk if self._rest else chunk
+        self._rest = b""
+        pos, end = 0, len(buffer)
+
+        while pos < end and not self._done:
+            if self._in_string:
+                quote = _string_end(buffer, pos)
+                if quote == -1:
+                    # The string goes on in the next chunk; hold back a
+                    # trailing backslash so its escape stays whole
+                    stop = end - _backslashes_before(buffer, end, pos) % 2
+                    self._keep_string(buffer[pos:stop])
+                    self._rest = buffer[stop:]
+                    break
+                self._keep_string(buffer[pos:quote])
+                self._end_string()
+                pos = quote + 1
+                continue
+
+            match = STRUCTURE_PATTERN.search(buffer, pos)
+            if match is None:
+                self._keep_plain(buffer[pos:])
+                break
+            i = match.start()
+            self._keep_plain(buffer[pos:i])
+            pos = i + 1
+            c = buffer[i]
+            if c == 0x22:  # "
+                if self._at_target() and self._element is None:
+                    self._element = bytearray()
+                self._keep(b'"')
+                self._in_string = True
+                self._string_kept = 0
+                self._string_is_key = (
+                    bool(self._stack) and self._stack[-1] == 0x7B and self._expect_key[-1]
+                )
+                self._key_bytes.clear()
+            elif c in b"{[":
+                if self._at_target() and self._element is None:
+                    self._element = bytearray()
+                self._keep(buffer[i:i + 1])
+                self._stack.append(c)
+                if (
+                    self._target_depth is None and not self._target_seen
+                    and (len(self._stack) == 1 and c == 0x5B
+                         or len(self._stack) == 2 and self._stack[0] == 0x7B
+                         and self._last_key == self.key)
+                ):
+                    self._target_seen = True
+                    if c == 0x5B:
+                        self._target_depth = len(self._stack)
+                    else:
+                        # An object value: the one element of the target
+                        self._target_depth = 1
+                        self._target_is_object = True
+                        self._element = bytearray(b"{")
+                if c == 0x7B:
+                    self._expect_key.append(True)
+            elif c in b"}]":
+                if self._at_target() and c == 0x5D and not self._target_is_object:
+                    if self._element is not None:
+                        self._emit(new_items)
+                    self._target_depth = None
+                else:
+                    self._keep(buffer[i:i + 1])
+                if self._stack and self._stack.pop() == 0x7B:
+                    self._expect_key.pop()
+                if self._target_is_object and self._at_target():
+                    self._emit(new_items)
+                    self._target_depth = None
+                    self._target_is_object = False
+                if not self._stack:
+                    self._done = True
+            elif c == 0x2C:  # ,
+                if self._at_target() and self._element is not None:
+                    self._emit(new_items)
+                else:
+                    self._keep(b",")
+                if self._stack and self._stack[-1] == 0x7B:
+                    self._expect_key[-1] = True
+            else:  # :
+                self._keep(b":")
+                if self._stack and self._stack[-1] == 0x7B:
+                    self._expect_key[-1] = False
+        return new_items
+
+    def finish(self) -> list[Any]:
+        """
+        Flush at the end of the stream, or when reading stops early.
+
+        Recovers the element in progress: its open string and brackets are
+        closed, or it is repaired back to its last complete value.
+
+        Returns:
+            Elements not returned by ``feed``
+        """
+        new_items: list[Any] = []
+        if self._element is None or self._target_depth is None:
+            return new_items
+        if self._in_string:
+            _clean_cut(self._element)
+            self._element += b'"'
+        self._element += bytes(
+            0x7D if c == 0x7B else 0x5D
+            for c in reversed(self._stack[self._target_depth:])
+        )
+        self._emit(new_items)
+        self._target_depth = None
+        return new_items
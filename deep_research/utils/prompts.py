@@ -1,30 +1,31 @@
 """
 All prompts used in the Deep Research agent.
+
+Prompts are laid out for provider-side prompt caching, which reuses work for
+a repeated prompt prefix: stable instructions and output format come first,
+then the accumulated learnings (which only grow by appending during a run),
+and the per-call variables last. Keep new prompts in the same order.
 """
 
 # Follow-up questions generation
 FOLLOW_UP_QUESTIONS_PROMPT = """You are a research assistant helping to understand a user's research needs.
 
-Given the research query: "{query}"
-
-Generate {num_questions} thoughtful follow-up questions that would help you better understand:
+Write thoughtful follow-up questions that would help you better understand:
 - The specific aspects the user is most interested in
 - The depth and breadth of information needed
 - Any specific constraints or preferences
 - The intended use of the research
 
 Return ONLY a JSON array of strings, like: ["question 1", "question 2", "question 3"]
-Do not include any other text or formatting."""
+Do not include any other text or formatting.
 
+Research query: "{query}"
 
-# Query generation
-GENERATE_QUERIES_PROMPT = """You are a research assistant generating search queries.
-
-Research Goal: {goal}
+Generate {num_questions} follow-up questions."""
 
-{context}
 
-Generate {breadth} diverse and specific search queries that will help achieve this research goal.
+# Query generation
+GENERATE_QUERIES_PROMPT = """You are a research assistant generating search queries.
 
 Guidelines:
 - Make queries specific and targeted
@@ -33,21 +34,20 @@ Guidelines:
 - Include relevant time constraints if needed (e.g., "2024", "latest")
 - Avoid redundant queries
 
-{previous_learnings}
-
 Return ONLY a JSON array of query strings, like: ["query 1", "query 2", "query 3"]
-Do not include any other text or formatting."""
+Do not include any other text or formatting.
+{previous_learnings}{searched_queries}
+Research Goal: {goal}
 
+{context}
 
-# Process results and extract learnings
-PROCESS_RESULTS_PROMPT = """You are a research analyst extracting key learnings from search results.
+Generate {breadth} diverse and specific search queries that will help achieve this research goal."""
 
-Research Goal: {goal}
 
-Search Results:
-{results}
+# Process results and extract learnings
+PROCESS_RESULTS_PROMPT = """You are a research analyst extracting key learnings from search results.
 
-Analyze these results and extract:
+Analyze the search results below and extract:
 1. Key learnings and insights (5-10 important findings)
 2. Each learning should be specific, factual, and cite sources
 
@@ -62,49 +62,89 @@ Return your response as a JSON object with this structure:
   ]
 }}
 
-Focus on quality over quantity. Ensure each learning is substantive and well-sourced."""
+Focus on quality over quantity. Ensure each learning is substantive and well-sourced.
+
+Search Results:
+{results}
+
+Research Goal: {goal}"""
 
 
 # Generate next research directions
 GENERATE_DIRECTIONS_PROMPT = """You are a research planner deciding what to explore next.
 
-Original Query: {query}
+Based on what we've learned, propose new research directions that would:
+- Deep dive into the most important or interesting aspects
+- Fill gaps in our current understanding
+- Follow up on promising leads
+- Explore related areas that matter
 
-Current Research Goal: {goal}
+Return a JSON array of objects with this structure:
+{{
+  "directions": [
+    {{
+      "goal": "Specific research goal",
+      "rationale": "Why this direction is important",
+      "priority": 1
+    }}
+  ]
+}}
+
+Order by priority (1 = highest). Focus on directions that will add the most value.
 
 Learnings So Far:
 {learnings}
 
-Based on what we've learned, generate {breadth} new research directions that would:
+Original Query: {query}
+
+Current Research Goal: {goal}
+
+Generate {breadth} new research directions."""
+
+
+# Generate next research directions together with queries for the top one
+GENERATE_DIRECTIONS_WITH_QUERIES_PROMPT = """You are a research planner deciding what to explore next and how to search for it.
+
+Based on what we've learned, propose new research directions that would:
 - Deep dive into the most important or interesting aspects
 - Fill gaps in our current understanding
 - Follow up on promising leads
 - Explore related areas that matter
 
-Return a JSON array of objects with this structure:
+For the highest-priority direction, also write diverse and specific search queries that will help achieve it:
+- Make queries specific and targeted
+- Cover different aspects and angles
+- Use professional/academic terminology when appropriate
+- Avoid queries whose answers are already in the learnings
+
+Return a JSON object with this structure:
 {{
   "directions": [
     {{
       "goal": "Specific research goal",
       "rationale": "Why this direction is important",
-      "priority": 1
+      "priority": 1,
+      "queries": ["query 1", "query 2", "query 3"]
     }}
   ]
 }}
 
-Order by priority (1 = highest). Focus on directions that will add the most value."""
-
+Order by priority (1 = highest). Only the first direction needs queries.
 
-# Generate final report
-GENERATE_REPORT_PROMPT = """You are a research writer creating a comprehensive report.
+Learnings So Far:
+{learnings}
 
 Original Query: {query}
 
-Research Context:
+Current Research Goal: {goal}
+
 {context}
 
-All Learnings:
-{learnings}
+Generate {breadth} new research directions, with {breadth} search queries for the first."""
+
+
+# Generate final report
+GENERATE_REPORT_PROMPT = """You are a research writer creating a comprehensive report.
 
 Create a detailed, well-structured research report in markdown format.
 
@@ -118,18 +158,19 @@ Requirements:
 - Maintain a professional, analytical tone
 - Aim for depth and comprehensiveness
 
-The report should be thorough enough to be useful as a reference document."""
+The report should be thorough enough to be useful as a reference document.
 
+All Learnings:
+{learnings}
 
-# Answer mode prompt (simpler)
-ANSWER_QUERY_PROMPT = """You are a research assistant providing a comprehensive answer.
+Original Query: {query}
 
-Question: {query}
+Research Context:
+{context}"""
 
-{context}
 
-Research Findings:
-{learnings}
+# Answer mode prompt (simpler)
+ANSWER_QUERY_PROMPT = """You are a research assistant providing a comprehensive answer.
 
 Provide a detailed, well-structured answer that:
 - Directly addresses the question
@@ -138,4 +179,84 @@ Provide a detailed, well-structured answer that:
 - Cites sources using markdown links: [source text](url)
 - Is clear, concise, and authoritative
 
-Format your answer in markdown with appropriate headings and structure."""
+Format your answer in markdown with appropriate headings and structure.
+
+Research Findings:
+{learnings}
+
+Question: {query}
+
+{context}"""
+
+
+# Refresh mode: update one section of an earlier report
+REFRESH_SECTION_PROMPT = """You are a research writer updating one section of an existing report with new findings.
+
+Requirements:
+- Integrate the new learnings into the section; keep what they do not contradict
+- Replace statements the new learnings supersede, and say what changed
+- Keep the section's heading, structure and tone
+- Cite sources using markdown links: [source text](url)
+- If the current section is empty, write it from the new learnings
+
+Return ONLY the updated section in markdown, starting with its "## " heading.
+
+New Learnings:
+{learnings}
+
+Original Query: {query}
+
+Current Section:
+## {heading}
+
+{section}"""
+
+
+# Sectioned report: outline that groups the learnings into sections
+REPORT_OUTLINE_PROMPT = """You are a research writer planning the outline of a report.
+
+Group the numbered learnings below into the body sections of a report:
+- Each section covers one theme; order sections so the report reads logically
+- Every learning goes into exactly one section, by its number
+- Do not plan an executive summary or conclusion; they are written separately
+
+Return your response as a JSON object with this structure:
+{{
+  "sections": [
+    {{"heading": "Section heading", "learnings": [1, 4, 7]}}
+  ]
+}}
+
+All Learnings:
+{learnings}
+
+Original Query: {query}
+
+Research Context:
+{context}
+
+Generate {num_sections} sections."""
+
+
+# Sectioned report: one section, written from its own learnings
+REPORT_SECTION_PROMPT = """You are a research writer creating one section of a comprehensive report.
+
+Requirements:
+- Write only this section, in markdown, starting with its "## " heading
+- Use bullet points and numbered lists where they help readability
+- Include specific facts, data, and examples from the learnings
+- Cite sources using markdown links: [source text](url)
+- Maintain a professional, analytical tone
+
+Learnings:
+{learnings}
+
+Sources:
+{sources}
+
+Original Query: {query}
+
+{instructions}
+
+Section:
+## {heading}"""
@@ -0,0 +1,88 @@
+"""
+Helpers for working with a markdown report section by section.
+
+A report is split on its level-2 headings (``## ``); the text before the
+first one is the preamble (title and metadata). Learnings are matched to
+the sections they are about by the share of their content words that the
+section contains.
+"""
+
+import difflib
+import re
+
+from ..state import Learning
+
+
+SECTION_PATTERN = re.compile(r"^## .*$", re.MULTILINE)
+WORD_PATTERN = re.compile(r"[a-z0-9]{3,}")
+
+# Share of a learning's words a section must contain for the learning to
+# belong to it
+MIN_SECTION_OVERLAP = 0.3
+
+
+def split_sections(report: str) -> tuple[str, list[tuple[str, str]]]:
+    """
+    Split a markdown report on its ``## `` headings.
+
+    Returns:
+        The preamble and a list of (heading, body) pairs, headings without
+        the leading ``## ``
+    """
+    matches = list(SECTION_PATTERN.finditer(report))
+    if not matches:
+        return report, []
+    sections = []
+    for match, following in zip(matches, matches[1:] + [None]):
+        end = following.start() if following else len(report)
+        heading = match.group()[3:].strip()
+        sections.append((heading, report[match.end():end].strip("\n")))
+    return report[:matches[0].start()], sections
+
+
+def join_sections(preamble: str, sections: list[tuple[str, str]]) -> str:
+    """Inverse of ``split_sections``."""
+    body = "\n\n".join(f"## {heading}\n\n{text}".rstrip() for heading, text in sections)
+    return f"{preamble.rstrip()}\n\n{body}\n" if preamble.strip() else f"{body}\n"
+
+
+def _words(text: str) -> set[str]:
+    return set(WORD_PATTERN.findall(text.lower()))
+
+
+def assign_to_sections(
+    learnings: list[Learning],
+    sections: list[tuple[str, str]],
+    min_overlap: float = MIN_SECTION_OVERLAP,
+) -> tuple[dict[int, list[Learning]], list[Learning]]:
+    """
+    Match learnings to the sections they are about.
+
+    Returns:
+        Learnings by section index, and the learnings that fit no section
+    """
+    section_words = [_words(f"{heading} {text}") for heading, text in sections]
+    assigned: dict[int, list[Learning]] = {}
+    unassigned = []
+    for learning in learnings:
+        words = _words(learning.content)
+        best, best_score = None, min_overlap
+        for index, candidate in enumerate(section_words):
+            score = len(words & candidate) / len(words) if words else 0.0
+            if score > best_score:
+                best, best_score = index, score
+        if best is None:
+            unassigned.append(learning)
+        else:
+            assigned.setdefault(best, []).append(learning)
+    return assigned, unassigned
+
+
+def report_diff(old: str, new: str, name: str = "report.md") -> str:
+    """Unified diff between two versions of a report."""
+    return "".join(difflib.unified_diff(
+        old.splitlines(keepends=True),
+        new.splitlines(keepends=True),
+        fromfile=f"a/{name}",
+        tofile=f"b/{name}",
+    ))
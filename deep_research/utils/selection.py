@@ -0,0 +1,131 @@
+"""
+Ranking and token-budgeted selection of learnings for the report prompt.
+
+Deep, wide runs accumulate more learnings than a report prompt should hold.
+Every learning gets a score, computed with NumPy over the whole set:
+
+- its confidence
+- how many sources back it (log-scaled)
+- how relevant those sources are: their ``relevance_score`` when set,
+  otherwise how often the run's learnings cite them
+- minus its redundancy: the highest cosine similarity (over hashed word
+  counts) to a learning that ranks above it on the other terms
+
+The best-scoring learnings that fit the token budget go into the prompt
+(packed greedily); the rest are left for an appendix.
+"""
+
+import re
+import zlib
+from typing import Callable
+
+import numpy as np
+
+from ..state import Learning, Source
+
+
+WORD_PATTERN = re.compile(r"[a-z0-9]{3,}")
+
+# Hashed bag-of-words dimensions for the similarity
+FEATURES = 1024
+CONFIDENCE_WEIGHT = 1.0
+SOURCES_WEIGHT = 0.5
+RELEVANCE_WEIGHT = 0.5
+REDUNDANCY_WEIGHT = 1.0
+
+
+def _word_vectors(learnings: list[Learning]) -> np.ndarray:
+    """L2-normalized hashed word counts, one row per learning."""
+    rows, columns = [], []
+    for row, learning in enumerate(learnings):
+        for word in WORD_PATTERN.findall(learning.content.lower()):
+            rows.append(row)
+            columns.append(zlib.crc32(word.encode()) % FEATURES)
+    vectors = np.zeros((len(learnings), FEATURES), dtype=np.float32)
+    np.add.at(vectors, (np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)), 1.0)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
+
+
+def score_learnings(learnings: list[Learning], sources: list[Source] | None = None) -> np.ndarray:
+    """Score of every learning; higher is more worth including."""
+    if not learnings:
+        return np.zeros(0)
+
+    confidence = np.array([learning.confidence for learning in learnings], dtype=np.float64)
+    source_counts = np.array([len(set(learning.sources)) for learning in learnings], dtype=np.float64)
+    support = np.log1p(source_counts) / np.log1p(max(source_counts.max(), 1.0))
+
+    citations: dict[str, int] = {}
+    for learning in learnings:
+        for url in set(learning.sources):
+            citations[url] = citations.get(url, 0) + 1
+    most_cited = max(citations.values(), default=1)
+    relevance_by_url = {url: count / most_cited for url, count in citations.items()}
+    for source in sources or ():
+        if source.relevance_score and source.url in relevance_by_url:
+            relevance_by_url[source.url] = source.relevance_score
+    relevance = np.array([
+        np.mean([relevance_by_url[url] for url in set(learning.sources)]) if learning.sources else 0.0
+        for learning in learnings
+    ])
+
+    base = (
+        CONFIDENCE_WEIGHT * confidence
+        + SOURCES_WEIGHT * support
+        + RELEVANCE_WEIGHT * relevance
+    )
+
+    # Redundancy against learnings ranked higher on the base score (ties
+    # broken by position), so of two near-identical learnings only the
+    # weaker one is penalized
+    vectors = _word_vectors(learnings)
+    similarity = vectors @ vectors.T
+    order = np.lexsort((np.arange(len(learnings)), -base))
+    rank = np.empty(len(learnings), dtype=np.intp)
+    rank[order] = np.arange(len(learnings))
+    ranked_above = rank[np.newaxis, :] < rank[:, np.newaxis]
+    redundancy = np.where(ranked_above, similarity, 0.0).max(axis=1)
+
+    return base - REDUNDANCY_WEIGHT * redundancy
+
+
+def select_learnings(
+    learnings: list[Learning],
+    max_tokens: int,
+    sources: list[Source] | None = None,
+    count_tokens: Callable[[str], int] = lambda text: len(text) // 4,
+) -> tuple[list[Learning], list[Learning]]:
+    """
+    Split learnings into the best that fit a token budget and the rest.
+
+    Learnings are taken best-first, skipping any that no longer fit the
+    remaining budget (so one long learning does not crowd out the rest);
+    both lists keep the original order.
+
+    Args:
+        learnings: All learnings of the run
+        max_tokens: Token budget for the selected learnings
+        sources: Sources of the run, for their relevance scores
+        count_tokens: Token counter
+
+    Returns:
+        The selected learnings and the remaining ones
+    """
+    if not learnings:
+        return [], []
+    scores = score_learnings(learnings, sources)
+    costs = np.array([
+        count_tokens(f"{learning.content} (Sources: {', '.join(learning.sources[:3])})")
+        for learning in learnings
+    ])
+    selected = np.zeros(len(learnings), dtype=bool)
+    remaining = max_tokens
+    for i in np.argsort(-scores, kind="stable"):
+        if costs[i] <= remaining:
+            selected[i] = True
+            remaining -= costs[i]
+    return (
+        [learning for learning, keep in zip(learnings, selected) if keep],
+        [learning for learning, keep in zip(learnings, selected) if not keep],
+    )
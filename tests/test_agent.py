@@ -78,3 +78,288 @@ async def test_save_report(agent, tmp_path):
     assert test_file.exists()
     content = test_file.read_text()
     assert content == test_report
+
+
+def test_prepare_next_carries_planned_queries():
+    """Test that fused-planning queries skip query generation."""
+    from deep_research.graph import prepare_next_iteration, route_after_prepare
+    from deep_research.state import ResearchDirection
+
+    state = create_initial_state(query="Test query", breadth=2, depth=2)
+    state["next_directions"] = [ResearchDirection(
+        goal="Next goal",
+        rationale="Because",
+        queries=["q1", "q2", "q3"],
+    )]
+
+    update = prepare_next_iteration(state)
+    assert update["current_goal"] == "Next goal"
+    assert update["search_queries"] == ["q1", "q2"]
+    assert route_after_prepare({**state, **update}) == "search"
+
+    state["next_directions"][0].queries = []
+    update = prepare_next_iteration(state)
+    assert route_after_prepare({**state, **update}) == "generate_queries"
+
+
+@pytest.mark.asyncio
+async def test_process_results_skips_processed_sources(monkeypatch):
+    """Test that known sources reuse their learnings instead of the LLM."""
+    from deep_research.context import RunContext, run_context
+    from deep_research.nodes import process_results
+    from deep_research.state import Learning
+
+    analyzed, planned_from = [], []
+
+    async def fake_extract(goal, results_text, **kwargs):
+        analyzed.append(results_text)
+        url = "https://a.example/1" if "a.example/1" in results_text else "https://b.example/1"
+        return [Learning(content=f"Learning from {url}", sources=[url])]
+
+    async def fake_directions(query, goal, learnings, breadth, **kwargs):
+        planned_from.append([learning.content for learning in learnings])
+        return []
+
+    monkeypatch.setattr(process_results, "extract_learnings", fake_extract)
+    monkeypatch.setattr(process_results, "generate_next_directions", fake_directions)
+
+    def result(url, content, **extra):
+        return {"query": "q", "url": url, "title": "T", "content": content, **extra}
+
+    state = create_initial_state(query="Test query", breadth=2, depth=2)
+    with run_context(RunContext()):
+        first = await process_results.process_results_node({
+            **state,
+            "search_results": [result("https://a.example/1", "Article A")],
+        })
+        state["learnings"] = first["learnings"]
+        second = await process_results.process_results_node({
+            **state,
+            "search_results": [
+                result("https://a.example/1", "Article  a"),
+                result("https://mirror.example/1", "", duplicate_of="https://a.example/1"),
+                result("https://b.example/1", "Article B"),
+            ],
+        })
+        state["learnings"] = first["learnings"] + second["learnings"]
+        third = await process_results.process_results_node({
+            **state,
+            "search_results": [result("https://b.example/1", "Article B")],
+        })
+
+    assert len(analyzed) == 2 and "a.example" not in analyzed[1]
+    assert [l.content for l in first["learnings"]] == ["Learning from https://a.example/1"]
+    assert [l.content for l in second["learnings"]] == ["Learning from https://b.example/1"]
+    assert third["learnings"] == []
+    assert planned_from[1] == [
+        "Learning from https://b.example/1",
+        "Learning from https://a.example/1",
+    ]
+    assert planned_from[2] == ["Learning from https://b.example/1"]
+
+
+@pytest.mark.asyncio
+async def test_process_results_retries_sources_after_failed_extraction(monkeypatch):
+    """Test that sources are not marked processed when extraction fails."""
+    from deep_research.context import RunContext, run_context
+    from deep_research.nodes import process_results
+    from deep_research.state import Learning
+    from deep_research.tools import KnowledgeBase
+
+    outcomes = [None, [Learning(content="Learning from A", sources=["https://a.example/1"])]]
+
+    async def fake_extract(goal, results_text, **kwargs):
+        return outcomes.pop(0)
+
+    monkeypatch.setattr(process_results, "extract_learnings", fake_extract)
+
+    state = create_initial_state(query="Test query", breadth=2, depth=1)
+    state["current_depth"] = 1
+    state["search_results"] = [{"query": "q", "url": "https://a.example/1", "title": "T", "content": "Article A"}]
+    context = RunContext()
+    context.knowledge = KnowledgeBase(":memory:")
+    context.knowledge.add_search("q", state["search_results"])
+    with run_context(context):
+        failed = await process_results.process_results_node(state)
+        analyzed_after_failure = context.knowledge.learnings_for(["https://a.example/1"])
+        retried = await process_results.process_results_node(state)
+
+    assert failed["learnings"] == []
+    assert analyzed_after_failure == {}
+    assert [l.content for l in retried["learnings"]] == ["Learning from A"]
+    assert [l.content for l in context.knowledge.learnings_for(["https://a.example/1"])["https://a.example/1"]] == [
+        "Learning from A"
+    ]
+
+
+def test_save_and_load_run(agent, tmp_path):
+    """Test that a saved run keeps what a refresh needs."""
+    from datetime import datetime
+    from deep_research.state import Learning, Source
+    from deep_research.utils import content_hash
+
+    result = {
+        "final_report": "# Report",
+        "learnings": [Learning(content="Fact", sources=["https://a"])],
+        "sources": [
+            Source(url="https://a", title="A", content="Page text"),
+            Source(url="https://b", title="B", content=""),
+        ],
+        "content_hashes": {"https://a": "outdated", "https://b": "carried", "https://gone": "x"},
+        "query": "Test query",
+        "breadth": 2,
+        "depth": 1,
+        "started_at": datetime(2024, 5, 1, 12, 0),
+    }
+    path = str(tmp_path / "run.json")
+    agent.save_run(result, path)
+
+    snapshot = agent.load_run(path)
+    assert snapshot.report == "# Report"
+    assert snapshot.learnings == result["learnings"]
+    assert snapshot.sources[0].content == ""
+    assert snapshot.content_hashes == {"https://a": content_hash("Page text"), "https://b": "carried"}
+    assert snapshot.started_at == datetime(2024, 5, 1, 12, 0)
+
+
+@pytest.mark.asyncio
+async def test_sectioned_report_assembles_sections_in_order():
+    """Test outline parsing, leftover learnings and section assembly."""
+    import json
+    from types import SimpleNamespace
+    from deep_research.nodes.generate_report import generate_sectioned_report
+    from deep_research.state import Learning
+
+    class FakeProvider:
+        async def ainvoke(self, messages, stage, **kwargs):
+            prompt = messages[-1].content
+            if stage == "report_outline":
+                return SimpleNamespace(content=json.dumps({"sections": [
+                    {"heading": "Costs", "learnings": [2, 99]},
+                    {"heading": "Supply", "learnings": [1, 2]},
+                ]}))
+            heading = prompt.rsplit("## ", 1)[1]
+            return SimpleNamespace(content=f"## {heading}\n\nText for {heading}.")
+
+    state = create_initial_state(query="Test query", breadth=2, depth=1)
+    state["learnings"] = [Learning(content=f"Fact {i}") for i in range(1, 4)]
+    report = await generate_sectioned_report(state, state["learnings"], FakeProvider(), FakeProvider(), "")
+
+    headings = [line[3:] for line in report.splitlines() if line.startswith("## ")]
+    assert headings == [
+        "Executive Summary", "Costs", "Supply", "Other Findings", "Conclusion and Next Steps",
+    ]
+    assert "Text for Supply." in report
+
+
+@pytest.mark.asyncio
+async def test_fetch_more_results_pages_only_productive_searches():
+    """Test that only searches yielding new, relevant pages get another page."""
+    from deep_research.context import RunContext
+    from deep_research.nodes.search import fetch_more_results
+    from deep_research.state import GraphConfig
+
+    def page(query, start, size=2):
+        return [
+            {"url": f"https://{query.split()[0]}.example/{i}", "title": query,
+             "content": f"{query} article number {i} " * 20}
+            for i in range(start, start + size)
+        ]
+
+    class FakeClient:
+        def __init__(self):
+            self.calls = []
+
+        async def batch_search(self, queries, num_results, offsets, **kwargs):
+            self.calls.append(dict(offsets))
+            # "fresh" keeps finding new pages; "stale" repeats its first page
+            return {q: page(q, offsets[q] if q.startswith("fresh") else 0) for q in queries}
+
+    config = GraphConfig(search_page_size=2, max_results_per_query=6)
+    fetched = {"fresh solar": page("fresh solar", 0), "stale wind": page("stale wind", 0)}
+    async def prepare(pages):
+        pass
+
+    client = FakeClient()
+    added = await fetch_more_results(client, fetched, config, RunContext(config), 3, prepare)
+
+    assert client.calls == [{"fresh solar": 2, "stale wind": 2}, {"fresh solar": 4}]
+    assert added == 6
+    assert len(fetched["fresh solar"]) == 6 and len(fetched["stale wind"]) == 4
+
+
+@pytest.mark.asyncio
+async def test_stop_cuts_off_research_and_routes_to_report():
+    """Test that stopping a run cuts off research calls but not the report."""
+    from deep_research.context import RunContext, run_context, time_limit
+    from deep_research.graph import route_after_search, should_continue_research
+    from deep_research.state import GraphConfig
+
+    context = RunContext(GraphConfig(deadline_seconds=30, report_reserve_seconds=10))
+    assert 19 < context.time_left("search") <= 20
+    assert 29 < context.time_left("generate_report") <= 30
+
+    state = create_initial_state("test", depth=2)
+    with run_context(context):
+        async def search():
+            async with time_limit("search"):
+                await asyncio.sleep(10)
+
+        task = asyncio.create_task(search())
+        await asyncio.sleep(0.01)
+        context.stop()
+        with pytest.raises(TimeoutError, match="stopped"):
+            await task
+
+        async with time_limit("generate_report"):
+            await asyncio.sleep(0.01)
+        assert route_after_search(state) == "report"
+        assert should_continue_research(state) == "report"
+    await context.aclose()
+
+
+@pytest.mark.asyncio
+async def test_deep_scrape_replaces_only_shorter_content(monkeypatch):
+    """Test that results are marked deep only when the cleaned full page replaced them."""
+    from deep_research.context import RunContext, run_context
+    from deep_research.nodes import deep_scrape
+    from deep_research.state import GraphConfig
+
+    full_page = "Battery recycling recovers lithium from spent cells. " * 20
+
+    class FakeClient:
+        async def batch_scrape(self, urls, **kwargs):
+            return {
+                "https://a.example/1": {"url": "https://a.example/1", "title": "A", "content": full_page},
+                "https://b.example/1": {"url": "https://b.example/1", "title": "B", "content": "Short"},
+            }
+
+    monkeypatch.setattr(deep_scrape, "get_firecrawl_client", lambda: FakeClient())
+    state = create_initial_state(query="Test query", breadth=2, depth=1)
+    state["search_results"] = [
+        {"query": "battery recycling", "url": "https://a.example/1", "title": "A", "content": "Snippet"},
+        {"query": "battery recycling", "url": "https://b.example/1", "title": "B", "content": "A longer snippet"},
+    ]
+    config = {"configurable": GraphConfig(deep_scrape_top_k=2).model_dump()}
+    with run_context(RunContext()):
+        update = await deep_scrape.deep_scrape_node(state, config)
+
+    deepened, kept = update["search_results"]
+    assert deepened["deep"] and deepened["content"] == full_page.strip()
+    assert "deep" not in kept and kept["content"] == "A longer snippet"
+
+
+def test_results_prompt_lists_only_results_included_in_full():
+    """Test that URL prefixes, URLs in content and truncated results are not counted."""
+    from deep_research.nodes.process_results import format_results_prompt
+
+    results = {"q": [
+        {"title": "A", "url": "https://a.example/page-2", "content": "Cites https://c.example/1"},
+        {"title": "Long", "url": "https://b.example/1", "content": "Text " * 2000},
+        {"title": "Prefix", "url": "https://a.example/page", "content": "Short"},
+        {"title": "Cited", "url": "https://c.example/1", "content": "Short"},
+    ]}
+    text, included = format_results_prompt(results, 60)
+    assert "https://a.example/page" in text and "https://c.example/1" in text
+    assert "https://a.example/page\n" not in text
+    assert included == {"https://a.example/page-2"}
@@ -0,0 +1,40 @@
+"""End-to-end tests against the local stub servers."""
+
+import pytest
+from deep_research.bench import StubServers, StubLLM, StubFirecrawl
+from deep_research.bench.loadtest import LoadTest, percentile
+
+
+@pytest.fixture
+def stubs(monkeypatch):
+    """Run fast stub servers and point the agent at them."""
+    servers = StubServers(
+        llm=StubLLM(latency=0.01, jitter=0.0),
+        firecrawl=StubFirecrawl(latency=0.01, jitter=0.0, page_bytes=2000),
+    )
+    with servers:
+        for key, value in servers.environment().items():
+            monkeypatch.setenv(key, value)
+        servers.configure_environment()
+        yield servers
+
+
+def test_percentile():
+    """Test nearest-rank percentiles."""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 99) == 99
+    assert percentile([], 99) == 0.0
+
+
+@pytest.mark.asyncio
+async def test_closed_loop_against_stubs(stubs):
+    """Test that concurrent sessions complete and are measured per node."""
+    test = LoadTest(breadth=2, depth=1)
+    result = await test.closed_loop(concurrency=2, sessions=2)
+
+    assert result.completed == 2
+    assert result.failed == 0
+    assert result.sessions_per_minute > 0
+    assert {"generate_queries", "search", "process_results", "generate_report"} <= set(result.nodes)
+    assert result.peak_rss_mb > 0
@@ -0,0 +1,149 @@
+"""Tests for tracing and node instrumentation."""
+
+import json
+import pytest
+from deep_research.observability import (
+    Tracer,
+    OTLPJsonFileExporter,
+    instrument_node,
+)
+from deep_research.observability import tracing
+
+
+class ListExporter:
+    """Collect finished spans in memory."""
+
+    def __init__(self):
+        self.spans = []
+
+    def export(self, span):
+        self.spans.append(span)
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def exporter(monkeypatch):
+    """Install an in-memory tracer for the test."""
+    exporter = ListExporter()
+    monkeypatch.setattr(tracing, "_tracer", Tracer(exporter))
+    return exporter
+
+
+def test_spans_nest_and_record_errors(exporter):
+    """Test parent/child linkage and error status."""
+    tracer = tracing.get_tracer()
+    with tracer.start_span("parent", {"a": 1}):
+        with pytest.raises(ValueError):
+            with tracer.start_span("child"):
+                raise ValueError("boom")
+
+    child, parent = exporter.spans
+    assert child.parent_span_id == parent.span_id
+    assert child.trace_id == parent.trace_id
+    assert child.status == "ERROR"
+    assert parent.status == "OK"
+    assert parent.attributes == {"a": 1}
+
+
+def test_unsampled_traces_record_nothing():
+    """Test that a zero sample ratio drops whole traces."""
+    exporter = ListExporter()
+    tracer = Tracer(exporter, sample_ratio=0.0)
+    with tracer.start_span("root") as root:
+        with tracer.start_span("child") as child:
+            assert not child.is_recording
+    assert not root.is_recording
+    assert exporter.spans == []
+
+
+def test_otlp_json_export(tmp_path):
+    """Test the OTLP/JSON file layout."""
+    path = tmp_path / "traces.jsonl"
+    tracer = Tracer(OTLPJsonFileExporter(str(path)))
+    with tracer.start_span("root", {"tokens": 12, "query": "q"}):
+        pass
+    tracer.shutdown()
+
+    request = json.loads(path.read_text().splitlines()[0])
+    span = request["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert span["name"] == "root"
+    assert {"key": "tokens", "value": {"intValue": "12"}} in span["attributes"]
+    assert span["status"]["code"] == 1
+
+
+@pytest.mark.asyncio
+async def test_instrument_node(exporter):
+    """Test that wrapped nodes emit a span with update sizes."""
+    async def node(state):
+        return {"search_queries": ["a", "b"]}
+
+    wrapped = instrument_node("generate_queries", node)
+    update = await wrapped({"query": "q", "current_depth": 1})
+
+    assert update == {"search_queries": ["a", "b"]}
+    span = exporter.spans[0]
+    assert span.name == "node.generate_queries"
+    assert span.attributes["research.depth"] == 1
+    assert span.attributes["update.search_queries.count"] == 2
+
+
+def test_metrics_text_format():
+    """Test counter and histogram exposition."""
+    from deep_research.observability import MetricsRegistry
+
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ("status",))
+    latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.inc(status="200")
+    requests.inc(2, status="200")
+    latency.observe(0.05)
+    latency.observe(0.5)
+    latency.observe(5.0)
+
+    text = registry.render()
+    assert 'requests_total{status="200"} 3' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="1"} 2' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "latency_seconds_count 3" in text
+
+
+def test_metrics_shards_per_thread():
+    """Test that increments from several threads are all counted."""
+    import threading
+    from deep_research.observability import MetricsRegistry
+
+    counter = MetricsRegistry().counter("hits_total", "Hits.")
+
+    def work():
+        for _ in range(1000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.labels().value == 4000
+
+
+@pytest.mark.asyncio
+async def test_memory_profiler_records_nodes():
+    """Test per-node memory records and accumulated field sizes."""
+    from deep_research.observability import profile_memory
+
+    async def node(state):
+        return {"learnings": ["x" * 10_000], "search_queries": ["q"]}
+
+    wrapped = instrument_node("process_results", node)
+    with profile_memory() as profiler:
+        await wrapped({"learnings": ["y" * 1000], "search_queries": []})
+
+    record = profiler.records[0]
+    assert record.node == "process_results"
+    assert record.peak_bytes > 0
+    # learnings accumulate, so both the old and the new entry are counted
+    assert record.field_sizes["learnings"] > 11_000
+    assert "process_results" in profiler.report()
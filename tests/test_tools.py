@@ -0,0 +1,315 @@
+"""Tests for tool-level helpers."""
+
+import asyncio
+import pytest
+from deep_research.tools.prefetch import SearchPrefetcher, query_overlap
+
+
+def test_query_overlap():
+    """Test word-overlap scoring between queries."""
+    assert query_overlap("battery supply chain", "battery supply chain 2024") == 1.0
+    assert query_overlap("quantum computing", "battery recycling") == 0.0
+    assert query_overlap("", "anything") == 0.0
+
+
+@pytest.mark.asyncio
+async def test_prefetcher_claims_best_match_and_cancels_rest(monkeypatch):
+    """Test that each prefetch is claimed once and leftovers are cancelled."""
+    prefetcher = SearchPrefetcher(min_overlap=0.5)
+
+    async def fake_search(query):
+        await asyncio.sleep(0.01 if "battery" in query else 10)
+        return [{"url": f"https://x/{query}", "title": query, "content": ""}]
+
+    monkeypatch.setattr(prefetcher, "_search", fake_search)
+    prefetcher.prefetch(["battery recycling economics", "solid state electrolyte"])
+
+    claimed = prefetcher.claim([
+        "battery recycling economics in Europe",
+        "sodium ion costs",
+    ])
+    assert list(claimed) == ["battery recycling economics in Europe"]
+
+    prefetcher.cancel_all()
+    assert prefetcher.cancelled == 1
+    searched, task = claimed["battery recycling economics in Europe"]
+    assert searched == "battery recycling economics"
+    results = await task
+    assert results[0]["title"] == "battery recycling economics"
+
+
+class _StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+@pytest.mark.asyncio
+async def test_router_fails_over_and_prefers_healthy_provider():
+    """Test failover on 429 and that the failed provider is ranked last."""
+    from types import SimpleNamespace
+    from deep_research.tools.routing import LLMRouter
+
+    router = LLMRouter(base_cooldown=30)
+    slow = SimpleNamespace(provider="gemini", model="a")
+    fast = SimpleNamespace(provider="groq", model="b")
+    calls = []
+
+    async def invoke(route):
+        calls.append(route.provider)
+        if route is slow:
+            raise _StatusError(429)
+        return route.provider
+
+    assert await router.call([slow, fast], invoke) == "groq"
+    assert calls == ["gemini", "groq"]
+    assert router.rank([slow, fast]) == [fast, slow]
+
+    async def bad_request(route):
+        raise _StatusError(400)
+
+    with pytest.raises(_StatusError):
+        await router.call([fast], bad_request)
+    assert router.stats(fast).healthy
+
+
+@pytest.mark.asyncio
+async def test_router_hedges_slow_calls():
+    """Test that a hedged call returns the faster answer."""
+    from types import SimpleNamespace
+    from deep_research.tools.routing import LLMRouter
+
+    router = LLMRouter()
+    stuck = SimpleNamespace(provider="gemini", model="a")
+    quick = SimpleNamespace(provider="groq", model="b")
+
+    async def invoke(route):
+        await asyncio.sleep(10 if route is stuck else 0.01)
+        return route.provider
+
+    assert await router.call([stuck, quick], invoke, hedge_after=0.05) == "groq"
+    # The cancelled attempt still counts as slow once it has unwound
+    await asyncio.sleep(0)
+    assert router.stats(stuck).latency >= 0.05
+
+    with pytest.raises(TimeoutError):
+        await router.call([stuck], invoke, deadline=0.05)
+
+
+def test_model_profiles_from_runtime_config():
+    """Test per-stage profiles read from the graph's runtime config."""
+    from deep_research.state import GraphConfig
+    from deep_research.tools import LLMProvider
+
+    config = GraphConfig.from_runnable_config({"configurable": {
+        "model_profiles": {"generate_report": {"provider": "openai", "model": "big", "max_tokens": 8000}},
+    }})
+    assert config.profile_for("generate_queries") is None
+
+    provider = LLMProvider.from_profile(config.profile_for("generate_report"))
+    assert (provider.provider, provider.model, provider.max_tokens) == ("openai", "big", 8000)
+    # A pinned provider is not routed
+    assert provider.routes == [provider]
+
+
+def test_prompt_cache_key_only_for_official_openai_api(monkeypatch):
+    """Test that OpenAI-compatible endpoints are not sent prompt_cache_key."""
+    from deep_research.tools import LLMProvider
+
+    monkeypatch.delenv("OPENAI_ENDPOINT", raising=False)
+    assert "prompt_cache_key" in LLMProvider(provider="openai", providers=["openai"])._cache_hints("generate_report")
+    monkeypatch.setenv("OPENAI_ENDPOINT", "http://localhost:8000/v1")
+    assert LLMProvider(provider="openai", providers=["openai"])._cache_hints("generate_report") == {}
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_queues_sessions_fairly():
+    """Test that a late small session is not stuck behind a large one."""
+    from deep_research.tools.ratelimit import RateLimiter
+
+    limiter = RateLimiter("test:model", max_concurrency=1)
+    order = []
+
+    async def call(session, i):
+        async with limiter.acquire(tokens=100, session=session):
+            order.append(f"{session}{i}")
+            await asyncio.sleep(0.01)
+
+    big = [asyncio.create_task(call("a", i)) for i in range(4)]
+    await asyncio.sleep(0)
+    small = asyncio.create_task(call("b", 0))
+    await asyncio.gather(*big, small)
+    assert order.index("b0") <= 2
+
+
+@pytest.mark.asyncio
+async def test_rate_limiter_waits_for_token_budget():
+    """Test that calls wait once the tokens-per-minute budget is spent."""
+    import time
+    from deep_research.tools.ratelimit import RateLimiter
+
+    # 6000 tokens/minute refills 100 tokens per second
+    limiter = RateLimiter("test:tpm", tpm=6000)
+    async with limiter.acquire(tokens=6000):
+        pass
+    t0 = time.monotonic()
+    async with limiter.acquire(tokens=10):
+        pass
+    assert time.monotonic() - t0 >= 0.08
+
+
+def test_rate_limiter_survives_a_run_ending_while_calls_wait():
+    """Test that a timer left by an ended event loop does not block later runs."""
+    from deep_research.tools.ratelimit import RateLimiter
+
+    limiter = RateLimiter("test:loops", tpm=6000)
+
+    async def call(tokens):
+        async with limiter.acquire(tokens=tokens):
+            pass
+
+    async def cut_short():
+        await call(6000)
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(call(6000), 0.01)
+
+    asyncio.run(cut_short())
+    asyncio.run(asyncio.wait_for(call(10), 2))
+
+
+def test_query_registry_detects_near_duplicates():
+    """Test normalization and shingle matching of repeated queries."""
+    from deep_research.tools import QueryRegistry, normalize_query
+
+    assert normalize_query("The Economics of Battery Recycling") == "battery economics recycling"
+
+    registry = QueryRegistry(threshold=0.7)
+    registry.add("battery recycling economics", [{"url": "https://a", "content": "x"}])
+    assert registry.match("Economics of battery recycling") == "battery recycling economics"
+    assert registry.match("battery recycling economic") == "battery recycling economics"
+    assert registry.match("solid state electrolyte costs") is None
+    assert registry.match("sodium ion cells", among=["Sodium-ion cells"]) == "Sodium-ion cells"
+
+    results = registry.results("battery recycling economics")
+    results[0]["content"] = "cleaned"
+    assert registry.results("battery recycling economics")[0]["content"] == "x"
+
+
+def test_knowledge_base_serves_fresh_material(tmp_path):
+    """Test source and learning lookup and the freshness policy."""
+    from deep_research.state import Learning
+    from deep_research.tools import KnowledgeBase
+
+    kb = KnowledgeBase(str(tmp_path / "kb.sqlite"), max_age=3600)
+    results = [
+        {"url": f"https://a.example/{i}", "title": f"Battery {i}", "content": f"Battery recycling plant {i}"}
+        for i in range(3)
+    ]
+    kb.add_search("battery recycling plants", results)
+    kb.add_learnings(
+        [Learning(content="Recycling recovers lithium", sources=["https://a.example/1"])],
+        analyzed=["https://a.example/0", "https://a.example/1"],
+    )
+
+    assert [r["url"] for r in kb.find_sources("Battery recycling plants", limit=3)] == [r["url"] for r in results]
+    assert len(kb.find_sources("recycling battery plant", limit=3)) == 3
+    assert kb.find_sources("recycling battery plant", limit=4) == []
+    assert kb.find_sources("battery recycling plants", limit=3, max_age=0) == []
+
+    learnings = kb.learnings_for(["https://a.example/0", "https://a.example/1", "https://a.example/2"])
+    assert [l.content for l in learnings["https://a.example/1"]] == ["Recycling recovers lithium"]
+    assert learnings["https://a.example/0"] == []
+    assert "https://a.example/2" not in learnings
+    assert [l.content for l in kb.find_learnings("lithium recovery")] == ["Recycling recovers lithium"]
+    kb.close()
+
+
+def test_circuit_breaker_opens_fails_fast_and_recovers(monkeypatch):
+    """Test the closed, open and half-open transitions of a breaker."""
+    from deep_research.tools import breaker as breaker_module
+    from deep_research.tools.breaker import CircuitBreaker, CircuitOpenError
+
+    now = [100.0]
+    monkeypatch.setattr(breaker_module.time, "monotonic", lambda: now[0])
+    breaker = CircuitBreaker("upstream", error_rate=0.5, min_calls=4, open_seconds=10)
+    is_failure = lambda error: isinstance(error, ConnectionError)
+
+    def call(error=None):
+        with breaker.call(is_failure):
+            if error:
+                raise error
+
+    call()
+    with pytest.raises(ValueError):
+        call(ValueError("bad request"))  # The upstream answered
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            call(ConnectionError())
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        call()
+    assert breaker.retry_in() == 10
+
+    now[0] += 10
+    assert breaker.state == "half_open"
+    with pytest.raises(ConnectionError):
+        call(ConnectionError())  # The trial fails: open for twice as long
+    assert breaker.state == "open" and breaker.retry_in() == 20
+
+    now[0] += 20
+    call()
+    assert breaker.state == "closed"
+
+
+@pytest.mark.asyncio
+async def test_batch_scrape_shares_client_and_limits_hosts(monkeypatch):
+    """Test one pool, per-host limits and deduplicated URLs in batch_scrape."""
+    from deep_research.tools import FirecrawlClient
+
+    clients, active, peaks = set(), {}, {}
+
+    async def fake_scrape(url, timeout=30, client=None):
+        host = url.split("/")[2]
+        clients.add(id(client))
+        active[host] = active.get(host, 0) + 1
+        peaks[host] = max(peaks.get(host, 0), active[host])
+        await asyncio.sleep(0.01)
+        active[host] -= 1
+        return {"url": url, "title": "", "content": "" if url.endswith("/empty") else f"page {url}"}
+
+    client = FirecrawlClient(api_key="test")
+    monkeypatch.setattr(client, "scrape", fake_scrape)
+    urls = [f"https://a.example/{i}" for i in range(5)] + ["https://b.example/1", "https://b.example/empty"]
+    pages = await client.batch_scrape(urls + urls[:2], concurrency_limit=4, per_host_limit=2)
+
+    assert set(pages) == set(urls) - {"https://b.example/empty"}
+    assert pages["https://a.example/0"]["content"] == "page https://a.example/0"
+    assert len(clients) == 1
+    assert peaks == {"a.example": 2, "b.example": 2}
+
+
+@pytest.mark.asyncio
+async def test_cpu_pool_offloads_large_payloads_only():
+    """Test small payloads run inline and large ones in the pool with the same result."""
+    import threading
+    from deep_research.tools.workers import CPUPool
+    from deep_research.utils import MinHashIndex
+
+    def thread_name(*_):
+        return threading.current_thread().name
+
+    pool = CPUPool("thread", workers=1, min_bytes=100)
+    try:
+        assert await pool.run(thread_name, size=10) == threading.current_thread().name
+        assert (await pool.run(thread_name, size=1000)).startswith("cpu")
+
+        hasher = MinHashIndex().hasher
+        texts = ["the quick brown fox jumps over the lazy dog " * 20, "short"]
+        offloaded, inline = await pool.run(hasher, texts, size=1000), hasher(texts)
+        assert offloaded[1] is inline[1] is None
+        assert list(offloaded[0]) == list(inline[0])
+    finally:
+        pool.shutdown()
+
+    with pytest.raises(ValueError):
+        CPUPool("gpu")
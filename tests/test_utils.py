@@ -0,0 +1,220 @@
+"""Tests for utility helpers."""
+
+import json
+import pytest
+from deep_research.utils import (
+    repair_json,
+    parse_json,
+    JSONArrayStreamParser,
+    JSONArrayByteStreamParser,
+)
+
+
+@pytest.mark.parametrize("text, expected", [
+    ('```json\n["a", "b",]\n```', ["a", "b"]),
+    ('Sure! {"a": "line\nbreak"} Hope this helps.', {"a": "line\nbreak"}),
+    ('["one", "two", "thr', ["one", "two"]),
+    ('{"a": 1, "b', {"a": 1}),
+    (
+        '{"learnings": [{"content": "x", "sources": ["u"]}, {"content": "y", "sour',
+        {"learnings": [{"content": "x", "sources": ["u"]}, {"content": "y"}]},
+    ),
+])
+def test_repair_json(text, expected):
+    """Test repair of fenced, trailing-comma and truncated JSON."""
+    assert json.loads(repair_json(text)) == expected
+
+
+def test_parse_json_raises_without_structure():
+    """Test that text with no JSON still raises."""
+    with pytest.raises(json.JSONDecodeError):
+        parse_json("I could not find anything.")
+
+
+def test_stream_parser_yields_items_as_they_complete():
+    """Test incremental parsing of an array under a key."""
+    text = '```json\n{"queries": ["alpha \\"quoted\\"", "beta, gamma", {"x": [1, 2]}, "trunc'
+    parser = JSONArrayStreamParser(key="queries")
+
+    seen = []
+    for i in range(0, len(text), 3):
+        seen.extend(parser.feed(text[i:i + 3]))
+    assert seen == ['alpha "quoted"', "beta, gamma", {"x": [1, 2]}]
+    # The truncated last string is dropped rather than half-used
+    assert parser.finish() == []
+
+
+def test_stream_parser_accepts_bare_array_and_fallback():
+    """Test top-level arrays and the whole-buffer fallback."""
+    parser = JSONArrayStreamParser(key="questions")
+    assert parser.feed('["q1", "q2"]') == ["q1", "q2"]
+
+    parser = JSONArrayStreamParser(key="questions")
+    assert parser.feed('{"note": "x", "questions": ["q1"]}') == ["q1"]
+
+
+def test_byte_stream_parser_caps_strings_while_reading():
+    """Test capped strings, chunk boundaries inside escapes, and early stop."""
+    body = json.dumps({
+        "success": True,
+        "data": [
+            {"markdown": 'é "x" \\ ' * 50, "url": f"https://a/{i}", "metadata": {"n": [i]}}
+            for i in range(3)
+        ],
+    }, ensure_ascii=False).encode()
+
+    parser = JSONArrayByteStreamParser(key="data", max_string_bytes=40)
+    items = []
+    for i in range(0, len(body), 7):
+        items.extend(parser.feed(body[i:i + 7]))
+    assert parser.finish() == []
+    assert [item["url"] for item in items] == ["https://a/0", "https://a/1", "https://a/2"]
+    assert [item["metadata"] for item in items] == [{"n": [0]}, {"n": [1]}, {"n": [2]}]
+    # Cut to the cap on whole characters and escapes
+    assert all(('é "x" \\ ' * 50).startswith(item["markdown"]) for item in items)
+    assert all(30 <= len(item["markdown"].encode()) <= 40 for item in items)
+    assert parser.truncated == 3
+
+    # Stopping mid-string keeps what was read of the element in progress
+    parser = JSONArrayByteStreamParser(key="data")
+    assert parser.feed(body[:body.index(b"https://a/1") + 5]) == [json.loads(body)["data"][0]]
+    assert [item["url"] for item in parser.finish()] == ["https"]
+
+    # An object under the key is a single item
+    parser = JSONArrayByteStreamParser(key="data", max_string_bytes=3)
+    assert parser.feed(b'{"data": {"markdown": "abcdef", "title": "t"}}') == [
+        {"markdown": "abc", "title": "t"}
+    ]
+
+
+def test_prompts_put_learnings_before_per_call_fields():
+    """Test the cache-friendly order: instructions, learnings, variables."""
+    from string import Formatter
+    from deep_research import utils
+
+    for name in ("GENERATE_DIRECTIONS_PROMPT", "GENERATE_DIRECTIONS_WITH_QUERIES_PROMPT",
+                 "GENERATE_REPORT_PROMPT", "ANSWER_QUERY_PROMPT", "GENERATE_QUERIES_PROMPT",
+                 "REFRESH_SECTION_PROMPT", "REPORT_OUTLINE_PROMPT", "REPORT_SECTION_PROMPT"):
+        fields = [f for _, f, _, _ in Formatter().parse(getattr(utils, name)) if f]
+        assert fields[0] in ("learnings", "previous_learnings"), name
+
+
+def test_clean_markdown_strips_boilerplate():
+    """Test removal of navigation, banners, images and footers."""
+    from deep_research.utils import clean_markdown
+
+    page = (
+        "[Skip to main content](#main)\n\n"
+        "- [Home](/)\n- [News](/news)\n\n"
+        "![logo](https://x/logo.png)\n\n"
+        "We use cookies to improve your experience. [Accept all](#)\n\n"
+        "# Home battery storage is booming\n\n"
+        "Residential [battery](https://x/b) installations grew 40% in 2024.\n\n"
+        "[Solar](https://x/1) | [EV charging](https://x/2) | [Heat pumps](https://x/3)\n\n"
+        "© 2024 Example Media. All rights reserved."
+    )
+    assert clean_markdown(page) == (
+        "# Home battery storage is booming\n\n"
+        "Residential battery installations grew 40% in 2024."
+    )
+
+
+def test_clean_markdown_drops_repeated_blocks_across_pages():
+    """Test that a shared seen-set keeps repeated blocks once."""
+    from deep_research.utils import clean_markdown
+
+    seen = set()
+    first = clean_markdown("Intro paragraph.\n\nSite-wide promo text here.", seen)
+    second = clean_markdown("Other article.\n\nSite-wide  promo text here.", seen)
+    assert first.endswith("promo text here.")
+    assert second == "Other article."
+
+
+def test_clean_pages_shares_blocks_only_within_a_site():
+    """Test that a short paragraph found on two sites is kept on both."""
+    from deep_research.utils import clean_pages
+
+    fact = "Quantum error correction reached break-even in 2024."
+    pages = [
+        f"## Overview\n\n{fact}\n\nExample News weekly digest.",
+        f"## Overview\n\n{fact}\n\nOther report.",
+        "Second story.\n\nExample News weekly digest.",
+    ]
+    urls = ["https://www.example.com/a", "https://other.org/b", "https://example.com/c"]
+    seen = {}
+    cleaned, added = clean_pages(pages, urls, seen)
+    assert fact in cleaned[0] and fact in cleaned[1]
+    assert cleaned[1].startswith("## Overview")
+    assert cleaned[2] == "Second story."
+    assert set(added) == {"example.com", "other.org"}
+
+
+def test_minhash_index_finds_near_duplicates():
+    """Test that edited copies match and unrelated pages do not."""
+    from deep_research.utils import MinHashIndex
+    from deep_research.bench.stubs import StubFirecrawl
+
+    stub = StubFirecrawl(page_bytes=5000, boilerplate=False)
+    article = stub.page("https://a.example/1")["markdown"]
+    other = stub.page("https://a.example/2")["markdown"]
+    words = article.split()
+    words[50:55] = ["edited"] * 5
+    syndicated = " ".join(words) + " Originally published by a partner site."
+
+    index = MinHashIndex(threshold=0.8)
+    assert index.find_or_add("a", article) is None
+    assert index.find_or_add("b", other) is None
+    assert index.find_or_add("c", syndicated) == "a"
+    assert index.find_or_add("d", "too short") is None
+    assert len(index) == 2
+
+
+def test_report_sections_round_trip_and_assignment():
+    """Test splitting a report and matching learnings to its sections."""
+    from deep_research.state import Learning
+    from deep_research.utils import split_sections, join_sections, assign_to_sections, report_diff
+
+    report = (
+        "# Report\n\n---\n\n## Summary\n\nBattery makers expand.\n\n"
+        "## Recycling\n\nRecycling plants recover lithium and cobalt.\n\n"
+        "## Sources\n\n1. [A](https://a)\n"
+    )
+    preamble, sections = split_sections(report)
+    assert preamble == "# Report\n\n---\n\n"
+    assert [heading for heading, _ in sections] == ["Summary", "Recycling", "Sources"]
+    assert join_sections(preamble, sections) == report
+
+    assigned, unassigned = assign_to_sections([
+        Learning(content="New recycling plants recover more cobalt"),
+        Learning(content="Sodium-ion cells reach mass production"),
+    ], sections)
+    assert [l.content for l in assigned[1]] == ["New recycling plants recover more cobalt"]
+    assert [l.content for l in unassigned] == ["Sodium-ion cells reach mass production"]
+
+    diff = report_diff(report, report.replace("cobalt", "nickel"))
+    assert "-Recycling plants recover lithium and cobalt." in diff
+    assert "+Recycling plants recover lithium and nickel." in diff
+
+
+def test_select_learnings_penalizes_redundancy_within_budget():
+    """Test that a near-duplicate learning loses its place to a distinct one."""
+    from deep_research.state import Learning
+    from deep_research.utils import score_learnings, select_learnings
+
+    learnings = [
+        Learning(content="Solid-state batteries double energy density", sources=["https://a", "https://b"]),
+        Learning(content="Solid-state batteries double the energy density", sources=["https://a"]),
+        Learning(content="Recycling recovers most lithium from old cells", sources=["https://c"]),
+        Learning(content="A minor rumour about prices", sources=[], confidence=0.3),
+    ]
+    scores = score_learnings(learnings)
+    assert scores[0] > scores[2] > scores[1] > scores[3]
+
+    budget = sum(len(f"{l.content} (Sources: {', '.join(l.sources)})") // 4 for l in learnings[::2])
+    selected, rest = select_learnings(learnings, budget)
+    assert selected == [learnings[0], learnings[2]]
+    assert rest == [learnings[1], learnings[3]]
+    # The top learning does not fit; the next ones still do
+    small_budget = len(f"{learnings[2].content} (Sources: https://c)") // 4
+    assert select_learnings(learnings, small_budget)[0] == [learnings[2]]
+    assert select_learnings(learnings, 10_000) == (learnings, [])